@@ -1,16 +1,35 @@
 """
-Compiles supported languages into a usable library for plagiarism detection.
+Compiles every language of `PLAG_LANGUAGES` into its own library for plagiarism detection, in parallel, while the
+image is built. Languages whose sources didn't change since they were last compiled into the output directory are
+skipped.
+
+Languages are read from the settings and compiled by the `setup_plagiarism` command, only the settings it needs are
+configured since the rest of the project isn't available yet.
 """
 
-import time
+import argparse
+import os
+import sys
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--src", default="src", help="Directory of the project sources, the settings are read from.")
+parser.add_argument("--grammars", default=".", help="Directory the grammar sources are cloned into.")
+parser.add_argument("--output", default="build", help="Directory the libraries are compiled into.")
+parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Number of grammars compiled at a time.")
+parser.add_argument("--force", action="store_true", help="Compiles grammars again even if their sources didn't change.")
+args = parser.parse_args()
+
+os.environ["PLAG_GRAMMARS_DIR"] = os.path.abspath(args.grammars)
+os.environ["PLAG_LANGUAGES_DIR"] = os.path.abspath(args.output)
+sys.path.insert(0, os.path.abspath(args.src))
 
-from tree_sitter import Language
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
 
+from core.settings import base  # noqa: E402
 
-print("Compiling..")
-start_time: float = time.perf_counter()
+settings.configure(PLAG_LANGUAGES=base.PLAG_LANGUAGES, PLAG_LANGUAGES_DIR=base.PLAG_LANGUAGES_DIR)
 
-Language.build_library("build/languages.so", ["tree-sitter-python", "tree-sitter-javascript"])
+from plagiarism.management.commands.setup_plagiarism import Command  # noqa: E402
 
-end_time: float = time.perf_counter() - start_time
-print(f"Successfully compiled libraries in  {end_time:.5}s.")
+call_command(Command(), jobs=args.jobs, force=args.force)
@@ -89,11 +89,41 @@ FRONTEND_COURSE_INVITATION_PARAM = "course-invitation"
 FRONTEND_TEAM_INVITATION_PARAM = "team-invitation"
 
 # plagiarism detection - tree-sitter
-PLAG_SUPPORTED_LANGAUGES = [
-    str(APPS_DIR / "plagiarism/vendor/tree-sitter-javascript"),
-    str(APPS_DIR / "plagiarism/vendor/tree-sitter-python"),
-]
-PLAG_COMPILED_LIBRARY = str(APPS_DIR / "plagiarism/build/languages.so")
+# Grammars by language name, every one is compiled into `PLAG_LANGUAGES_DIR/<name>.so` by `setup_plagiarism` and
+# loaded the first time one of its files is parsed, see `plagiarism.sources.Grammar`
+PLAG_GRAMMARS_DIR = Path(env.str("PLAG_GRAMMARS_DIR", default=str(APPS_DIR / "plagiarism/vendor")))
+PLAG_LANGUAGES = {
+    "javascript": {"path": str(PLAG_GRAMMARS_DIR / "tree-sitter-javascript"), "exts": [".js"]},
+    "python": {"path": str(PLAG_GRAMMARS_DIR / "tree-sitter-python"), "exts": [".py"]},
+}
+PLAG_LANGUAGES_DIR = env.str("PLAG_LANGUAGES_DIR", default=str(APPS_DIR / "plagiarism/build"))
+# Languages loaded once per process on startup instead of on their first file
+PLAG_PRELOADED_LANGUAGES = env.list("PLAG_PRELOADED_LANGUAGES", default=["javascript", "python"])
+# plagiarism detection - winnowing (changing k or the window requires bumping `plagiarism.index.INDEX_VERSION`)
+PLAG_WINNOWING_K = 8  # k-gram size in tokens
+PLAG_WINNOWING_WINDOW = 4  # Matches of at least k + window - 1 tokens are guaranteed to be detected
+PLAG_WINNOWING_OVERLAP_FACTOR = 0.5  # Loosens the fingerprint overlap needed before aligning a pair
+# plagiarism detection - greedy string tiling engine
+PLAG_GST_MIN_MATCH_LENGTH = 12  # Default minimum tokens of a greedy string tiling match
+# plagiarism detection - requirement starter code
+PLAG_BASELINE_MIN_MATCH_LENGTH = 16  # Minimum tokens of a run that is subtracted as starter code
+# plagiarism detection - parallel comparisons
+PLAG_PARALLEL_WORKERS = env.int("PLAG_PARALLEL_WORKERS", default=1)  # Processes used per detection run
+PLAG_PARALLEL_MIN_PAIRS = 2000  # Smaller runs aren't worth spawning processes for
+PLAG_PARALLEL_CHUNK_SIZE = 500  # Pair comparisons sent to a process at once
+# plagiarism detection - decoded sources cache, per process
+PLAG_SOURCE_CACHE_SIZE = env.int("PLAG_SOURCE_CACHE_SIZE", default=64 * 1024 * 1024)  # Bytes of decoded sources
+# plagiarism detection - compared files, kept in the default cache (see `CACHES`)
+PLAG_COMPARE_CACHE_TIMEOUT = env.int("PLAG_COMPARE_CACHE_TIMEOUT", default=24 * 60 * 60)  # Seconds
+# plagiarism detection - unused parsed sources (see `manage.py collect_plagiarism_sources`)
+PLAG_SOURCE_MIN_AGE = env.int("PLAG_SOURCE_MIN_AGE", default=60 * 60)  # Seconds they're kept for before deletion
+# plagiarism detection - background jobs (see `manage.py plagiarism_worker`)
+PLAG_WORKER_PROCESSES = env.int("PLAG_WORKER_PROCESSES", default=1)
+PLAG_WORKER_POLL_INTERVAL = env.float("PLAG_WORKER_POLL_INTERVAL", default=2.0)
+PLAG_JOB_HEARTBEAT_INTERVAL = env.float("PLAG_JOB_HEARTBEAT_INTERVAL", default=30.0)  # Seconds between heartbeats
+# Seconds without a heartbeat before a running job is claimed again, i.e its worker crashed or was redeployed
+PLAG_JOB_TIMEOUT = env.float("PLAG_JOB_TIMEOUT", default=5 * 60.0)
+PLAG_JOB_MAX_ATTEMPTS = 3  # Claims of a job before it's failed instead, i.e it keeps crashing its workers
 
 # drf-flex-fields
 # ------------------------------------------------------------------------------
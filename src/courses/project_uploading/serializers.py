@@ -23,6 +23,20 @@ class ProjectFileContentSerializer(serializers.Serializer):
     )
 
 
+# ! This is mostly for swagger documentation purposes
+class ProjectFileQuerySerializer(serializers.Serializer):
+    """
+    Custom serializer used to represent query parameters for project file view.
+    """
+
+    raw = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="If to stream the file as it is with its content type instead of JSON, Range requests are "
+        "only supported by raw files",
+    )
+
+
 class ProjectZipFileFieldSerializer(serializers.Serializer):
     """
     A serializer responsible for displaying project zip file contents.
@@ -1,5 +1,6 @@
 import zipfile
 import base64
+import mimetypes
 
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
@@ -8,6 +9,8 @@ from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework import status
 from rest_flex_fields import is_expanded
 from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
 from django.utils.translation import gettext_lazy as _
 from drf_yasg.utils import swagger_auto_schema
 
@@ -15,8 +18,21 @@ from core.utils.mixins import MultipleRequiredFieldLookupMixin
 from core.utils.flex_fields import get_flex_serializer_config, FlexFieldsQuerySerializer
 from core.utils.openapi import openapi_error_response
 from ..models import Project
-from ..utils import is_team_student, is_course_teacher, is_course_student
-from .serializers import ProjectSerializer, ProjectFileContentSerializer, ProjectZipFileFieldSerializer
+from ..utils import (
+    is_team_student,
+    is_course_teacher,
+    is_course_student,
+    get_member_etag,
+    etag_matches,
+    parse_range,
+    iter_zip_member,
+)
+from .serializers import (
+    ProjectSerializer,
+    ProjectFileContentSerializer,
+    ProjectFileQuerySerializer,
+    ProjectZipFileFieldSerializer,
+)
 
 
 class ProjectFileView(MultipleRequiredFieldLookupMixin, GenericAPIView):
@@ -85,8 +101,11 @@ class ProjectFileDetailView(MultipleRequiredFieldLookupMixin, GenericAPIView):
     }
 
     @swagger_auto_schema(
+        query_serializer=ProjectFileQuerySerializer(),
         responses={
             status.HTTP_200_OK: ProjectFileContentSerializer(),
+            status.HTTP_206_PARTIAL_CONTENT: "Requested range of the raw file contents",
+            status.HTTP_304_NOT_MODIFIED: "",
             status.HTTP_400_BAD_REQUEST: openapi_error_response(
                 description="Request specific errors",
                 examples={"error": "Path must be valid file path in the project."},
@@ -94,13 +113,14 @@ class ProjectFileDetailView(MultipleRequiredFieldLookupMixin, GenericAPIView):
             status.HTTP_403_FORBIDDEN: openapi_error_response(
                 description="Authorization specific errors", examples={"error": "message"}
             ),
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE: "",
         },
     )
     def get(self, request, *args, **kwargs) -> Response:
         """
         Displays project file contents.
 
-        .
+        Responses carry an ETag of the file, raw files also support Range requests.
         """
         path: str = kwargs["path"]
         code: str = kwargs["course_code"]
@@ -116,6 +136,10 @@ class ProjectFileDetailView(MultipleRequiredFieldLookupMixin, GenericAPIView):
             message = _("User must be either a student or a teacher of the course.")
             return Response({"error": message}, status=status.HTTP_403_FORBIDDEN)
 
+        query_serializer = ProjectFileQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        raw: bool = query_serializer.validated_data["raw"]
+
         data = {}
         try:
             with zipfile.ZipFile(instance.project_zip.file) as zfile:
@@ -123,8 +147,18 @@ class ProjectFileDetailView(MultipleRequiredFieldLookupMixin, GenericAPIView):
                 if not zpath.is_file():
                     return Response({"error": "Path must be valid file path in the project."})
 
+                # Unchanged files are never read again, both representations are told apart by their tags
+                info = zfile.getinfo(path)
+                etag = get_member_etag(info, suffix="" if raw else "-json")
+                if etag_matches(request.headers.get("If-None-Match"), etag):
+                    response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+                    return _set_file_caching(response, etag)
+                if raw:
+                    return _get_raw_file_response(request, instance, path, info.file_size, etag)
+
                 try:
-                    with zpath.open("r") as f:
+                    # Reuses the member that was already looked up, ZipFile.open always reads bytes
+                    with zfile.open(info, "r") as f:
                         try:
                             content = f.read()
                             data["content"] = content.decode("utf-8")
@@ -137,7 +171,43 @@ class ProjectFileDetailView(MultipleRequiredFieldLookupMixin, GenericAPIView):
             return Response({"error": "Unexpected error happened while trying to read project files."})
 
         serializer = ProjectFileContentSerializer(data)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return _set_file_caching(Response(serializer.data, status=status.HTTP_200_OK), etag)
+
+
+def _get_raw_file_response(request, project: Project, path: str, size: int, etag: str) -> HttpResponse:
+    """
+    Returns a response that streams the raw contents of a project file, or the range of them that was requested.
+    """
+    try:
+        # Ranges of an older version of the file can't be completed with the current one
+        if_range = request.headers.get("If-Range")
+        requested = parse_range(request.headers.get("Range"), size) if not if_range or if_range == etag else None
+    except ValueError:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    start, end = requested or (0, size)
+    content_type, encoding = mimetypes.guess_type(path)
+    response = StreamingHttpResponse(
+        iter_zip_member(project.project_zip, path, start=start, end=end),
+        content_type=content_type if content_type and not encoding else "application/octet-stream",
+        status=status.HTTP_206_PARTIAL_CONTENT if requested else status.HTTP_200_OK,
+    )
+    response["Content-Length"] = end - start
+    response["Accept-Ranges"] = "bytes"
+    if requested:
+        response["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    return _set_file_caching(response, etag)
+
+
+def _set_file_caching(response: HttpResponse, etag: str) -> HttpResponse:
+    """
+    Tags a project file response, clients have to revalidate it since access to the file may be revoked.
+    """
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 class ProjectView(MultipleRequiredFieldLookupMixin, GenericAPIView):
@@ -1 +1,2 @@
 from .db import is_course_student, is_course_owner, is_course_teacher, is_team_student
+from .files import get_member_etag, etag_matches, parse_range, iter_zip_member
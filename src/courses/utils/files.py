@@ -0,0 +1,91 @@
+import re
+import zipfile
+from typing import Iterator, Optional, Tuple
+
+from django.db.models.fields.files import FieldFile
+
+# Size of the chunks project files are streamed in
+FILE_CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def get_member_etag(info: zipfile.ZipInfo, suffix: str = "") -> str:
+    """
+    Returns the entity tag of a zip member from the CRC32 and size stored in the archive's central directory, so
+    the member never has to be read to know if it changed.
+
+    :param info: the zip member
+    :param suffix: optional suffix that tells apart different representations of the same member
+    """
+    return f'"{info.CRC:08x}-{info.file_size}{suffix}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    Checks if an If-None-Match or If-Range header matches the given entity tag, weak tags are compared weakly.
+
+    :param header: the header value, none if it wasn't sent
+    :param etag: the current entity tag
+    """
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Returns the (start, end) byte offsets of a Range header over a file of the given size, end exclusive. Returns
+    none if the whole file should be sent and raises `ValueError` if the range can't be satisfied.
+
+    Only single ranges are served, multiple ranges are answered with the whole file as they are allowed to be.
+
+    :param header: the header value, none if it wasn't sent
+    :param size: size of the file in bytes
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if match is None or not any(match.groups()):
+        # Malformed or multiple ranges are ignored
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range of the last bytes
+        start, end = max(size - int(last), 0), size
+        if not int(last):
+            raise ValueError("Empty suffix range")
+    else:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+        if last and int(last) < start:
+            return None
+    if start >= size:
+        raise ValueError("Range starts after the end of the file")
+    return start, end
+
+
+def iter_zip_member(
+    project_zip: FieldFile, path: str, start: int = 0, end: Optional[int] = None, chunk_size: int = FILE_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Yields the bytes of a zip member in chunks, the archive is only opened once the response starts streaming.
+
+    :param project_zip: the archive file
+    :param path: path of the member in the archive
+    :param start: offset of the first byte to yield
+    :param end: offset after the last byte to yield, the end of the member if none
+    :param chunk_size: maximum size of every chunk
+    """
+    with project_zip.open("rb") as archive, zipfile.ZipFile(archive) as zfile, zfile.open(path, "r") as member:
+        end = zfile.getinfo(path).file_size if end is None else end
+        if start:
+            member.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = member.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,8 @@
+from django.contrib import admin
+
+from .models import RequirementBaseline
+
+
+@admin.register(RequirementBaseline)
+class RequirementBaselineAdmin(admin.ModelAdmin):
+    pass
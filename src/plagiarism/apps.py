@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class PlagiarismConfig(AppConfig):
     name = "plagiarism"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .sources import SupportedLanguages
+
+        try:
+            # Warming up the common languages once per process instead of on the first plagiarism request, the
+            # others are only loaded if one of their files is ever parsed
+            SupportedLanguages.load(settings.PLAG_PRELOADED_LANGUAGES)
+        except OSError:
+            pass  # Languages aren't compiled yet, i.e. while running `setup_plagiarism`
@@ -0,0 +1,139 @@
+import hashlib
+import threading
+from array import array
+from collections import defaultdict
+from itertools import compress
+from typing import Dict, Optional, Sequence, Set, Tuple
+
+from django.conf import settings
+
+from .models import RequirementBaseline
+from .index import INDEX_VERSION, are_languages_stale, iter_archive_sources, tokenize_file
+from .constants import TokenProfile
+from .fingerprints import hash_kgrams
+from .tokens import TokenStream
+
+
+class Baseline:
+    """
+    Starter code of a requirement, the token runs and fingerprints it's made of are subtracted from project files
+    before they're compared.
+
+    :digest: content address of the starter code, stored ratios are only reused under the same baseline
+
+    :kgrams: hashes of every `PLAG_BASELINE_MIN_MATCH_LENGTH` tokens k-gram of the starter code by file extension
+
+    :fingerprints: hashes of every `PLAG_WINNOWING_K` tokens k-gram of the starter code by file extension
+
+    :languages: version of every language found in the starter code archive, see `iter_archive_sources`
+    """
+
+    __slots__ = ("digest", "kgrams", "fingerprints", "languages")
+
+    def __init__(
+        self,
+        digest: str,
+        kgrams: Dict[str, Set[int]],
+        fingerprints: Dict[str, Set[int]],
+        languages: Optional[Dict[str, Optional[str]]] = None,
+    ):
+        self.digest = digest
+        self.kgrams = kgrams
+        self.fingerprints = fingerprints
+        self.languages = languages or {}
+
+    def _get_kept(self, types: Sequence[int], ext: str) -> Optional[bytearray]:
+        # Flags of the tokens that aren't part of a starter code run, none if every token is kept
+        kgrams = self.kgrams.get(ext)
+        if not kgrams:
+            return None
+
+        k = settings.PLAG_BASELINE_MIN_MATCH_LENGTH
+        kept = bytearray(b"\x01") * len(types)
+        for start, h in enumerate(hash_kgrams(types, k=k)):
+            if h in kgrams:
+                kept[start : start + k] = bytes(k)  # noqa
+        return kept
+
+    def strip(self, types: Sequence[int], ext: str) -> array:
+        """
+        Returns the given token type ids without the runs of at least `PLAG_BASELINE_MIN_MATCH_LENGTH` tokens that
+        also appear in the starter code.
+        """
+        kept = self._get_kept(types, ext=ext)
+        if kept is None:
+            return array("H", types)
+        return array("H", compress(types, kept))
+
+    def strip_tokens(self, tokens: TokenStream, ext: str) -> TokenStream:
+        """
+        Same as `strip` but keeps the locations of the remaining tokens, so their matches can still be marked.
+        """
+        kept = self._get_kept(tokens.types, ext=ext)
+        if kept is None:
+            return tokens
+        return TokenStream(
+            alphabet=tokens.alphabet,
+            types=array("H", compress(tokens.types, kept)),
+            starts=array("I", compress(tokens.starts, kept)),
+            ends=array("I", compress(tokens.ends, kept)),
+        )
+
+    def filter_fingerprints(self, fingerprints: Sequence[int], ext: str) -> Sequence[int]:
+        """
+        Returns the given fingerprints without the ones that are found in the starter code.
+        """
+        baseline = self.fingerprints.get(ext)
+        if not baseline:
+            return fingerprints
+        return array("Q", (fingerprint for fingerprint in fingerprints if fingerprint not in baseline))
+
+
+def build_baseline(baseline: RequirementBaseline, profile: str = TokenProfile.ALL) -> Baseline:
+    """
+    Parses the starter code archive of a requirement under one of the tokenization profiles.
+
+    Raises `zipfile.BadZipfile` or `FileNotFoundError` if the archive can't be read.
+    """
+    digests = []
+    kgrams = defaultdict(set)
+    fingerprints = defaultdict(set)
+    languages = {}
+    for path, ext, source in sorted(iter_archive_sources(baseline.baseline_zip.file, languages=languages)):
+        digests.append(f"{path}:{hashlib.sha256(source.encode('utf-8')).hexdigest()}")
+        types = tokenize_file(source=source, ext=ext, profile=profile).types
+        kgrams[ext].update(hash_kgrams(types, k=settings.PLAG_BASELINE_MIN_MATCH_LENGTH))
+        fingerprints[ext].update(hash_kgrams(types, k=settings.PLAG_WINNOWING_K))
+
+    return Baseline(
+        digest=hashlib.sha256("\n".join(digests).encode("utf-8")).hexdigest(),
+        kgrams=dict(kgrams),
+        fingerprints=dict(fingerprints),
+        languages=languages,
+    )
+
+
+# Parsed starter code by (archive name, index version, profile), see `get_requirement_baseline`
+_baselines: Dict[Tuple[str, int, str], Baseline] = {}
+_baselines_lock = threading.Lock()
+
+
+def get_requirement_baseline(requirement_id, profile: str = TokenProfile.ALL) -> Optional[Baseline]:
+    """
+    Returns the starter code of the given requirement uid under a tokenization profile, or none if it doesn't have
+    any. The starter code archive is only parsed once per process and profile, until any of its languages changes.
+
+    Raises `zipfile.BadZipfile` or `FileNotFoundError` if the archive can't be read.
+    """
+    baseline = RequirementBaseline._default_manager.filter(requirement_id=requirement_id).first()
+    if baseline is None:
+        return None
+
+    key = (baseline.baseline_zip.name, INDEX_VERSION, profile)
+    with _baselines_lock:
+        parsed = _baselines.get(key)
+    if parsed is None or are_languages_stale(parsed.languages):
+        parsed = build_baseline(baseline, profile=profile)
+        with _baselines_lock:
+            _baselines[key] = parsed
+    return parsed
@@ -0,0 +1,57 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class SourceCache:
+    """
+    Least recently used cache of decoded project sources, bounded by the memory taken by the cached sources.
+
+    :max_size: maximum total size in bytes of the cached sources, sources larger than it are never cached
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self._sources: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """
+        Returns a cached source, marking it as the most recently used, or none if it isn't cached.
+        """
+        with self._lock:
+            source = self._sources.get(key)
+            if source is not None:
+                self._sources.move_to_end(key)
+            return source
+
+    def set(self, key: Hashable, source: str) -> None:
+        """
+        Caches a source, evicting the least recently used sources until it fits.
+        """
+        source_size = sys.getsizeof(source)
+        if source_size > self.max_size:
+            return
+
+        with self._lock:
+            previous = self._sources.pop(key, None)
+            if previous is not None:
+                self.size -= sys.getsizeof(previous)
+            while self._sources and self.size + source_size > self.max_size:
+                _, evicted = self._sources.popitem(last=False)
+                self.size -= sys.getsizeof(evicted)
+            self._sources[key] = source
+            self.size += source_size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sources.clear()
+            self.size = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._sources
+
+    def __len__(self) -> int:
+        return len(self._sources)
@@ -0,0 +1,99 @@
+class PlagiarismJobStatus:
+    """
+    Class that represents the possible plagiarism job statuses.
+    """
+
+    PENDING: str = "Pending"
+    RUNNING: str = "Running"
+    SUCCEEDED: str = "Succeeded"
+    FAILED: str = "Failed"
+
+    STATUS_CHOICES: tuple = (
+        (PENDING, PENDING),
+        (RUNNING, RUNNING),
+        (SUCCEEDED, SUCCEEDED),
+        (FAILED, FAILED),
+    )
+    STATUS_LIST: list = [value for value, display in STATUS_CHOICES]
+
+
+class PlagiarismEngine:
+    """
+    Class that represents the available token sequence matching engines.
+    """
+
+    DIFFLIB: str = "difflib"
+    GREEDY_STRING_TILING: str = "greedy_string_tiling"
+
+    ENGINE_CHOICES: tuple = (
+        (DIFFLIB, "Difflib sequence matching"),
+        (GREEDY_STRING_TILING, "Greedy string tiling"),
+    )
+    ENGINE_LIST: list = [value for value, display in ENGINE_CHOICES]
+
+
+class PrefilterTier:
+    """
+    Class that represents the tiers pairs of files go through before being compared, cheapest first.
+    """
+
+    FINGERPRINTS: str = "fingerprints"  # Too few shared winnowed fingerprints
+    LENGTH: str = "length"  # Too different lengths
+    HISTOGRAM: str = "histogram"  # Too different coarse token type histograms
+    QUICK: str = "quick"  # Too few common tokens regardless of order, like `SequenceMatcher.quick_ratio`
+    FULL: str = "full"  # Fully compared
+
+    TIER_LIST: list = [FINGERPRINTS, LENGTH, HISTOGRAM, QUICK, FULL]
+
+
+class TokenProfile:
+    """
+    Class that represents the ways files can be tokenized, every profile is stored once per file content.
+    """
+
+    ALL: str = "all"  # Every node, including punctuation
+    NAMED: str = "named"  # Named nodes only
+    LEAF: str = "leaf"  # Leaf nodes only, i.e the lexical tokens
+    STATEMENT: str = "statement"  # Statement nodes only, the shape of the program
+
+    PROFILE_CHOICES: tuple = (
+        (ALL, "Every syntax tree node"),
+        (NAMED, "Named syntax tree nodes"),
+        (LEAF, "Leaf syntax tree nodes"),
+        (STATEMENT, "Statement level shape"),
+    )
+    PROFILE_LIST: list = [value for value, display in PROFILE_CHOICES]
+    # Node type suffixes of the statements of every supported language
+    STATEMENT_SUFFIXES: tuple = ("_statement", "_definition", "_declaration", "_clause")
+
+
+class PlagiarismScope:
+    """
+    Class that represents the projects a project is checked against.
+    """
+
+    REQUIREMENT: str = "requirement"  # Other projects of the same requirement
+    OWNER: str = "owner"  # Other projects of every course of the same course owner
+    COURSES: str = "courses"  # Other projects of a chosen set of courses
+
+    SCOPE_CHOICES: tuple = (
+        (REQUIREMENT, "Projects of the same requirement"),
+        (OWNER, "Projects of every course of the same owner"),
+        (COURSES, "Projects of the chosen courses"),
+    )
+    SCOPE_LIST: list = [value for value, display in SCOPE_CHOICES]
+
+
+class CompareFormat:
+    """
+    Class that represents the ways compared files are returned in.
+    """
+
+    TEXT: str = "text"  # Both files re-rendered with their matched regions marked
+    REGIONS: str = "regions"  # Only the byte offsets of the matched regions, clients mark the files themselves
+
+    FORMAT_CHOICES: tuple = (
+        (TEXT, "Marked file contents"),
+        (REGIONS, "Matched byte offsets"),
+    )
+    FORMAT_LIST: list = [value for value, display in FORMAT_CHOICES]
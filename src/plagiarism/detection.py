@@ -0,0 +1,414 @@
+import heapq
+import zipfile
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db.models import F
+
+from courses.models import Project, ProjectRequirement
+from .sources import Matcher
+from .index import INDEX_VERSION, are_languages_stale, get_project_files, get_projects_files, get_files_fingerprints
+from .models import ProjectIndex, ProjectFileIndex
+from .search import find_candidate_sources
+from .constants import PrefilterTier, TokenProfile
+from .results import iter_pair_ratios
+from .baseline import Baseline, get_requirement_baseline
+from .fingerprints import FingerprintIndex, load_fingerprints, jaccard_lower_bound
+
+
+def condensed_index(i: int, j: int, size: int) -> int:
+    """
+    Returns the position of the (i, j) pair of a symmetric `size` x `size` matrix in its condensed upper triangle,
+    which lists the pairs above the diagonal row by row.
+    """
+    if i > j:
+        i, j = j, i
+    return size * i - i * (i + 1) // 2 + (j - i - 1)
+
+
+def get_baseline(requirement_id, profile: str) -> Optional[Baseline]:
+    """
+    Returns the starter code of the given requirement uid under a tokenization profile, or none if it doesn't have
+    any or it can't be read.
+    """
+    try:
+        return get_requirement_baseline(requirement_id, profile=profile)
+    except (zipfile.BadZipfile, FileNotFoundError):
+        return None  # Starter code that can't be read is left out rather than failing every detection
+
+
+def _get_fingerprints(
+    files: Iterable[ProjectFileIndex], baseline: Optional[Baseline], profile: str
+) -> Dict[int, Sequence[int]]:
+    # Fingerprints of the given files mapped by file id, without the ones of the starter code
+    files = list(files)
+    stored = get_files_fingerprints(files, profile=profile)
+    fingerprints = {}
+    for file in files:
+        fingerprints[file.id] = load_fingerprints(stored.get(file.source_id, b""))
+        if baseline is not None:
+            fingerprints[file.id] = baseline.filter_fingerprints(fingerprints[file.id], ext=file.ext)
+    return fingerprints
+
+
+def iter_project_plagiarism(
+    project: Project,
+    threshold: float,
+    progress: Optional[Callable[[int, int], None]] = None,
+    matcher: Optional[Matcher] = None,
+    top_k: Optional[int] = None,
+    stats: Optional[Counter] = None,
+    profile: str = TokenProfile.ALL,
+) -> Iterator[dict]:
+    """
+    Detects plagiarism for all the supported files in a project against the other projects in the same
+    requirement, yielding the result of each file as soon as it is computed.
+
+    Every yielded file has a `ratio` key only if it has matches that met the threshold.
+
+    :progress: optional callable that is called with (done files, total files) after every file
+
+    :matcher: matching engine the ratios are computed with, see `get_matcher`. Defaults to difflib
+
+    :top_k: if given, only the k best matches of every file are kept, best first. Pairs that can't beat the k-th
+        best match so far are ruled out by their ratio upper bounds without being compared
+
+    :stats: optional counter that's updated with the number of pairs every `PrefilterTier` ruled out or compared
+
+    :profile: tokenization profile the files are compared under, see `TokenProfile`
+    """
+    # Only look through the other projects in the same requirement
+    other_projects = list(
+        Project._default_manager.exclude(uid=project.uid).filter(team__requirement_id=project.team.requirement_id).all()
+    )
+
+    # Token sequences are parsed once per project upload and only loaded here
+    files = get_project_files(project)
+    other_files = get_projects_files(other_projects)
+    # Starter code handed out with the requirement isn't counted as plagiarism
+    baseline = get_baseline(project.team.requirement_id, profile=profile)
+
+    # Only pairs sharing enough fingerprints can reach the threshold, the rest are never aligned
+    fingerprints = _get_fingerprints(
+        [*files, *(other_file for project_files in other_files.values() for other_file in project_files)],
+        baseline=baseline,
+        profile=profile,
+    )
+    fingerprint_index = FingerprintIndex()
+    for project_files in other_files.values():
+        for other_file in project_files:
+            fingerprint_index.add(other_file.id, fingerprints[other_file.id])
+    min_jaccard = jaccard_lower_bound(threshold=threshold, factor=settings.PLAG_WINNOWING_OVERLAP_FACTOR)
+
+    # Collecting every pair that has to be compared up front so the comparisons can be split over processes
+    stats = stats if stats is not None else Counter()
+    pairs = []
+    for _file in files:
+        candidates = fingerprint_index.candidates(fingerprints[_file.id], min_jaccard=min_jaccard)
+        others = []
+        for other_project in other_projects:
+            for other_file in other_files.get(other_project.id, []):
+                if _file.ext != other_file.ext:
+                    continue
+                elif other_file.id in candidates:
+                    others.append((other_project, other_file))
+                else:
+                    stats[PrefilterTier.FINGERPRINTS] += 1
+        pairs.append(others)
+
+    # Pairs of contents that were compared by an earlier run, i.e before a re-upload, are reused
+    ratios = iter_pair_ratios(
+        file_pairs=[(_file, [other_file for _, other_file in others]) for _file, others in zip(files, pairs)],
+        matcher=matcher,
+        baseline=baseline,
+        top_k=top_k,
+        threshold=threshold,
+        stats=stats,
+        profile=profile,
+    )
+
+    # Projects whose archive couldn't be indexed
+    failures = [other_project for other_project in other_projects if other_project.id not in other_files]
+
+    yield from _iter_file_results(
+        files, pairs, ratios, failures=failures, threshold=threshold, top_k=top_k, progress=progress
+    )
+
+
+def iter_courses_plagiarism(
+    project: Project,
+    courses: Sequence,
+    threshold: float,
+    progress: Optional[Callable[[int, int], None]] = None,
+    matcher: Optional[Matcher] = None,
+    top_k: Optional[int] = None,
+    stats: Optional[Counter] = None,
+    profile: str = TokenProfile.ALL,
+) -> Iterator[dict]:
+    """
+    Detects plagiarism for all the supported files in a project against the other projects of every requirement of
+    the given courses, i.e assignments reused over the semesters, yielding the results like `iter_project_plagiarism`.
+
+    Other projects are never loaded, the candidates of every file are looked up in the persisted fingerprint index
+    instead. Only projects whose index is up to date are checked, the others are reported as failures until
+    `manage.py index_plagiarism` rebuilds them.
+
+    :courses: courses, or their uids, whose projects are checked against
+    """
+    files = get_project_files(project)
+    # Starter code handed out with the project's own requirement isn't counted as plagiarism
+    baseline = get_baseline(project.team.requirement_id, profile=profile)
+    fingerprints = _get_fingerprints(files, baseline=baseline, profile=profile)
+    min_jaccard = jaccard_lower_bound(threshold=threshold, factor=settings.PLAG_WINNOWING_OVERLAP_FACTOR)
+
+    indexes = ProjectIndex._default_manager.filter(
+        version=INDEX_VERSION, project_zip=F("project__project_zip"), project__team__requirement__course__in=courses
+    ).values_list("id", "languages")
+    # Indexes are only stale when one of their own languages changed, see `is_index_stale`
+    current = [index_id for index_id, languages in indexes if not are_languages_stale(languages)]
+    others = (
+        ProjectFileIndex._default_manager.filter(index__in=current)
+        .exclude(index__project=project)
+        .select_related("source", "index__project")
+        .defer("source__tokens")
+    )
+
+    stats = stats if stats is not None else Counter()
+    pairs = []
+    for _file in files:
+        sources = find_candidate_sources(
+            fingerprints[_file.id],
+            profile=profile,
+            min_jaccard=min_jaccard,
+            excluded=baseline.fingerprints.get(_file.ext) if baseline is not None else None,
+        )
+        candidates = others.filter(source_id__in=sources, ext=_file.ext).order_by("id") if sources else []
+        pairs.append([(other_file.index.project, other_file) for other_file in candidates])
+
+    ratios = iter_pair_ratios(
+        file_pairs=[(_file, [other_file for _, other_file in others]) for _file, others in zip(files, pairs)],
+        matcher=matcher,
+        baseline=baseline,
+        top_k=top_k,
+        threshold=threshold,
+        stats=stats,
+        profile=profile,
+    )
+
+    # Projects whose index is missing or stale
+    failures = list(
+        Project._default_manager.filter(team__requirement__course__in=courses)
+        .exclude(uid=project.uid)
+        .exclude(plagiarism_index__in=current)
+    )
+
+    yield from _iter_file_results(
+        files, pairs, ratios, failures=failures, threshold=threshold, top_k=top_k, progress=progress
+    )
+
+
+def _iter_file_results(
+    files: List[ProjectFileIndex],
+    pairs: List[List[Tuple[Project, ProjectFileIndex]]],
+    ratios: Iterable[List[Optional[float]]],
+    failures: List[Project],
+    threshold: float,
+    top_k: Optional[int],
+    progress: Optional[Callable[[int, int], None]],
+) -> Iterator[dict]:
+    # Results of every file given the (project, file) pairs it was compared against and their ratios
+    for done, (_file, others, file_ratios) in enumerate(zip(files, pairs, ratios), start=1):
+        _data = {"file": _file.path, "failures": failures, "matches": []}
+
+        for (other_project, other_file), plag_ratio in zip(others, file_ratios):
+            if plag_ratio is None or plag_ratio < threshold:
+                continue
+
+            _data["matches"].append(
+                {
+                    "project": other_project,
+                    "file": other_file.path,
+                    "ratio": plag_ratio,
+                    "project_title": other_project.title,
+                }
+            )
+
+        if top_k is not None:
+            _data["matches"] = heapq.nlargest(top_k, _data["matches"], key=lambda match: match["ratio"])
+
+        # Avg ratio for file matches
+        if _data["matches"]:
+            _data["ratio"] = sum(match["ratio"] for match in _data["matches"]) / len(_data["matches"])
+
+        if progress is not None:
+            progress(done, len(files))
+        yield _data
+
+
+def iter_plagiarism(project: Project, courses: Optional[Sequence] = None, **kwargs) -> Iterator[dict]:
+    """
+    Detects plagiarism for all the supported files in a project against its own requirement, or against every
+    requirement of the given courses, see `iter_project_plagiarism` and `iter_courses_plagiarism`.
+    """
+    if courses is None:
+        return iter_project_plagiarism(project=project, **kwargs)
+    return iter_courses_plagiarism(project=project, courses=courses, **kwargs)
+
+
+def detect_project_plagiarism(
+    project: Project,
+    threshold: float,
+    progress: Optional[Callable[[int, int], None]] = None,
+    matcher: Optional[Matcher] = None,
+    top_k: Optional[int] = None,
+    stats: Optional[Counter] = None,
+    profile: str = TokenProfile.ALL,
+    courses: Optional[Sequence] = None,
+) -> dict:
+    """
+    Detects plagiarism for all the supported files in a project and returns the data expected by
+    `ProjectPlagiarismResponseSerializer`.
+
+    :courses: if given, the project is checked against the projects of every requirement of these courses instead of
+        its own requirement, see `iter_courses_plagiarism`
+    """
+    data = {"files": []}
+
+    # For calculating avg ratio for files
+    total_ratio = 0
+    total_files = 0
+
+    for _data in iter_plagiarism(
+        project=project,
+        threshold=threshold,
+        progress=progress,
+        matcher=matcher,
+        top_k=top_k,
+        stats=stats,
+        profile=profile,
+        courses=courses,
+    ):
+        total_files += 1
+        if "ratio" in _data:
+            total_ratio += _data["ratio"]
+            data["files"].append(_data)
+
+    if total_files:
+        data["ratio"] = total_ratio / total_files
+    return data
+
+
+def detect_requirement_plagiarism(
+    requirement: ProjectRequirement,
+    threshold: float,
+    matcher: Optional[Matcher] = None,
+    stats: Optional[Counter] = None,
+    profile: str = TokenProfile.ALL,
+) -> dict:
+    """
+    Compares every pair of projects in a requirement exactly once and returns the data expected by
+    `RequirementPlagiarismResponseSerializer`.
+
+    The ratio of a pair of projects is the highest ratio of their files, or 0 if it's below the threshold. Pairs of
+    files that can't reach the threshold are ruled out by their fingerprints or ratio upper bounds without being
+    compared.
+
+    :stats: optional counter that's updated with the number of pairs every `PrefilterTier` ruled out or compared
+
+    :profile: tokenization profile the files are compared under, see `TokenProfile`
+    """
+    projects: List[Project] = list(Project._default_manager.filter(team__requirement=requirement).order_by("id"))
+    files = get_projects_files(projects)
+    # Starter code handed out with the requirement isn't counted as plagiarism
+    baseline = get_baseline(requirement.uid, profile=profile)
+    fingerprints = _get_fingerprints(
+        (_file for project_files in files.values() for _file in project_files), baseline=baseline, profile=profile
+    )
+
+    # Position of every file's project in the matrix
+    owners: Dict[int, int] = {}
+    fingerprint_index = FingerprintIndex()
+    for position, project in enumerate(projects):
+        for _file in files.get(project.id, []):
+            owners[_file.id] = position
+            fingerprint_index.add(_file.id, fingerprints[_file.id])
+    min_jaccard = jaccard_lower_bound(threshold=threshold, factor=settings.PLAG_WINNOWING_OVERLAP_FACTOR)
+
+    # Every file is only compared against the files of the projects after its own, so no pair is compared twice
+    files_by_id = {_file.id: _file for project_files in files.values() for _file in project_files}
+    stats = stats if stats is not None else Counter()
+    # Number of files of every extension in the projects after the current one
+    later_exts = Counter(_file.ext for _file in files_by_id.values())
+    pairs = []
+    for position, project in enumerate(projects):
+        later_exts.subtract(_file.ext for _file in files.get(project.id, []))
+        for _file in files.get(project.id, []):
+            candidates = fingerprint_index.candidates(fingerprints[_file.id], min_jaccard=min_jaccard)
+            others = sorted(
+                (other for other in candidates if owners[other] > position and files_by_id[other].ext == _file.ext),
+                key=lambda other: (owners[other], other),
+            )
+            stats[PrefilterTier.FINGERPRINTS] += later_exts[_file.ext] - len(others)
+            if others:
+                pairs.append((_file.id, others))
+
+    ratios = iter_pair_ratios(
+        file_pairs=[(files_by_id[file_id], [files_by_id[other] for other in others]) for file_id, others in pairs],
+        matcher=matcher,
+        baseline=baseline,
+        threshold=threshold,
+        stats=stats,
+        profile=profile,
+    )
+
+    size = len(projects)
+    matrix = [0.0] * (size * (size - 1) // 2)
+    best_files = {}
+    for (file_id, others), file_ratios in zip(pairs, ratios):
+        for other, plag_ratio in zip(others, file_ratios):
+            if plag_ratio is None or plag_ratio < threshold:
+                # Pruned pairs have no exact ratio, so every pair below the threshold is reported the same way
+                continue
+            index = condensed_index(owners[file_id], owners[other], size)
+            if plag_ratio > matrix[index]:
+                matrix[index] = plag_ratio
+                best_files[index] = (files_by_id[file_id], files_by_id[other])
+
+    maxima = [0.0] * size
+    suspicious = []
+    for i in range(size):
+        for j in range(i + 1, size):
+            plag_ratio = matrix[condensed_index(i, j, size)]
+            maxima[i] = max(maxima[i], plag_ratio)
+            maxima[j] = max(maxima[j], plag_ratio)
+            if plag_ratio >= threshold:
+                suspicious.append((i, j))
+    suspicious.sort(key=lambda pair: matrix[condensed_index(*pair, size)], reverse=True)
+
+    data = {
+        "projects": projects,
+        "matrix": matrix,
+        "pairs": [],
+        "maxima": [
+            {"project": project, "project_title": project.title, "ratio": plag_ratio}
+            for project, plag_ratio in zip(projects, maxima)
+        ],
+        # Projects whose archive couldn't be indexed
+        "failures": [project for project in projects if project.id not in files],
+    }
+    for i, j in suspicious:
+        index = condensed_index(i, j, size)
+        first_file, second_file = best_files[index]
+        data["pairs"].append(
+            {
+                "first_project": projects[i],
+                "first_project_title": projects[i].title,
+                "first_file": first_file.path,
+                "second_project": projects[j],
+                "second_project_title": projects[j].title,
+                "second_file": second_file.path,
+                "ratio": matrix[index],
+            }
+        )
+    return data
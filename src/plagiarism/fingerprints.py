@@ -0,0 +1,120 @@
+from array import array
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Sequence, Set
+
+# Karp-Rabin rolling hash parameters, a mersenne prime modulus keeps every hash within an unsigned 64 bit integer
+HASH_BASE: int = 1_000_003
+HASH_MODULUS: int = (1 << 61) - 1
+
+
+def hash_kgrams(values: Sequence[int], k: int) -> List[int]:
+    """
+    Takes a sequence of integer token values and returns the Karp-Rabin hash of every k-gram in order.
+    """
+    if len(values) < k:
+        return []
+
+    highest = pow(HASH_BASE, k - 1, HASH_MODULUS)
+    h = 0
+    for value in values[:k]:
+        h = (h * HASH_BASE + value) % HASH_MODULUS
+
+    hashes = [h]
+    for i in range(k, len(values)):
+        h = ((h - values[i - k] * highest) * HASH_BASE + values[i]) % HASH_MODULUS
+        hashes.append(h)
+    return hashes
+
+
+def winnow(values: Sequence[int], k: int, window: int) -> array:
+    """
+    Takes a sequence of integer token values and returns its MOSS style winnowed fingerprints as a sorted unique
+    array. Any match of at least `window + k - 1` tokens between two sequences is guaranteed to share a fingerprint.
+
+    :values: integer token values, i.e node type ids
+
+    :k: noise threshold, matches shorter than k tokens are ignored
+
+    :window: number of consecutive k-gram hashes to select a fingerprint from
+    """
+    hashes = hash_kgrams(values, k=k)
+    if not hashes:
+        return array("Q")
+
+    fingerprints = set()
+    selected = -1
+    for start in range(max(len(hashes) - window + 1, 1)):
+        current = hashes[start : start + window]  # noqa
+        # Rightmost minimal hash in the window, only recorded when the selection changes
+        position = start + len(current) - 1 - current[::-1].index(min(current))
+        if position != selected:
+            selected = position
+            fingerprints.add(hashes[position])
+    return array("Q", sorted(fingerprints))
+
+
+def dump_fingerprints(fingerprints: array) -> bytes:
+    """
+    Converts fingerprints into their stored representation
+    """
+    return fingerprints.tobytes()
+
+
+def load_fingerprints(fingerprints: bytes) -> array:
+    """
+    Converts a stored representation back into fingerprints
+    """
+    loaded = array("Q")
+    loaded.frombytes(fingerprints)
+    return loaded
+
+
+def jaccard_lower_bound(threshold: float, factor: float) -> float:
+    """
+    Converts a plagiarism ratio threshold into the minimum fingerprint Jaccard overlap that a pair needs to be
+    worth aligning. Plagiarism ratios behave like a Dice coefficient, Dice `t` corresponds to Jaccard `t / (2 - t)`,
+    which is then loosened by `factor` since fingerprints only sample the token sequences.
+    """
+    threshold = float(threshold)
+    return factor * threshold / (2 - threshold)
+
+
+class FingerprintIndex:
+    """
+    Inverted index from fingerprints to the files containing them, used to find candidate pairs without comparing
+    every file against every other file.
+    """
+
+    def __init__(self):
+        self._postings: Dict[int, List[Hashable]] = defaultdict(list)
+        self._sizes: Dict[Hashable, int] = {}
+
+    def add(self, key: Hashable, fingerprints: Iterable[int]) -> None:
+        """
+        Adds a file's unique fingerprints to the index under the given key.
+        """
+        size = 0
+        for fingerprint in fingerprints:
+            self._postings[fingerprint].append(key)
+            size += 1
+        self._sizes[key] = size
+
+    def candidates(self, fingerprints: Sequence[int], min_jaccard: float) -> Set[Hashable]:
+        """
+        Returns the keys of indexed files that can't be ruled out for the given fingerprints. Files without any
+        fingerprints (shorter than a single k-gram) can't be ruled out either way.
+        """
+        if not len(fingerprints) or min_jaccard <= 0:
+            return set(self._sizes.keys())
+
+        shared: Dict[Hashable, int] = defaultdict(int)
+        for fingerprint in fingerprints:
+            for key in self._postings.get(fingerprint, ()):
+                shared[key] += 1
+
+        candidates = {key for key, size in self._sizes.items() if not size}
+        for key, intersection in shared.items():
+            union = len(fingerprints) + self._sizes[key] - intersection
+            if intersection / union >= min_jaccard:
+                candidates.add(key)
+        return candidates
@@ -0,0 +1,422 @@
+import hashlib
+import zipfile
+import datetime
+import pathlib as pl
+from array import array
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from tree_sitter import Tree
+
+from courses.models import Project
+from .models import ProjectIndex, ProjectFileIndex, ParsedSource, ParsedSourceProfile, SourceFingerprint
+from .cache import SourceCache
+from .constants import TokenProfile
+from .fingerprints import winnow, dump_fingerprints, load_fingerprints
+from .sources import SupportedLanguages, parse_source
+from .tokens import Alphabet, TokenStream, parse_tree, parse_statements
+
+# Bump whenever the stored token format or the tokenization itself changes, stale indexes get rebuilt lazily
+INDEX_VERSION: int = 9
+
+# Decoded sources of the project files that were read by this process, see `get_file_source`
+source_cache = SourceCache(max_size=settings.PLAG_SOURCE_CACHE_SIZE)
+
+
+def get_source_key(project: Project, path: str) -> Tuple[str, str, str]:
+    """
+    Returns the source cache key of a project file, re-uploaded archives never share keys with older ones.
+    """
+    return str(project.uid), project.project_zip.name, path
+
+
+def get_ext_version(ext: str) -> Optional[str]:
+    """
+    Returns the version of the supported language of a file extension, none if it isn't supported or available. See
+    `SupportedLanguages.get_version`.
+    """
+    grammar = SupportedLanguages.get_grammar(ext)
+    if grammar is None:
+        return None
+    return SupportedLanguages.get_version(grammar.name)
+
+
+def iter_archive_sources(
+    archive: IO[bytes], languages: Optional[Dict[str, Optional[str]]] = None
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Takes a zip archive and yields (path, extension, source) for every non empty supported file in it.
+
+    :languages: optional dict that's updated with the version of the language of every registered file extension in
+        the archive, none if the language isn't available
+    """
+    with zipfile.ZipFile(archive, "r") as zfile:
+        for info in zfile.infolist():
+            fext = pl.Path(info.filename).suffix
+
+            # Checking if current object is a file and is a supported type
+            grammar = SupportedLanguages.get_grammar(fext)
+            if info.is_dir() or grammar is None:
+                continue
+            version = SupportedLanguages.get_version(grammar.name)
+            if languages is not None:
+                languages[grammar.name] = version
+            if version is None:
+                continue  # Language isn't available, i.e its library wasn't compiled
+
+            try:
+                source = zfile.read(info).decode("utf-8")
+            except UnicodeDecodeError:
+                continue  # Not a valid source file
+            if not len(source):
+                continue  # Ignore empty file
+            yield info.filename, fext, source
+
+
+def iter_project_sources(
+    project: Project, languages: Optional[Dict[str, Optional[str]]] = None
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Takes a project and yields (path, extension, source) for every non empty supported file in its archive.
+
+    :languages: see `iter_archive_sources`
+    """
+    for path, ext, source in iter_archive_sources(project.project_zip.file, languages=languages):
+        # Sources are usually viewed right after being indexed, i.e the compare view
+        source_cache.set(get_source_key(project=project, path=path), source)
+        yield path, ext, source
+
+
+def get_file_source(project: Project, path: str) -> str:
+    """
+    Returns the source code of a specific project file, only reading the project archive if it isn't cached.
+
+    Raises `KeyError` if the file isn't in the archive or `UnicodeDecodeError` if it isn't a valid source file.
+    """
+    key = get_source_key(project=project, path=path)
+    source = source_cache.get(key)
+    if source is None:
+        with zipfile.ZipFile(project.project_zip.file, "r") as zfile:
+            source = zfile.read(path).decode("utf-8")
+        source_cache.set(key, source)
+    return source
+
+
+def tokenize_tree(tree: Tree, ext: str, profile: str = TokenProfile.ALL) -> TokenStream:
+    """
+    Takes the syntax tree of a program, its file extension and one of the tokenization profiles and returns its
+    tokens.
+    """
+    alphabet = SupportedLanguages.get_alphabet(ext=ext)
+    if profile == TokenProfile.NAMED:
+        return parse_tree(tree.walk(), alphabet=alphabet, child_only=False, is_named=True)
+    elif profile == TokenProfile.LEAF:
+        return parse_tree(tree.walk(), alphabet=alphabet, child_only=True)
+    elif profile == TokenProfile.STATEMENT:
+        suffixes = SupportedLanguages.get_grammar(ext).statement_suffixes
+        return parse_statements(tree.walk(), alphabet=alphabet, suffixes=suffixes)
+    return parse_tree(tree.walk(), alphabet=alphabet, child_only=False)
+
+
+def tokenize_file(source: str, ext: str, profile: str = TokenProfile.ALL) -> TokenStream:
+    """
+    Takes a program source code, a supported file extension and one of the tokenization profiles and returns its
+    tokens.
+    """
+    return tokenize_tree(parse_source(source=source, ext=ext), ext=ext, profile=profile)
+
+
+def tokenize_file_profiles(source: str, ext: str) -> Dict[str, TokenStream]:
+    """
+    Takes a program source code and a supported file extension and returns its tokens under every tokenization
+    profile, parsing it once.
+    """
+    tree = parse_source(source=source, ext=ext)
+    return {profile: tokenize_tree(tree, ext=ext, profile=profile) for profile in TokenProfile.PROFILE_LIST}
+
+
+def dump_tokens(tokens: TokenStream) -> bytes:
+    """
+    Converts tokens into their stored representation, the packed arrays of type ids, start offsets and end offsets
+    """
+    return tokens.types.tobytes() + tokens.starts.tobytes() + tokens.ends.tobytes()
+
+
+def load_tokens(tokens: bytes, alphabet: Alphabet) -> TokenStream:
+    """
+    Converts a stored representation back into tokens
+    """
+    loaded = TokenStream(alphabet=alphabet)
+    # Every token takes a type id and two offsets
+    size = len(tokens) // (loaded.types.itemsize + loaded.starts.itemsize + loaded.ends.itemsize)
+    offset = 0
+    for values in (loaded.types, loaded.starts, loaded.ends):
+        values.frombytes(tokens[offset : offset + size * values.itemsize])  # noqa
+        offset += size * values.itemsize
+    return loaded
+
+
+def get_files_tokens(files: Iterable[ProjectFileIndex], profile: str = TokenProfile.ALL) -> Dict[int, TokenStream]:
+    """
+    Returns the tokens of the given indexed files under a tokenization profile mapped by their parsed source id,
+    loading every shared source once.
+    """
+    source_ids = {file.source_id for file in files}
+    if profile == TokenProfile.ALL:
+        stored = ParsedSource._default_manager.filter(id__in=source_ids).values_list("id", "ext", "tokens")
+    else:
+        stored = ParsedSourceProfile._default_manager.filter(source_id__in=source_ids, profile=profile).values_list(
+            "source_id", "source__ext", "tokens"
+        )
+    return {
+        source_id: load_tokens(tokens=tokens, alphabet=SupportedLanguages.get_alphabet(ext=ext))
+        for source_id, ext, tokens in stored
+    }
+
+
+def get_files_fingerprints(files: Iterable[ProjectFileIndex], profile: str = TokenProfile.ALL) -> Dict[int, bytes]:
+    """
+    Returns the stored fingerprints of the given indexed files under a tokenization profile mapped by their parsed
+    source id.
+    """
+    files = list(files)
+    if profile == TokenProfile.ALL:
+        return {file.source_id: file.source.fingerprints for file in files}
+    stored = ParsedSourceProfile._default_manager.filter(
+        source_id__in={file.source_id for file in files}, profile=profile
+    ).values_list("source_id", "fingerprints")
+    return dict(stored)
+
+
+def fingerprint_tokens(tokens: TokenStream) -> bytes:
+    """
+    Returns the stored representation of the winnowed fingerprints of the given tokens.
+    """
+    fingerprints = winnow(tokens.types, k=settings.PLAG_WINNOWING_K, window=settings.PLAG_WINNOWING_WINDOW)
+    return dump_fingerprints(fingerprints)
+
+
+def get_source_digest(source: str) -> str:
+    """
+    Returns the content address of a source, identical files share it whatever project or path they're in.
+    """
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def build_parsed_source(digest: str, ext: str, source: str) -> Tuple[ParsedSource, List[ParsedSourceProfile]]:
+    """
+    Parses a single source into an unsaved parsed source and its unsaved other tokenization profiles.
+    """
+    profiles = tokenize_file_profiles(source=source, ext=ext)
+    tokens = profiles.pop(TokenProfile.ALL)
+    parsed = ParsedSource(
+        digest=digest,
+        ext=ext,
+        version=INDEX_VERSION,
+        alphabet=get_ext_version(ext),
+        tokens=dump_tokens(tokens),
+        fingerprints=fingerprint_tokens(tokens),
+    )
+    return parsed, [
+        ParsedSourceProfile(profile=profile, tokens=dump_tokens(tokens), fingerprints=fingerprint_tokens(tokens))
+        for profile, tokens in profiles.items()
+    ]
+
+
+def build_postings(source_id: int, profile: str, fingerprints: bytes) -> List[SourceFingerprint]:
+    """
+    Returns the unsaved fingerprint index entries of a parsed source under a tokenization profile.
+    """
+    return [
+        SourceFingerprint(source_id=source_id, profile=profile, fingerprint=fingerprint)
+        for fingerprint in load_fingerprints(fingerprints)
+    ]
+
+
+def get_parsed_sources(sources: Dict[Tuple[str, str], str]) -> Dict[Tuple[str, str], ParsedSource]:
+    """
+    Returns the parsed sources of the given {(digest, extension): source} mapped by (digest, extension), only parsing
+    the contents that no project indexed before.
+    """
+
+    # Stored type ids are only valid for the version of their language they were parsed with
+    versions = {ext: get_ext_version(ext) for _, ext in sources}
+
+    def _load(keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], ParsedSource]:
+        digests = {digest for digest, _ in keys}
+        stored = ParsedSource._default_manager.defer("tokens", "fingerprints").filter(
+            digest__in=digests, version=INDEX_VERSION, ext__in=versions.keys()
+        )
+        return {
+            (parsed.digest, parsed.ext): parsed
+            for parsed in stored
+            if (parsed.digest, parsed.ext) in sources and parsed.alphabet == versions[parsed.ext]
+        }
+
+    parsed = _load(sources.keys())
+    missing = {
+        (digest, ext): build_parsed_source(digest, ext, sources[digest, ext])
+        for digest, ext in sources
+        if (digest, ext) not in parsed
+    }
+    if missing:
+        # Concurrent uploads may parse the same content meanwhile, either row is as good
+        ParsedSource._default_manager.bulk_create([new for new, _ in missing.values()], ignore_conflicts=True)
+        parsed.update(_load(missing.keys()))
+
+        profiles = []
+        # Fingerprints of every profile are also indexed, so files of other requirements can be looked up by them
+        postings = []
+        for key, (new, new_profiles) in missing.items():
+            postings.extend(build_postings(parsed[key].id, TokenProfile.ALL, new.fingerprints))
+            for profile in new_profiles:
+                profile.source = parsed[key]
+                profiles.append(profile)
+                postings.extend(build_postings(parsed[key].id, profile.profile, profile.fingerprints))
+        ParsedSourceProfile._default_manager.bulk_create(profiles, ignore_conflicts=True)
+        SourceFingerprint._default_manager.bulk_create(postings, batch_size=1000, ignore_conflicts=True)
+    return parsed
+
+
+def is_index_stale(index: ProjectIndex, project: Project) -> bool:
+    """
+    Checks if the given index no longer represents the current project archive.
+    """
+    if index.version != INDEX_VERSION or index.project_zip != project.project_zip.name:
+        return True
+    return are_languages_stale(index.languages)
+
+
+def are_languages_stale(languages: Dict[str, Optional[str]]) -> bool:
+    """
+    Checks if any of the given {language: version} of an index changed, i.e its library was recompiled or became
+    available. Languages the index doesn't contain never make it stale.
+    """
+    # Stored type ids are only valid for the languages they were parsed with
+    return any(SupportedLanguages.get_version(language) != version for language, version in languages.items())
+
+
+def build_project_index(project: Project) -> ProjectIndex:
+    """
+    (Re)builds the plagiarism index of the given project by parsing every supported file once.
+
+    Raises `zipfile.BadZipfile` or `FileNotFoundError` if the project archive can't be read.
+    """
+    files = []
+    sources = {}
+    languages = {}
+    for path, ext, source in iter_project_sources(project, languages=languages):
+        digest = get_source_digest(source)
+        # Identical files, i.e copies of the starter code, are parsed once across every project
+        sources[digest, ext] = source
+        files.append(ProjectFileIndex(path=path, ext=ext, digest=digest))
+    parsed = get_parsed_sources(sources)
+
+    with transaction.atomic():
+        # Sources stay locked until the files using them are committed, so they can't be collected meanwhile
+        ids = {source.id for source in parsed.values()}
+        locked = set(ParsedSource._default_manager.select_for_update().filter(id__in=ids).values_list("id", flat=True))
+        collected = {key: sources[key] for key, source in parsed.items() if source.id not in locked}
+        if collected:
+            parsed.update(get_parsed_sources(collected))
+
+        ProjectIndex._default_manager.filter(project=project).delete()
+        index = ProjectIndex._default_manager.create(
+            project=project,
+            project_zip=project.project_zip.name,
+            version=INDEX_VERSION,
+            languages=languages,
+        )
+        for file in files:
+            file.index = index
+            file.source = parsed[file.digest, file.ext]
+        ProjectFileIndex._default_manager.bulk_create(files)
+    return index
+
+
+def collect_parsed_sources(min_age: datetime.timedelta, batch_size: int = 500) -> int:
+    """
+    Deletes the parsed sources that no indexed file uses anymore, i.e their projects were re-uploaded or deleted, and
+    returns how many were deleted.
+
+    Sources parsed within `min_age` are kept since the indexes using them may not be committed yet, sources locked by
+    indexes being built are skipped.
+    """
+    cutoff = timezone.now() - min_age
+    unused = ~Exists(ProjectFileIndex._default_manager.filter(source=OuterRef("pk")))
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                ParsedSource._default_manager.select_for_update(skip_locked=True)
+                .filter(unused, created_at__lt=cutoff)
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted
+            # Checked again once locked, an index may have been committed since they were looked up
+            _, counts = ParsedSource._default_manager.filter(unused, id__in=ids).delete()
+            deleted += counts.get(ParsedSource._meta.label, 0)
+
+
+def get_project_index(project: Project) -> ProjectIndex:
+    """
+    Returns an up to date plagiarism index of the given project, building it if needed.
+    """
+    index = ProjectIndex._default_manager.filter(project=project).first()
+    if index is None or is_index_stale(index=index, project=project):
+        index = build_project_index(project)
+    return index
+
+
+def get_project_files(project: Project) -> List[ProjectFileIndex]:
+    """
+    Returns the indexed files of the given project in archive order.
+    """
+    return list(get_project_index(project).files.select_related("source").defer("source__tokens").order_by("id"))
+
+
+def get_projects_files(projects: Iterable[Project]) -> Dict[int, List[ProjectFileIndex]]:
+    """
+    Returns the indexed files of the given projects in archive order mapped by project id, building any
+    missing or stale indexes. Projects whose archive can't be read are left out.
+    """
+    projects = list(projects)
+    indexes = {index.project_id: index for index in ProjectIndex._default_manager.filter(project__in=projects)}
+
+    index_ids = {}
+    for project in projects:
+        index = indexes.get(project.uid)
+        if index is None or is_index_stale(index=index, project=project):
+            try:
+                index = build_project_index(project)
+            except (zipfile.BadZipfile, FileNotFoundError):
+                continue
+        index_ids[index.id] = project.id
+
+    files = {project_id: [] for project_id in index_ids.values()}
+    stored = ProjectFileIndex._default_manager.filter(index_id__in=index_ids.keys()).select_related("source")
+    for file in stored.defer("source__tokens").order_by("id"):
+        files[index_ids[file.index_id]].append(file)
+    return files
+
+
+def get_file_index(project: Project, path: str) -> Optional[ProjectFileIndex]:
+    """
+    Returns the index of a specific project file, or none if the file wasn't indexed.
+    """
+    return get_project_index(project).files.filter(path=path).first()
+
+
+def get_file_tokens(project: Project, path: str, profile: str = TokenProfile.ALL) -> TokenStream:
+    """
+    Returns the indexed tokens of a specific project file under a tokenization profile, or no tokens if the file
+    wasn't indexed.
+    """
+    file = get_file_index(project=project, path=path)
+    if file is None:
+        return TokenStream(alphabet=SupportedLanguages.get_alphabet(ext=pl.Path(path).suffix))
+    return get_files_tokens([file], profile=profile)[file.source_id]
@@ -0,0 +1,148 @@
+import time
+import logging
+import datetime
+import threading
+from collections import Counter
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .constants import PlagiarismJobStatus, PrefilterTier
+from .models import PlagiarismJob
+from .detection import detect_project_plagiarism, detect_requirement_plagiarism
+from .sources import get_matcher
+from .serializers import ProjectPlagiarismResponseSerializer, RequirementPlagiarismResponseSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def claim_job() -> Optional[PlagiarismJob]:
+    """
+    Marks the oldest pending job as running and returns it, jobs locked by other workers are skipped.
+
+    Running jobs whose worker stopped sending heartbeats, i.e it crashed or was redeployed, are claimed again. Jobs
+    that were already claimed `PLAG_JOB_MAX_ATTEMPTS` times are failed instead, since they keep taking their workers
+    down with them.
+    """
+    now = timezone.now()
+    cutoff = now - datetime.timedelta(seconds=settings.PLAG_JOB_TIMEOUT)
+    # Jobs claimed before heartbeats were sent only have their start time
+    stale = Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    while True:
+        with transaction.atomic():
+            job = (
+                PlagiarismJob._default_manager.select_for_update(skip_locked=True)
+                .filter(Q(status=PlagiarismJobStatus.PENDING) | Q(stale, status=PlagiarismJobStatus.RUNNING))
+                .order_by("created_at")
+                .first()
+            )
+            if job is None:
+                return None
+
+            if job.attempts >= settings.PLAG_JOB_MAX_ATTEMPTS:
+                logger.error("Plagiarism job %s was interrupted %s times, failing it", job.uid, job.attempts)
+                job.status = PlagiarismJobStatus.FAILED
+                job.error = "Plagiarism job was interrupted too many times."
+                job.finished_at = now
+                job.save(update_fields=["status", "error", "finished_at"])
+                continue
+
+            job.status = PlagiarismJobStatus.RUNNING
+            job.started_at = job.heartbeat_at = now
+            job.attempts += 1
+            job.save(update_fields=["status", "started_at", "heartbeat_at", "attempts"])
+        return job
+
+
+class Heartbeat(threading.Thread):
+    """
+    Thread that marks a running job as alive every `PLAG_JOB_HEARTBEAT_INTERVAL` seconds until it's stopped.
+    """
+
+    def __init__(self, job: PlagiarismJob):
+        super().__init__(name=f"plagiarism-heartbeat-{job.uid}", daemon=True)
+        self.job_id = job.pk
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        try:
+            while not self.stopped.wait(settings.PLAG_JOB_HEARTBEAT_INTERVAL):
+                PlagiarismJob._default_manager.filter(pk=self.job_id, status=PlagiarismJobStatus.RUNNING).update(
+                    heartbeat_at=timezone.now()
+                )
+        finally:
+            # Every thread has a database connection of its own
+            connection.close()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.join()
+
+
+def run_job(job: PlagiarismJob) -> None:
+    """
+    Runs a claimed job to completion, recording its progress, result or failure.
+    """
+
+    def _progress(done: int, total: int) -> None:
+        PlagiarismJob._default_manager.filter(pk=job.pk).update(progress=done, total=total)
+
+    stats = Counter()
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        matcher = get_matcher(engine=job.engine, min_match_length=job.min_match_length)
+        if job.requirement_id is not None:
+            data = detect_requirement_plagiarism(
+                requirement=job.requirement, threshold=job.threshold, matcher=matcher, stats=stats, profile=job.profile
+            )
+            job.result = RequirementPlagiarismResponseSerializer(data).data
+        else:
+            data = detect_project_plagiarism(
+                project=job.project,
+                threshold=job.threshold,
+                progress=_progress,
+                matcher=matcher,
+                top_k=job.top_k,
+                stats=stats,
+                profile=job.profile,
+                courses=job.courses,
+            )
+            job.result = ProjectPlagiarismResponseSerializer(data).data
+        job.status = PlagiarismJobStatus.SUCCEEDED
+    except Exception:  # Any failure must be reported back instead of leaving the job running
+        logger.exception("Plagiarism job %s failed", job.uid)
+        # Errors are shown to the requester, their details are only logged
+        job.error = "An unexpected error happened while detecting plagiarism."
+        job.status = PlagiarismJobStatus.FAILED
+    finally:
+        heartbeat.stop()
+
+    job.stats = {tier: stats[tier] for tier in PrefilterTier.TIER_LIST}
+    job.finished_at = timezone.now()
+    fields = ["result", "stats", "status", "error", "finished_at"]
+    # Jobs are deleted along with their project or requirement, which may happen while they run
+    updated = PlagiarismJob._default_manager.filter(pk=job.pk).update(
+        **{field: getattr(job, field) for field in fields}
+    )
+    if not updated:
+        logger.warning("Plagiarism job %s was deleted while it ran, dropping its result", job.uid)
+
+
+def work(poll_interval: float, once: bool = False) -> None:
+    """
+    Claims and runs pending jobs forever, sleeping for `poll_interval` seconds whenever the queue is empty.
+
+    :once: if to return as soon as the queue is empty instead
+    """
+    while True:
+        job = claim_job()
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
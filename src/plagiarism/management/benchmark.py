@@ -0,0 +1,605 @@
+"""
+Synthetic cohorts and timings for benchmarking plagiarism detection, see `manage.py benchmark_plagiarism`. Kept out of
+the app modules, so serving requests never loads it.
+
+Programs are generated as small trees of statements first, so that they can be mutated the way students usually
+disguise copies, i.e renaming identifiers, reordering functions and inserting dead code, before being rendered as
+Python or JavaScript sources.
+"""
+import io
+import random
+import statistics
+import time
+import uuid
+import zipfile
+from datetime import timedelta
+from itertools import combinations
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from courses.models import Course, CourseTeacher, Project, ProjectRequirement, Team
+from plagiarism.constants import PlagiarismEngine, TokenProfile
+from plagiarism.index import tokenize_file
+from plagiarism.sources import Matcher, get_matcher
+from plagiarism.tokens import TokenStream
+from plagiarism.views import ProjectPlagiarismView, ProjectPlagiarismCompareView
+
+# Operand of an expression, either an identifier or a number
+Operand = Union[str, int]
+# (operand, operator, operand)
+Expression = Tuple[Operand, str, Operand]
+# ("assign", target, expression), ("augment", target, operator, operand), ("if", expression, body),
+# ("for", variable, limit, body), ("call", function, arguments) or ("return", expression)
+Statement = tuple
+# (name, parameters, body)
+Function = Tuple[str, List[str], List[Statement]]
+Program = List[Function]
+
+IDENTIFIERS: List[str] = [
+    "total",
+    "count",
+    "value",
+    "index",
+    "items",
+    "result",
+    "left",
+    "right",
+    "node",
+    "size",
+    "step",
+    "limit",
+    "acc",
+    "key",
+    "data",
+    "offset",
+]
+FUNCTION_NAMES: List[str] = ["solve", "compute", "process", "update", "merge", "search", "build", "check", "reduce"]
+OPERATORS: List[str] = ["+", "-", "*", "%"]
+COMPARISONS: List[str] = ["<", ">", "==", "!="]
+
+SUPPORTED_EXTS: Tuple[str, ...] = (".py", ".js")
+
+
+class MutationRates:
+    """
+    Probabilities of the mutations applied to copied programs.
+
+    :rename: of renaming every identifier
+
+    :reorder: of moving every function elsewhere in the program
+
+    :dead_code: of inserting a dead statement after every statement
+    """
+
+    __slots__ = ("rename", "reorder", "dead_code")
+
+    def __init__(self, rename: float = 0.0, reorder: float = 0.0, dead_code: float = 0.0):
+        self.rename = rename
+        self.reorder = reorder
+        self.dead_code = dead_code
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"rename": self.rename, "reorder": self.reorder, "dead_code": self.dead_code}
+
+
+def _generate_expression(rng: random.Random, names: Sequence[str]) -> Expression:
+    right = rng.choice(names) if rng.random() < 0.5 else rng.randint(1, 9)
+    return rng.choice(names), rng.choice(OPERATORS), right
+
+
+def _generate_body(rng: random.Random, names: List[str], functions: Sequence[str], size: int, depth: int) -> list:
+    body = []
+    for _ in range(size):
+        kind = rng.random()
+        if kind < 0.3 or len(names) < 2:
+            target = rng.choice(IDENTIFIERS)
+            body.append(("assign", target, _generate_expression(rng, names)))
+            if target not in names:
+                names.append(target)
+        elif kind < 0.5:
+            body.append(("augment", rng.choice(names), rng.choice(OPERATORS[:3]), rng.randint(1, 9)))
+        elif kind < 0.65 and depth:
+            condition = (rng.choice(names), rng.choice(COMPARISONS), rng.randint(0, 9))
+            body.append(("if", condition, _generate_body(rng, names, functions, size=2, depth=depth - 1)))
+        elif kind < 0.8 and depth:
+            variable = rng.choice(IDENTIFIERS)
+            inner = _generate_body(rng, names + [variable], functions, size=2, depth=depth - 1)
+            body.append(("for", variable, rng.choice(names), inner))
+        elif functions:
+            body.append(("call", rng.choice(functions), rng.sample(names, 2)))
+        else:
+            body.append(("augment", rng.choice(names), "+", 1))
+    return body
+
+
+def generate_program(rng: random.Random, functions: int = 6, statements: int = 6) -> Program:
+    """
+    Generates a random program of the given number of functions with about the given number of statements each,
+    later functions call earlier ones.
+    """
+    program = []
+    for number in range(functions):
+        name = f"{rng.choice(FUNCTION_NAMES)}_{number}"
+        parameters = rng.sample(IDENTIFIERS, 2)
+        body = _generate_body(rng, list(parameters), [function[0] for function in program], statements, depth=2)
+        body.append(("return", _generate_expression(rng, parameters)))
+        program.append((name, parameters, body))
+    return program
+
+
+def _iter_names(body: list):
+    for statement in body:
+        kind = statement[0]
+        if kind in ("assign", "augment", "for"):
+            yield statement[1]
+        if kind in ("if", "for"):
+            yield from _iter_names(statement[-1])
+
+
+def _insert_dead_code(rng: random.Random, body: list, rate: float, counter: List[int]) -> list:
+    mutated = []
+    for statement in body:
+        if statement[0] in ("if", "for"):
+            statement = (*statement[:-1], _insert_dead_code(rng, statement[-1], rate, counter))
+        mutated.append(statement)
+        if statement[0] != "return" and rng.random() < rate:
+            counter[0] += 1
+            unused = f"unused_{counter[0]}"
+            if rng.random() < 0.5:
+                mutated.append(("assign", unused, (rng.randint(1, 9), rng.choice(OPERATORS), rng.randint(1, 9))))
+            else:
+                mutated.append(("if", (0, ">", 1), [("assign", unused, (0, "+", 1))]))
+    return mutated
+
+
+def mutate_program(rng: random.Random, program: Program, rates: MutationRates) -> Tuple[Program, Dict[str, str]]:
+    """
+    Returns a mutated copy of a program and the identifiers it renames, see `render_program`.
+    """
+    names = {name for function in program for name in (function[0], *function[1], *_iter_names(function[2]))}
+    renames = {name: f"{name}_{rng.randrange(10 ** 4)}" for name in sorted(names) if rng.random() < rates.rename}
+
+    mutated = list(program)
+    for position in range(len(mutated)):
+        if rng.random() < rates.reorder:
+            other = rng.randrange(len(mutated))
+            mutated[position], mutated[other] = mutated[other], mutated[position]
+
+    counter = [0]
+    mutated = [
+        (name, parameters, _insert_dead_code(rng, body, rates.dead_code, counter)) for name, parameters, body in mutated
+    ]
+    return mutated, renames
+
+
+def _render_expression(expression: Expression, renames: Dict[str, str]) -> str:
+    left, operator, right = (renames.get(part, part) if isinstance(part, str) else part for part in expression)
+    return f"{left} {operator} {right}"
+
+
+def _render_python(body: list, renames: Dict[str, str], indent: int) -> List[str]:
+    pad = "    " * indent
+    lines = []
+    for statement in body:
+        kind = statement[0]
+        name = renames.get(statement[1], statement[1]) if isinstance(statement[1], str) else statement[1]
+        if kind == "assign":
+            lines.append(f"{pad}{name} = {_render_expression(statement[2], renames)}")
+        elif kind == "augment":
+            lines.append(f"{pad}{name} {statement[2]}= {statement[3]}")
+        elif kind == "if":
+            lines.append(f"{pad}if {_render_expression(statement[1], renames)}:")
+            lines.extend(_render_python(statement[2], renames, indent + 1))
+        elif kind == "for":
+            lines.append(f"{pad}for {name} in range({renames.get(statement[2], statement[2])}):")
+            lines.extend(_render_python(statement[3], renames, indent + 1))
+        elif kind == "call":
+            lines.append(f"{pad}{name}({', '.join(renames.get(arg, arg) for arg in statement[2])})")
+        elif kind == "return":
+            lines.append(f"{pad}return {_render_expression(statement[1], renames)}")
+    return lines
+
+
+def _render_javascript(body: list, renames: Dict[str, str], indent: int) -> List[str]:
+    pad = "    " * indent
+    lines = []
+    for statement in body:
+        kind = statement[0]
+        name = renames.get(statement[1], statement[1]) if isinstance(statement[1], str) else statement[1]
+        if kind == "assign":
+            lines.append(f"{pad}var {name} = {_render_expression(statement[2], renames)};")
+        elif kind == "augment":
+            lines.append(f"{pad}{name} {statement[2]}= {statement[3]};")
+        elif kind == "if":
+            lines.append(f"{pad}if ({_render_expression(statement[1], renames)}) {{")
+            lines.extend(_render_javascript(statement[2], renames, indent + 1))
+            lines.append(f"{pad}}}")
+        elif kind == "for":
+            limit = renames.get(statement[2], statement[2])
+            lines.append(f"{pad}for (var {name} = 0; {name} < {limit}; {name}++) {{")
+            lines.extend(_render_javascript(statement[3], renames, indent + 1))
+            lines.append(f"{pad}}}")
+        elif kind == "call":
+            lines.append(f"{pad}{name}({', '.join(renames.get(arg, arg) for arg in statement[2])});")
+        elif kind == "return":
+            lines.append(f"{pad}return {_render_expression(statement[1], renames)};")
+    return lines
+
+
+def render_program(program: Program, ext: str, renames: Optional[Dict[str, str]] = None) -> str:
+    """
+    Renders a program as the source code of one of the supported file extensions, see `SUPPORTED_EXTS`.
+    """
+    renames = renames or {}
+    lines = []
+    for name, parameters, body in program:
+        name, parameters = renames.get(name, name), ", ".join(renames.get(param, param) for param in parameters)
+        if ext == ".py":
+            lines.append(f"def {name}({parameters}):")
+            lines.extend(_render_python(body, renames, indent=1))
+        elif ext == ".js":
+            lines.append(f"function {name}({parameters}) {{")
+            lines.extend(_render_javascript(body, renames, indent=1))
+            lines.append("}")
+        else:
+            raise ValueError(f"Unsupported extension {ext}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def generate_labeled_cohort(
+    projects: int,
+    files: int,
+    rates: Optional[MutationRates] = None,
+    copy_rate: float = 0.5,
+    exts: Sequence[str] = SUPPORTED_EXTS,
+    functions: int = 6,
+    statements: int = 6,
+    seed: int = 0,
+) -> Tuple[List[Dict[str, str]], List[Set[str]]]:
+    """
+    Generates the sources of a cohort of projects, every project is a {path: source} of the same paths, along with
+    the paths every project copied. Two projects' files at the same path are plagiarized if both copied it.
+
+    :copy_rate: probability of every project file being a mutated copy of a shared original instead of being
+        written independently
+
+    :exts: extensions the files cycle through
+    """
+    rng = random.Random(seed)
+    rates = rates or MutationRates()
+    paths = [f"src/module_{number}{exts[number % len(exts)]}" for number in range(files)]
+    originals = [generate_program(rng, functions=functions, statements=statements) for _ in paths]
+
+    cohort = []
+    copies = []
+    for _ in range(projects):
+        sources = {}
+        copied = set()
+        for path, original in zip(paths, originals):
+            ext = path[path.rindex(".") :]  # noqa
+            if rng.random() < copy_rate:
+                program, renames = mutate_program(rng, original, rates)
+                sources[path] = render_program(program, ext=ext, renames=renames)
+                copied.add(path)
+            else:
+                sources[path] = render_program(generate_program(rng, functions, statements), ext=ext)
+        cohort.append(sources)
+        copies.append(copied)
+    return cohort, copies
+
+
+def generate_cohort(*args, **kwargs) -> List[Dict[str, str]]:
+    """
+    Generates the sources of a cohort of projects, see `generate_labeled_cohort`.
+    """
+    return generate_labeled_cohort(*args, **kwargs)[0]
+
+
+def build_archive(sources: Dict[str, str]) -> bytes:
+    """
+    Returns the zip archive of a project of the given {path: source}.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zfile:
+        for path, source in sources.items():
+            zfile.writestr(path, source)
+    return buffer.getvalue()
+
+
+def _summarize(durations: List[float]) -> Dict[str, float]:
+    durations = sorted(durations)
+    return {
+        "median_seconds": statistics.median(durations),
+        "p95_seconds": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+    }
+
+
+def benchmark_parse(cohort: List[Dict[str, str]]) -> Tuple[Dict[str, float], List[Dict[str, TokenStream]]]:
+    """
+    Tokenizes every file of a cohort and returns the parse throughput and the tokens of every project.
+    """
+    # Languages are loaded once per process, which isn't part of the throughput
+    for ext in {path[path.rindex(".") :] for sources in cohort for path in sources}:  # noqa
+        tokenize_file(source="", ext=ext)
+
+    tokens = []
+    size = count = 0
+    start = time.perf_counter()
+    for sources in cohort:
+        project = {}
+        for path, source in sources.items():
+            project[path] = tokenize_file(source=source, ext=path[path.rindex(".") :])  # noqa
+            size += len(source)
+            count += len(project[path])
+        tokens.append(project)
+    seconds = time.perf_counter() - start
+
+    files = sum(len(sources) for sources in cohort)
+    return {
+        "files": files,
+        "tokens": count,
+        "seconds": seconds,
+        "files_per_second": files / seconds,
+        "tokens_per_second": count / seconds,
+        "bytes_per_second": size / seconds,
+    }, tokens
+
+
+def benchmark_matcher(
+    tokens: List[Dict[str, TokenStream]], matcher: Matcher, max_pairs: int = 2000, seed: int = 0
+) -> Dict[str, float]:
+    """
+    Matches the same files of different projects and returns the matcher throughput.
+
+    :max_pairs: maximum number of pairs to match, sampled from every pair of projects
+    """
+    pairs = [
+        (first[path].types, second[path].types)
+        for first, second in combinations(tokens, 2)
+        for path in first.keys() & second.keys()
+    ]
+    if len(pairs) > max_pairs:
+        pairs = random.Random(seed).sample(pairs, max_pairs)
+
+    count = 0
+    start = time.perf_counter()
+    for first, second in pairs:
+        matcher.ratio(first, second)
+        count += len(first) + len(second)
+    seconds = time.perf_counter() - start
+    return {
+        "pairs": len(pairs),
+        "seconds": seconds,
+        "pairs_per_second": len(pairs) / seconds if seconds else 0.0,
+        "tokens_per_second": count / seconds if seconds else 0.0,
+    }
+
+
+def calculate_auc(positives: Sequence[float], negatives: Sequence[float]) -> Optional[float]:
+    """
+    Returns the probability of a plagiarized pair having a higher ratio than an unrelated pair, i.e the area under
+    the ROC curve of the ratios regardless of the threshold. None if either kind of pair is missing.
+    """
+    if not positives or not negatives:
+        return None
+    ranked = sorted([(ratio, True) for ratio in positives] + [(ratio, False) for ratio in negatives])
+    # Sum of the (1 based) ranks of the positives, ties share the average of their ranks
+    rank_sum = 0.0
+    start = 0
+    while start < len(ranked):
+        end = start
+        while end < len(ranked) and ranked[end][0] == ranked[start][0]:
+            end += 1
+        tied_positives = sum(1 for _, positive in ranked[start:end] if positive)  # noqa
+        rank_sum += tied_positives * (start + end + 1) / 2
+        start = end
+    return (rank_sum - len(positives) * (len(positives) + 1) / 2) / (len(positives) * len(negatives))
+
+
+def benchmark_profiles(
+    cohort: List[Dict[str, str]],
+    copies: List[Set[str]],
+    matcher: Matcher,
+    profiles: Sequence[str] = TokenProfile.PROFILE_LIST,
+    max_pairs: int = 2000,
+    seed: int = 0,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Compares the same files of different projects under every tokenization profile and returns how much shorter
+    their token streams are, the matcher throughput and how well the ratios tell plagiarized pairs apart.
+
+    :copies: paths every project copied, see `generate_labeled_cohort`
+
+    :max_pairs: maximum number of pairs to match, the same pairs are sampled for every profile
+    """
+    pairs = [
+        (first, second, path)
+        for first, second in combinations(range(len(cohort)), 2)
+        for path in sorted(cohort[first].keys() & cohort[second].keys())
+    ]
+    if len(pairs) > max_pairs:
+        pairs = random.Random(seed).sample(pairs, max_pairs)
+
+    results = {}
+    for profile in profiles:
+        tokens = [
+            {
+                path: tokenize_file(source=source, ext=path[path.rindex(".") :], profile=profile).types  # noqa
+                for path, source in sources.items()
+            }
+            for sources in cohort
+        ]
+
+        positives, negatives = [], []
+        start = time.perf_counter()
+        for first, second, path in pairs:
+            ratio = matcher.ratio(tokens[first][path], tokens[second][path])
+            if path in copies[first] and path in copies[second]:
+                positives.append(ratio)
+            else:
+                negatives.append(ratio)
+        seconds = time.perf_counter() - start
+
+        results[profile] = {
+            "tokens": sum(len(types) for project in tokens for types in project.values()),
+            "pairs": len(pairs),
+            "seconds": seconds,
+            "pairs_per_second": len(pairs) / seconds if seconds else 0.0,
+        }
+        auc = calculate_auc(positives, negatives)
+        if auc is not None:
+            results[profile]["auc"] = auc
+
+    # How many times shorter every profile's token streams are than the ones of every node
+    if TokenProfile.ALL in results:
+        for profile in results:
+            results[profile]["reduction"] = results[TokenProfile.ALL]["tokens"] / max(results[profile]["tokens"], 1)
+    return results
+
+
+def create_cohort_projects(cohort: List[Dict[str, str]]) -> Tuple[object, List[Project]]:
+    """
+    Stores a cohort as the projects of a new requirement and returns a teacher of its course and the projects.
+    """
+    name = f"benchmark_{uuid.uuid4().hex[:12]}"
+    teacher = get_user_model()._default_manager.create_user(username=name, email=f"{name}@example.com", password=None)
+    course = Course._default_manager.create(owner=teacher, title="Benchmark", code="BENCH")
+    CourseTeacher._default_manager.create(teacher=teacher, course=course)
+    requirement = ProjectRequirement._default_manager.create(
+        course=course, title="Benchmark", to_dt=timezone.now() + timedelta(days=1)
+    )
+
+    projects = []
+    for number, sources in enumerate(cohort):
+        team = Team._default_manager.create(name=f"Team {number}", requirement=requirement)
+        project = Project(team=team, title=f"Project {number}")
+        project.project_zip.save(f"project_{number}.zip", ContentFile(build_archive(sources)), save=False)
+        project.save()
+        projects.append(project)
+    return teacher, projects
+
+
+def request_project_plagiarism(teacher, project: Project, **data) -> bytes:
+    """
+    Requests the plagiarism of a project through `ProjectPlagiarismView` and returns the rendered response.
+
+    :data: any other request data, i.e threshold or engine
+    """
+    request = APIRequestFactory().post("/", {"project": str(project.uid), **data}, format="json")
+    force_authenticate(request, user=teacher)
+    response = ProjectPlagiarismView.as_view()(request)
+    response.render()
+    if response.status_code != 200:
+        raise RuntimeError(f"Unexpected plagiarism response {response.status_code}: {response.content!r}")
+    return response.content
+
+
+def benchmark_view(teacher, projects: List[Project], repeat: int = 5, **data) -> Dict[str, float]:
+    """
+    Returns the end to end latency of `ProjectPlagiarismView` for the first project, the cold request indexes every
+    project while later ones reuse the indexes and stored ratios.
+
+    :data: any other request data, see `request_project_plagiarism`
+    """
+    durations = []
+    for _ in range(max(repeat, 1) + 1):
+        start = time.perf_counter()
+        request_project_plagiarism(teacher, projects[0], **data)
+        durations.append(time.perf_counter() - start)
+    return {"cold_seconds": durations[0], **_summarize(durations[1:])}
+
+
+def request_project_compare(teacher, first: Project, second: Project, path: str, **data) -> bytes:
+    """
+    Requests the comparison of the same file of two projects through `ProjectPlagiarismCompareView` and returns the
+    rendered response.
+
+    :data: any other request data, i.e engine or format
+    """
+    data = {"first_project": str(first.uid), "second_project": str(second.uid), "first_file": path, **data}
+    request = APIRequestFactory().post("/", {"second_file": path, **data}, format="json")
+    force_authenticate(request, user=teacher)
+    response = ProjectPlagiarismCompareView.as_view()(request)
+    response.render()
+    if response.status_code != 200:
+        raise RuntimeError(f"Unexpected compare response {response.status_code}: {response.content!r}")
+    return response.content
+
+
+def benchmark_compare_view(teacher, projects: List[Project], path: str, repeat: int = 5) -> Dict[str, float]:
+    """
+    Returns the end to end latency of `ProjectPlagiarismCompareView` for a file of the first two projects, the cold
+    request matches the files while later ones are served from the cache.
+    """
+    durations = []
+    for _ in range(max(repeat, 1) + 1):
+        start = time.perf_counter()
+        request_project_compare(teacher, projects[0], projects[1], path)
+        durations.append(time.perf_counter() - start)
+    return {"cold_seconds": durations[0], **_summarize(durations[1:])}
+
+
+def benchmark_cohort(
+    cohort: List[Dict[str, str]],
+    engines: Sequence[str] = PlagiarismEngine.ENGINE_LIST,
+    max_pairs: int = 2000,
+    view_repeat: int = 5,
+    view_data: Optional[dict] = None,
+    copies: Optional[List[Set[str]]] = None,
+    profiles: Sequence[str] = TokenProfile.PROFILE_LIST,
+) -> Dict[str, dict]:
+    """
+    Runs every benchmark on a cohort and returns {"parse": ..., "matchers": {engine: ...}, "view": ...,
+    "compare_view": ...}, along with {"profiles": {profile: ...}} of the first engine if the paths every project copied
+    are given.
+
+    Projects are stored for the view benchmark, callers are expected to roll them back.
+    """
+    parse, tokens = benchmark_parse(cohort)
+    matchers = {
+        engine: benchmark_matcher(tokens, matcher=get_matcher(engine=engine), max_pairs=max_pairs) for engine in engines
+    }
+    results = {"parse": parse, "matchers": matchers}
+    if copies is not None and engines:
+        matcher = get_matcher(engine=engines[0])
+        results["profiles"] = benchmark_profiles(cohort, copies, matcher, profiles=profiles, max_pairs=max_pairs)
+
+    teacher, projects = create_cohort_projects(cohort)
+    results["view"] = benchmark_view(teacher, projects, repeat=view_repeat, **(view_data or {}))
+    if len(projects) > 1:
+        path = sorted(cohort[0])[0]
+        results["compare_view"] = benchmark_compare_view(teacher, projects, path=path, repeat=view_repeat)
+    return results
+
+
+def _flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, prefix=f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float = 0.2) -> List[str]:
+    """
+    Compares benchmark results with earlier ones and returns a message for every throughput or accuracy that dropped
+    or latency that rose by more than the given tolerance.
+    """
+    regressions = []
+    current, previous = _flatten(results), _flatten(baseline)
+    for key in sorted(current.keys() & previous.keys()):
+        value, before = current[key], previous[key]
+        if key.endswith("_per_second") and value < before * (1 - tolerance):
+            regressions.append(f"{key} dropped from {before:.4g} to {value:.4g}")
+        elif key.endswith("_seconds") and value > before * (1 + tolerance):
+            regressions.append(f"{key} rose from {before:.4g} to {value:.4g}")
+        elif key.endswith(".auc") and value < before * (1 - tolerance):
+            regressions.append(f"{key} dropped from {before:.4g} to {value:.4g}")
+    return regressions
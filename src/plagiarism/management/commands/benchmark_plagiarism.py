@@ -0,0 +1,109 @@
+import json
+import platform
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from plagiarism.constants import PlagiarismEngine, TokenProfile
+from plagiarism.management.benchmark import MutationRates, benchmark_cohort, find_regressions, generate_labeled_cohort
+
+
+class Command(BaseCommand):
+    help = "Benchmarks plagiarism detection on a synthetic cohort of projects."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--projects", type=int, default=20, help="Number of projects in the cohort.")
+        parser.add_argument("--files", type=int, default=5, help="Number of files in every project.")
+        parser.add_argument("--functions", type=int, default=6, help="Number of functions in every file.")
+        parser.add_argument("--statements", type=int, default=6, help="Number of statements in every function.")
+        parser.add_argument(
+            "--copy-rate", type=float, default=0.5, help="Probability of a file being a mutated copy of another."
+        )
+        parser.add_argument("--rename", type=float, default=0.3, help="Probability of renaming every identifier.")
+        parser.add_argument("--reorder", type=float, default=0.2, help="Probability of moving every function.")
+        parser.add_argument(
+            "--dead-code", type=float, default=0.1, help="Probability of inserting dead code after every statement."
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the generated cohort.")
+        parser.add_argument(
+            "--engines",
+            nargs="+",
+            choices=PlagiarismEngine.ENGINE_LIST,
+            default=PlagiarismEngine.ENGINE_LIST,
+            help="Matching engines to benchmark, the tokenization profiles are compared with the first one.",
+        )
+        parser.add_argument(
+            "--profiles",
+            nargs="+",
+            choices=TokenProfile.PROFILE_LIST,
+            default=TokenProfile.PROFILE_LIST,
+            help="Tokenization profiles to compare the accuracy and speed of.",
+        )
+        parser.add_argument("--max-pairs", type=int, default=2000, help="Maximum number of pairs matched per engine.")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of warm requests to time.")
+        parser.add_argument("--threshold", type=float, default=0.5, help="Plagiarism threshold of the requests.")
+        parser.add_argument("--output", help="Path of the JSON file the results are written to.")
+        parser.add_argument("--baseline", help="Path of earlier JSON results to check for regressions.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2, help="Relative slowdown over the baseline that counts as one."
+        )
+
+    def handle(self, *args, **options):
+        rates = MutationRates(rename=options["rename"], reorder=options["reorder"], dead_code=options["dead_code"])
+        parameters = {
+            "projects": options["projects"],
+            "files": options["files"],
+            "functions": options["functions"],
+            "statements": options["statements"],
+            "copy_rate": options["copy_rate"],
+            "mutations": rates.as_dict(),
+            "seed": options["seed"],
+            "threshold": options["threshold"],
+        }
+        cohort, copies = generate_labeled_cohort(
+            projects=options["projects"],
+            files=options["files"],
+            rates=rates,
+            copy_rate=options["copy_rate"],
+            functions=options["functions"],
+            statements=options["statements"],
+            seed=options["seed"],
+        )
+        self.stdout.write(f"Benchmarking {options['projects']} projects of {options['files']} files..")
+
+        # Nothing the benchmark stores outlives it, neither rows nor uploaded archives
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media), transaction.atomic():
+            results = benchmark_cohort(
+                cohort,
+                engines=options["engines"],
+                max_pairs=options["max_pairs"],
+                view_repeat=options["repeat"],
+                view_data={"threshold": options["threshold"]},
+                copies=copies,
+                profiles=options["profiles"],
+            )
+            transaction.set_rollback(True)
+
+        results = {
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "parameters": parameters,
+            **results,
+        }
+        self.stdout.write(json.dumps(results, indent=2))
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+
+        if options["baseline"]:
+            with open(options["baseline"], "r") as baseline:
+                baseline = json.load(baseline)
+            if baseline.get("parameters") != parameters:
+                raise CommandError("The baseline was run with different parameters.")
+            regressions = find_regressions(results, baseline, tolerance=options["tolerance"])
+            if regressions:
+                raise CommandError("Plagiarism benchmark regressed:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions over the baseline."))
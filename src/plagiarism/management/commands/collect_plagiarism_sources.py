@@ -0,0 +1,22 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from plagiarism.index import collect_parsed_sources
+
+
+class Command(BaseCommand):
+    help = "Deletes the parsed sources that no plagiarism index uses anymore, i.e of re-uploaded or deleted projects."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=settings.PLAG_SOURCE_MIN_AGE,
+            help="Seconds an unused source is kept for, indexes being built may still be about to use it.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = collect_parsed_sources(min_age=datetime.timedelta(seconds=options["min_age"]))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} unused parsed source(s)."))
@@ -0,0 +1,30 @@
+import zipfile
+
+from django.core.management.base import BaseCommand
+
+from courses.models import Project
+from plagiarism.index import get_project_index
+
+
+class Command(BaseCommand):
+    help = "Builds the missing or stale plagiarism indexes of projects, so they can be checked across requirements."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--courses", nargs="+", help="Uids of the courses whose projects are indexed, all if none.")
+
+    def handle(self, *args, **options):
+        projects = Project._default_manager.order_by("id")
+        if options["courses"]:
+            projects = projects.filter(team__requirement__course__in=options["courses"])
+
+        indexed = failed = 0
+        for project in projects.iterator():
+            try:
+                # Up to date indexes are left as they are
+                get_project_index(project)
+                indexed += 1
+            except (zipfile.BadZipfile, FileNotFoundError):
+                failed += 1
+                self.stderr.write(f"Couldn't read the archive of project {project.uid}")
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} project(s), {failed} failed."))
@@ -0,0 +1,45 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import connections
+
+from plagiarism.jobs import work
+
+
+class Command(BaseCommand):
+    help = "Runs queued plagiarism jobs in a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=settings.PLAG_WORKER_PROCESSES,
+            help="Number of worker processes that run jobs concurrently.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.PLAG_WORKER_POLL_INTERVAL,
+            help="Seconds to wait before checking an empty queue again.",
+        )
+        parser.add_argument("--once", action="store_true", help="Exit as soon as the queue is empty.")
+
+    def handle(self, *args, **options):
+        processes: int = max(options["processes"], 1)
+        kwargs = {"poll_interval": options["poll_interval"], "once": options["once"]}
+        self.stdout.write(f"Starting {processes} plagiarism worker(s)..")
+
+        if processes == 1:
+            work(**kwargs)
+        else:
+            # Each forked worker must open its own database connection, workers aren't daemonic so that they can
+            # still spawn processes for parallel comparisons
+            connections.close_all()
+            workers = [multiprocessing.Process(target=work, kwargs=kwargs) for _ in range(processes)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        self.stdout.write(self.style.SUCCESS("Plagiarism worker(s) stopped."))
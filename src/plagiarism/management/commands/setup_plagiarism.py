@@ -1,18 +1,45 @@
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from django.core.management.base import BaseCommand, CommandError
-from django.conf import settings
-from tree_sitter import Language
+
+from plagiarism.sources import Grammar, SupportedLanguages
 
 
 class Command(BaseCommand):
-    help = "Compiles supported languages into a usable library for plagiarism detection."
+    help = "Compiles every supported language into its own library for plagiarism detection."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--jobs", type=int, default=os.cpu_count() or 1, help="Number of grammars compiled at a time."
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Compiles grammars again even if their sources didn't change."
+        )
+
+    def build(self, grammar: Grammar, force: bool) -> str:
+        start_time: float = time.perf_counter()
+        if not grammar.build(force=force):
+            return f"Skipped {grammar.name}, its sources didn't change since {grammar.library} was compiled"
+        return f"Compiled {grammar.name} into {grammar.library} in {time.perf_counter() - start_time:.5}s"
 
     def handle(self, *args, **options):
         self.stdout.write("Compiling..")
         start_time: float = time.perf_counter()
 
-        Language.build_library(settings.PLAG_COMPILED_LIBRARY, settings.PLAG_SUPPORTED_LANGAUGES)
+        # Compilers run in their own processes, so threads are enough to compile grammars on every core
+        grammars = list(SupportedLanguages.get_grammars().values())
+        failures = []
+        with ThreadPoolExecutor(max_workers=max(1, options["jobs"])) as executor:
+            futures = [executor.submit(self.build, grammar, options["force"]) for grammar in grammars]
+            for grammar, future in zip(grammars, futures):
+                try:
+                    self.stdout.write(future.result())
+                except Exception as error:
+                    failures.append(f"{grammar.name}: {error}")
 
+        if failures:
+            raise CommandError("Couldn't compile languages:\n" + "\n".join(failures))
         end_time: float = time.perf_counter() - start_time
         self.stdout.write(self.style.SUCCESS(f"Successfully compiled libraries in  {end_time:.5}s."))
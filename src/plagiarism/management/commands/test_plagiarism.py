@@ -1,11 +1,33 @@
+import timeit
+from typing import List, Tuple
+
 from django.core.management.base import BaseCommand, CommandError
 from tree_sitter import Language, Parser, Tree
 
-from plagiarism.tokens import Token, parse_tree
-from plagiarism.sources import parse_source, match_sequences, tokenize_source
+from plagiarism.tokens import TokenStream, parse_tree
+from plagiarism.constants import PlagiarismEngine
+from plagiarism.sources import SupportedLanguages, parse_source, match_sequences, tokenize_source
+from plagiarism.sources import detect_plagiarism_ratio, get_matcher
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--engine",
+            choices=PlagiarismEngine.ENGINE_LIST,
+            default=PlagiarismEngine.DIFFLIB,
+            help="Matching engine used to detect plagiarism in the sample",
+        )
+        parser.add_argument(
+            "--min-match-length", type=int, default=None, help="Minimum tokens of a greedy string tiling match"
+        )
+        parser.add_argument(
+            "--benchmark",
+            action="store_true",
+            help="Times matching the sample as node tokens and type names against matching it as node type ids",
+        )
+        parser.add_argument("--repeat", type=int, default=1000, help="Number of matches to time when benchmarking")
+
     def handle(self, *args, **options):
         first_source: str = """
         Test = 9
@@ -35,17 +57,19 @@ class Command(BaseCommand):
         second_tree: Tree = parse_source(source=second_source, ext=".py")
 
         # Parse tree to generate list of tokens
-        first_parse: list[Token] = parse_tree(first_tree.walk(), is_named=None, child_only=False)
-        second_parse: list[Token] = parse_tree(second_tree.walk(), is_named=None, child_only=False)
+        alphabet = SupportedLanguages.get_alphabet(ext=".py")
+        first_parse: TokenStream = parse_tree(first_tree.walk(), alphabet=alphabet, is_named=None, child_only=False)
+        second_parse: TokenStream = parse_tree(second_tree.walk(), alphabet=alphabet, is_named=None, child_only=False)
 
         # Displaying the two lists of tokens side by side
-        first = first_parse if len(first_parse) > len(second_parse) else second_parse
-        first_taken_size = min(len(first_parse), len(second_parse))
+        first_names, second_names = first_parse.names(), second_parse.names()
+        first = first_names if len(first_names) > len(second_names) else second_names
+        first_taken_size = min(len(first_names), len(second_names))
         print("_________________________________\n")
-        for fp, sp in zip(first_parse, second_parse):
+        for fp, sp in zip(first_names, second_names):
             print(f"{str(fp):<20} | {str(sp)}")
         for leftover in first[first_taken_size:]:
-            if first == first_parse:
+            if first is first_names:
                 print(f"{str(leftover):<20} |")
             else:
                 print(f"{' ':<20} | {str(leftover)}")
@@ -53,20 +77,72 @@ class Command(BaseCommand):
         print("_________________________________\n")
 
         # Detect plagiarism between two list of tokens and mark similarity in source code
-        marked_first_source, marked_second_source, plag_ratio = match_sequences(
-            tokens1=first_parse, tokens2=second_parse, source1=first_source, source2=second_source
+        matcher = get_matcher(engine=options["engine"], min_match_length=options["min_match_length"])
+        first_intervals, second_intervals, plag_ratio = match_sequences(
+            tokens1=first_parse, tokens2=second_parse, matcher=matcher
         )
         print(
             # Display highlighted plagiarism
             tokenize_source(
-                source=first_source, marked_source=marked_first_source, start_token="\033[94m", end_token="\033[0m"
+                source=first_source, intervals=first_intervals, start_tokens="\033[94m", end_tokens="\033[0m"
             )
         )
         print("\n----------")
         print(
             # Display highlighted plagiarism
             tokenize_source(
-                source=second_source, marked_source=marked_second_source, start_token="\033[94m", end_token="\033[0m"
+                source=second_source, intervals=second_intervals, start_tokens="\033[94m", end_tokens="\033[0m"
             )
         )
         print(f"\n\nPlagiarism Percentage: {plag_ratio*100:.5}%")
+
+        if options["benchmark"]:
+            self.benchmark(first_parse, second_parse, repeat=options["repeat"])
+
+    def benchmark(self, first_parse: TokenStream, second_parse: TokenStream, repeat: int) -> None:
+        first_tokens, second_tokens = _get_node_tokens(first_parse), _get_node_tokens(second_parse)
+        tokens_time = timeit.timeit(
+            lambda: detect_plagiarism_ratio(tokens1=first_tokens, tokens2=second_tokens), number=repeat
+        )
+        first_names, second_names = first_parse.names(), second_parse.names()
+        names_time = timeit.timeit(
+            lambda: detect_plagiarism_ratio(tokens1=first_names, tokens2=second_names), number=repeat
+        )
+        ids_time = timeit.timeit(
+            lambda: detect_plagiarism_ratio(tokens1=first_parse.types, tokens2=second_parse.types), number=repeat
+        )
+
+        print("\n_________________________________\n")
+        print(f"Node tokens:     {tokens_time / repeat * 1e6:.2f}us per match")
+        print(f"Node type names: {names_time / repeat * 1e6:.2f}us per match")
+        print(f"Node type ids:   {ids_time / repeat * 1e6:.2f}us per match")
+        print(
+            f"Speedup:         {tokens_time / ids_time:.2f}x over node tokens, {names_time / ids_time:.2f}x over names"
+        )
+
+
+class _NodeToken:
+    """
+    Per node token that's compared by its type name in Python, as tokens were before they were coded as type ids
+    """
+
+    __slots__ = ("line", "string")
+
+    def __init__(self, line: Tuple[int, int], string: str):
+        self.line = line
+        self.string = string
+
+    def __hash__(self):
+        return hash(self.string)
+
+    def __eq__(self, other):
+        if isinstance(other, _NodeToken):
+            return self.string == other.string
+        return self.string == other
+
+
+def _get_node_tokens(tokens: TokenStream) -> List[_NodeToken]:
+    return [
+        _NodeToken(line=(start, end), string=name)
+        for name, start, end in zip(tokens.names(), tokens.starts, tokens.ends)
+    ]
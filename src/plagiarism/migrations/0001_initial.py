@@ -0,0 +1,51 @@
+# Generated by Django 3.2.19 on 2026-10-17 00:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('courses', '0005_auto_20210519_1732'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_zip', models.CharField(max_length=255, verbose_name='Indexed project compressed file')),
+                ('version', models.PositiveSmallIntegerField(verbose_name='Index version')),
+                ('created_at', models.DateTimeField(blank=True, default=django.utils.timezone.now, editable=False, verbose_name='Created At')),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='plagiarism_index', to='courses.project', to_field='uid')),
+            ],
+            options={
+                'verbose_name': 'Project Index',
+                'verbose_name_plural': 'Project Indexes',
+                'managed': True,
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectFileIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, verbose_name='File path')),
+                ('ext', models.CharField(max_length=20, verbose_name='File extension')),
+                ('tokens', models.JSONField(blank=True, default=list, help_text='List of [type, start, end]', verbose_name='Tokens')),
+                ('index', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='plagiarism.projectindex')),
+            ],
+            options={
+                'verbose_name': 'Project File Index',
+                'verbose_name_plural': 'Project File Indexes',
+                'managed': True,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='projectfileindex',
+            constraint=models.UniqueConstraint(fields=('index', 'path'), name='unique_project_file_index'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.19 on 2026-10-17 00:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plagiarism', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectfileindex',
+            name='fingerprints',
+            field=models.BinaryField(blank=True, default=bytes, help_text='Winnowed k-gram hashes', verbose_name='Fingerprints'),
+        ),
+    ]
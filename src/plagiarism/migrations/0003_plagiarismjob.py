@@ -0,0 +1,51 @@
+# Generated by Django 3.2.19 on 2026-10-17 00:17
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_auto_20210519_1732'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('plagiarism', '0002_projectfileindex_fingerprints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlagiarismJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('threshold', models.DecimalField(decimal_places=2, max_digits=3, verbose_name='Threshold')),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Running', 'Running'), ('Succeeded', 'Succeeded'), ('Failed', 'Failed')], default='Pending', max_length=30)),
+                ('progress', models.PositiveIntegerField(blank=True, default=0, verbose_name='Checked files')),
+                ('total', models.PositiveIntegerField(blank=True, default=0, verbose_name='Total files')),
+                ('result', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Result')),
+                ('error', models.CharField(blank=True, max_length=300, verbose_name='Error')),
+                ('created_at', models.DateTimeField(blank=True, default=django.utils.timezone.now, editable=False, verbose_name='Created At')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plagiarism_jobs', to='courses.project', to_field='uid')),
+                ('requester', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plagiarism_jobs', to=settings.AUTH_USER_MODEL, to_field='uid')),
+            ],
+            options={
+                'verbose_name': 'Plagiarism Job',
+                'verbose_name_plural': 'Plagiarism Jobs',
+                'managed': True,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='plagiarismjob',
+            index=models.Index(fields=['status', 'created_at'], name='plagiarismjob_queue_index'),
+        ),
+        migrations.AddConstraint(
+            model_name='plagiarismjob',
+            constraint=models.CheckConstraint(check=models.Q(('status__in', ['Pending', 'Running', 'Succeeded', 'Failed'])), name='plagiarismjob_status_constraint'),
+        ),
+    ]
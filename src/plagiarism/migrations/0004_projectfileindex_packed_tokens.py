@@ -0,0 +1,28 @@
+# Generated by Django 3.2.19 on 2026-10-17 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plagiarism', '0003_plagiarismjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectfileindex',
+            name='types',
+            field=models.JSONField(blank=True, default=list, help_text='Node types used by the tokens', verbose_name='Token types'),
+        ),
+        # Json token lists can't be cast into binary, stale indexes are rebuilt lazily anyway
+        migrations.RemoveField(
+            model_name='projectfileindex',
+            name='tokens',
+        ),
+        migrations.AddField(
+            model_name='projectfileindex',
+            name='tokens',
+            field=models.BinaryField(blank=True, default=bytes, help_text='Packed type positions, start offsets and end offsets', verbose_name='Tokens'),
+        ),
+    ]
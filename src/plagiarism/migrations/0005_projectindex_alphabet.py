@@ -0,0 +1,27 @@
+# Generated by Django 3.2.19 on 2026-10-17 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plagiarism', '0004_projectfileindex_packed_tokens'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='projectfileindex',
+            name='types',
+        ),
+        migrations.AddField(
+            model_name='projectindex',
+            name='alphabet',
+            field=models.CharField(blank=True, default='', help_text='Node type ids', max_length=20, verbose_name='Languages alphabet version'),
+        ),
+        migrations.AlterField(
+            model_name='projectfileindex',
+            name='tokens',
+            field=models.BinaryField(blank=True, default=bytes, help_text='Packed type ids, start offsets and end offsets', verbose_name='Tokens'),
+        ),
+    ]
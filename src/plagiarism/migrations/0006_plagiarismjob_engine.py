@@ -0,0 +1,27 @@
+# Generated by Django 3.2.19 on 2026-10-17 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plagiarism', '0005_projectindex_alphabet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plagiarismjob',
+            name='engine',
+            field=models.CharField(choices=[('difflib', 'Difflib sequence matching'), ('greedy_string_tiling', 'Greedy string tiling')], default='difflib', max_length=30),
+        ),
+        migrations.AddField(
+            model_name='plagiarismjob',
+            name='min_match_length',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Used by greedy string tiling', null=True, verbose_name='Minimum match length'),
+        ),
+        migrations.AddConstraint(
+            model_name='plagiarismjob',
+            constraint=models.CheckConstraint(check=models.Q(('engine__in', ['difflib', 'greedy_string_tiling'])), name='plagiarismjob_engine_constraint'),
+        ),
+    ]
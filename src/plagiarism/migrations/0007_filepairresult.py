@@ -0,0 +1,39 @@
+# Generated by Django 3.2.19 on 2026-10-17 00:32
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plagiarism', '0006_plagiarismjob_engine'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilePairResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_digest', models.CharField(max_length=64, verbose_name='First digest')),
+                ('second_digest', models.CharField(max_length=64, verbose_name='Second digest')),
+                ('engine', models.CharField(help_text='Matcher and tokenization key', max_length=100, verbose_name='Engine')),
+                ('ratio', models.FloatField(verbose_name='Ratio')),
+                ('created_at', models.DateTimeField(blank=True, default=django.utils.timezone.now, editable=False, verbose_name='Created At')),
+            ],
+            options={
+                'verbose_name': 'File Pair Result',
+                'verbose_name_plural': 'File Pair Results',
+                'managed': True,
+            },
+        ),
+        migrations.AddField(
+            model_name='projectfileindex',
+            name='digest',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 of the source', max_length=64, verbose_name='Digest'),
+        ),
+        migrations.AddConstraint(
+            model_name='filepairresult',
+            constraint=models.UniqueConstraint(fields=('first_digest', 'second_digest', 'engine'), name='unique_file_pair_result'),
+        ),
+    ]
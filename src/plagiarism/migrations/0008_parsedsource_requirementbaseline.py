@@ -0,0 +1,67 @@
+# Generated by Django 3.2.19 on 2026-10-17 00:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import plagiarism.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_auto_20210519_1732'),
+        ('plagiarism', '0007_filepairresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParsedSource',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(help_text='SHA-256', max_length=64, verbose_name='Digest')),
+                ('ext', models.CharField(max_length=20, verbose_name='File extension')),
+                ('version', models.PositiveSmallIntegerField(verbose_name='Index version')),
+                ('alphabet', models.CharField(blank=True, default='', help_text='Node type ids', max_length=20, verbose_name='Languages alphabet version')),
+                ('tokens', models.BinaryField(blank=True, default=bytes, help_text='Packed type ids, start offsets and end offsets', verbose_name='Tokens')),
+                ('fingerprints', models.BinaryField(blank=True, default=bytes, help_text='Winnowed k-gram hashes', verbose_name='Fingerprints')),
+                ('created_at', models.DateTimeField(blank=True, default=django.utils.timezone.now, editable=False, verbose_name='Created At')),
+            ],
+            options={
+                'verbose_name': 'Parsed Source',
+                'verbose_name_plural': 'Parsed Sources',
+                'managed': True,
+            },
+        ),
+        # Tokens are moved into shared parsed sources, stale indexes are rebuilt lazily anyway
+        migrations.RemoveField(
+            model_name='projectfileindex',
+            name='fingerprints',
+        ),
+        migrations.RemoveField(
+            model_name='projectfileindex',
+            name='tokens',
+        ),
+        migrations.CreateModel(
+            name='RequirementBaseline',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('baseline_zip', models.FileField(upload_to=plagiarism.models._baseline_upload_path, verbose_name='Starter code compressed file')),
+                ('created_at', models.DateTimeField(blank=True, default=django.utils.timezone.now, editable=False, verbose_name='Created At')),
+                ('requirement', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='plagiarism_baseline', to='courses.projectrequirement', to_field='uid')),
+            ],
+            options={
+                'verbose_name': 'Requirement Baseline',
+                'verbose_name_plural': 'Requirement Baselines',
+                'managed': True,
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='parsedsource',
+            constraint=models.UniqueConstraint(fields=('digest', 'ext', 'version', 'alphabet'), name='unique_parsed_source'),
+        ),
+        migrations.AddField(
+            model_name='projectfileindex',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='files', to='plagiarism.parsedsource', verbose_name='Source'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.19 on 2026-10-17 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plagiarism', '0008_parsedsource_requirementbaseline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plagiarismjob',
+            name='top_k',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Best matches kept per file', null=True, verbose_name='Top k'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.19 on 2026-10-17 00:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plagiarism', '0009_plagiarismjob_top_k'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plagiarismjob',
+            name='stats',
+            field=models.JSONField(blank=True, help_text='Pairs every prefilter tier ruled out', null=True, verbose_name='Prefilter stats'),
+        ),
+    ]
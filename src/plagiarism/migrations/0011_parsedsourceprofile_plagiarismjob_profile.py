@@ -0,0 +1,46 @@
+# Generated by Django 3.2.19 on 2026-10-17 00:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plagiarism', '0010_plagiarismjob_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParsedSourceProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profile', models.CharField(choices=[('all', 'Every syntax tree node'), ('named', 'Named syntax tree nodes'), ('leaf', 'Leaf syntax tree nodes'), ('statement', 'Statement level shape')], max_length=30)),
+                ('tokens', models.BinaryField(blank=True, default=bytes, help_text='Packed type ids, start offsets and end offsets', verbose_name='Tokens')),
+                ('fingerprints', models.BinaryField(blank=True, default=bytes, help_text='Winnowed k-gram hashes', verbose_name='Fingerprints')),
+            ],
+            options={
+                'verbose_name': 'Parsed Source Profile',
+                'verbose_name_plural': 'Parsed Source Profiles',
+                'managed': True,
+            },
+        ),
+        migrations.AddField(
+            model_name='plagiarismjob',
+            name='profile',
+            field=models.CharField(choices=[('all', 'Every syntax tree node'), ('named', 'Named syntax tree nodes'), ('leaf', 'Leaf syntax tree nodes'), ('statement', 'Statement level shape')], default='all', max_length=30),
+        ),
+        migrations.AddConstraint(
+            model_name='plagiarismjob',
+            constraint=models.CheckConstraint(check=models.Q(('profile__in', ['all', 'named', 'leaf', 'statement'])), name='plagiarismjob_profile_constraint'),
+        ),
+        migrations.AddField(
+            model_name='parsedsourceprofile',
+            name='source',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='profiles', to='plagiarism.parsedsource'),
+        ),
+        migrations.AddConstraint(
+            model_name='parsedsourceprofile',
+            constraint=models.UniqueConstraint(fields=('source', 'profile'), name='unique_parsed_source_profile'),
+        ),
+    ]
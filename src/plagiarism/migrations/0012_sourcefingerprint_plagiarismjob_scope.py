@@ -0,0 +1,50 @@
+# Generated by Django 3.2.19 on 2026-10-17 01:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('plagiarism', '0011_parsedsourceprofile_plagiarismjob_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceFingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profile', models.CharField(choices=[('all', 'Every syntax tree node'), ('named', 'Named syntax tree nodes'), ('leaf', 'Leaf syntax tree nodes'), ('statement', 'Statement level shape')], max_length=30)),
+                ('fingerprint', models.BigIntegerField(verbose_name='Fingerprint')),
+            ],
+            options={
+                'verbose_name': 'Source Fingerprint',
+                'verbose_name_plural': 'Source Fingerprints',
+                'managed': True,
+            },
+        ),
+        migrations.AddField(
+            model_name='plagiarismjob',
+            name='courses',
+            field=models.JSONField(blank=True, help_text="Uids of the courses checked against, none for the project's own requirement", null=True, verbose_name='Courses'),
+        ),
+        migrations.AddField(
+            model_name='plagiarismjob',
+            name='scope',
+            field=models.CharField(choices=[('requirement', 'Projects of the same requirement'), ('owner', 'Projects of every course of the same owner'), ('courses', 'Projects of the chosen courses')], default='requirement', max_length=30),
+        ),
+        migrations.AddConstraint(
+            model_name='plagiarismjob',
+            constraint=models.CheckConstraint(check=models.Q(('scope__in', ['requirement', 'owner', 'courses'])), name='plagiarismjob_scope_constraint'),
+        ),
+        migrations.AddField(
+            model_name='sourcefingerprint',
+            name='source',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='plagiarism.parsedsource'),
+        ),
+        migrations.AddConstraint(
+            model_name='sourcefingerprint',
+            constraint=models.UniqueConstraint(fields=('profile', 'fingerprint', 'source'), name='unique_source_fingerprint'),
+        ),
+    ]
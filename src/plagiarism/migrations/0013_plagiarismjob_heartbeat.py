@@ -0,0 +1,24 @@
+# Generated by Django 3.2.19 on 2026-10-17 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("plagiarism", "0012_sourcefingerprint_plagiarismjob_scope"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="plagiarismjob",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(blank=True, default=0, verbose_name="Attempts"),
+        ),
+        migrations.AddField(
+            model_name="plagiarismjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(
+                blank=True, help_text="Last time the running worker was alive", null=True, verbose_name="Heartbeat At"
+            ),
+        ),
+    ]
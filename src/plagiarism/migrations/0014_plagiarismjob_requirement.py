@@ -0,0 +1,53 @@
+# Generated by Django 3.2.19 on 2026-10-17 01:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("courses", "0005_auto_20210519_1732"),
+        ("plagiarism", "0013_plagiarismjob_heartbeat"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="plagiarismjob",
+            name="requirement",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Set instead of the project for jobs that compare every pair of projects in a requirement",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="plagiarism_jobs",
+                to="courses.projectrequirement",
+                to_field="uid",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="plagiarismjob",
+            name="project",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="plagiarism_jobs",
+                to="courses.project",
+                to_field="uid",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="plagiarismjob",
+            constraint=models.CheckConstraint(
+                check=models.Q(("project__isnull", False), ("requirement__isnull", False), _connector="OR"),
+                name="plagiarismjob_target_constraint",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="plagiarismjob",
+            constraint=models.CheckConstraint(
+                check=models.Q(("project__isnull", False), ("requirement__isnull", False), _negated=True),
+                name="plagiarismjob_single_target_constraint",
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.19 on 2026-10-17 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("plagiarism", "0014_plagiarismjob_requirement"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="projectindex",
+            name="alphabet",
+        ),
+        migrations.AddField(
+            model_name="projectindex",
+            name="languages",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text="Version of every language found in the archive, none if it wasn't available",
+                verbose_name="Language versions",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="parsedsource",
+            name="alphabet",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Version of the language the node type ids belong to",
+                max_length=20,
+                verbose_name="Language version",
+            ),
+        ),
+    ]
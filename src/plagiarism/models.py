@@ -0,0 +1,346 @@
+import uuid
+import zipfile
+
+from django.db import models
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from courses.models import Project, ProjectRequirement
+from .constants import PlagiarismJobStatus, PlagiarismEngine, PlagiarismScope, TokenProfile
+
+
+class ProjectIndex(models.Model):
+    """
+    Persisted plagiarism index of a project, built once per uploaded project archive.
+    """
+
+    project = models.OneToOneField(Project, to_field="uid", on_delete=models.CASCADE, related_name="plagiarism_index")
+    project_zip = models.CharField(
+        max_length=255, blank=False, null=False, verbose_name=_("Indexed project compressed file")
+    )
+    version = models.PositiveSmallIntegerField(blank=False, null=False, verbose_name=_("Index version"))
+    languages = models.JSONField(
+        default=dict,
+        blank=True,
+        null=False,
+        verbose_name=_("Language versions"),
+        help_text="Version of every language found in the archive, none if it wasn't available",
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now, blank=True, null=False, editable=False, verbose_name=_("Created At")
+    )
+
+    class Meta:
+        managed = True
+        verbose_name = "Project Index"
+        verbose_name_plural = "Project Indexes"
+
+    def __str__(self) -> str:
+        return f"{self.project} - v{self.version}"
+
+
+class ParsedSource(models.Model):
+    """
+    Tokens of a unique source content, parsed once and shared by every indexed file with the same content.
+    """
+
+    digest = models.CharField(max_length=64, blank=False, null=False, verbose_name=_("Digest"), help_text="SHA-256")
+    ext = models.CharField(max_length=20, blank=False, null=False, verbose_name=_("File extension"))
+    version = models.PositiveSmallIntegerField(blank=False, null=False, verbose_name=_("Index version"))
+    alphabet = models.CharField(
+        max_length=20,
+        default="",
+        blank=True,
+        null=False,
+        verbose_name=_("Language version"),
+        help_text="Version of the language the node type ids belong to",
+    )
+    tokens = models.BinaryField(
+        default=bytes,
+        blank=True,
+        null=False,
+        verbose_name=_("Tokens"),
+        help_text="Packed type ids, start offsets and end offsets",
+    )
+    fingerprints = models.BinaryField(
+        default=bytes, blank=True, null=False, verbose_name=_("Fingerprints"), help_text="Winnowed k-gram hashes"
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now, blank=True, null=False, editable=False, verbose_name=_("Created At")
+    )
+
+    class Meta:
+        managed = True
+        verbose_name = "Parsed Source"
+        verbose_name_plural = "Parsed Sources"
+        constraints = [
+            models.UniqueConstraint(fields=["digest", "ext", "version", "alphabet"], name="unique_parsed_source")
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.digest[:8]}{self.ext} - v{self.version}"
+
+
+class ParsedSourceProfile(models.Model):
+    """
+    Tokens of a parsed source under one of the other tokenization profiles, see `TokenProfile`. The tokens of every
+    node are stored on the parsed source itself.
+    """
+
+    source = models.ForeignKey(ParsedSource, on_delete=models.CASCADE, related_name="profiles")
+    profile = models.CharField(choices=TokenProfile.PROFILE_CHOICES, max_length=30, null=False)
+    tokens = models.BinaryField(
+        default=bytes,
+        blank=True,
+        null=False,
+        verbose_name=_("Tokens"),
+        help_text="Packed type ids, start offsets and end offsets",
+    )
+    fingerprints = models.BinaryField(
+        default=bytes, blank=True, null=False, verbose_name=_("Fingerprints"), help_text="Winnowed k-gram hashes"
+    )
+
+    class Meta:
+        managed = True
+        verbose_name = "Parsed Source Profile"
+        verbose_name_plural = "Parsed Source Profiles"
+        constraints = [models.UniqueConstraint(fields=["source", "profile"], name="unique_parsed_source_profile")]
+
+    def __str__(self) -> str:
+        return f"{self.source} - {self.profile}"
+
+
+class SourceFingerprint(models.Model):
+    """
+    Winnowed fingerprint of a parsed source under a tokenization profile, the persisted inverted index that files of
+    other requirements are looked up in.
+    """
+
+    source = models.ForeignKey(ParsedSource, on_delete=models.CASCADE, related_name="postings")
+    profile = models.CharField(choices=TokenProfile.PROFILE_CHOICES, max_length=30, null=False)
+    fingerprint = models.BigIntegerField(blank=False, null=False, verbose_name=_("Fingerprint"))
+
+    class Meta:
+        managed = True
+        verbose_name = "Source Fingerprint"
+        verbose_name_plural = "Source Fingerprints"
+        constraints = [
+            # Also the lookup index of the sources sharing a fingerprint
+            models.UniqueConstraint(fields=["profile", "fingerprint", "source"], name="unique_source_fingerprint")
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.source} - {self.profile} {self.fingerprint:016x}"
+
+
+class ProjectFileIndex(models.Model):
+    """
+    Token sequence of a single supported file inside an indexed project archive.
+    """
+
+    index = models.ForeignKey(ProjectIndex, on_delete=models.CASCADE, related_name="files")
+    path = models.CharField(max_length=500, blank=False, null=False, verbose_name=_("File path"))
+    ext = models.CharField(max_length=20, blank=False, null=False, verbose_name=_("File extension"))
+    digest = models.CharField(
+        max_length=64, default="", blank=True, null=False, verbose_name=_("Digest"), help_text="SHA-256 of the source"
+    )
+    # Only missing for files of indexes older than content addressed sources, which are always stale
+    source = models.ForeignKey(
+        ParsedSource, on_delete=models.PROTECT, blank=True, null=True, related_name="files", verbose_name=_("Source")
+    )
+
+    class Meta:
+        managed = True
+        verbose_name = "Project File Index"
+        verbose_name_plural = "Project File Indexes"
+        constraints = [models.UniqueConstraint(fields=["index", "path"], name="unique_project_file_index")]
+
+    def __str__(self) -> str:
+        return f"{self.index.project} - {self.path}"
+
+
+def _baseline_upload_path(instance: "RequirementBaseline", filename: str) -> str:
+    """
+    Custom Callable that is passed to django's FileField for uploading
+
+    Uploads files under "baselines/req_<requirement-uid>/<filename>"
+
+    """
+    return f"baselines/req_{instance.requirement_id}/{filename}"
+
+
+class RequirementBaseline(models.Model):
+    """
+    Starter code handed out with a requirement, code matching it isn't counted as plagiarism.
+    """
+
+    requirement = models.OneToOneField(
+        ProjectRequirement, to_field="uid", on_delete=models.CASCADE, related_name="plagiarism_baseline"
+    )
+    baseline_zip = models.FileField(
+        verbose_name=_("Starter code compressed file"), upload_to=_baseline_upload_path, blank=False, null=False
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now, blank=True, null=False, editable=False, verbose_name=_("Created At")
+    )
+
+    class Meta:
+        managed = True
+        verbose_name = "Requirement Baseline"
+        verbose_name_plural = "Requirement Baselines"
+
+    def __str__(self) -> str:
+        return f"{self.requirement}"
+
+    def clean(self) -> None:
+        """
+        Model level validation hook
+        """
+        if self.baseline_zip._file is not None and not zipfile.is_zipfile(self.baseline_zip.file):
+            raise ValidationError({"baseline_zip": _('Can only upload ".zip" compressed files')})
+
+
+class FilePairResult(models.Model):
+    """
+    Plagiarism ratio of a pair of file contents, stored so unchanged files are never compared twice.
+    """
+
+    # Digests are stored in order, the first digest is never greater than the second
+    first_digest = models.CharField(max_length=64, blank=False, null=False, verbose_name=_("First digest"))
+    second_digest = models.CharField(max_length=64, blank=False, null=False, verbose_name=_("Second digest"))
+    engine = models.CharField(
+        max_length=100, blank=False, null=False, verbose_name=_("Engine"), help_text="Matcher and tokenization key"
+    )
+    ratio = models.FloatField(blank=False, null=False, verbose_name=_("Ratio"))
+    created_at = models.DateTimeField(
+        default=timezone.now, blank=True, null=False, editable=False, verbose_name=_("Created At")
+    )
+
+    class Meta:
+        managed = True
+        verbose_name = "File Pair Result"
+        verbose_name_plural = "File Pair Results"
+        constraints = [
+            models.UniqueConstraint(fields=["first_digest", "second_digest", "engine"], name="unique_file_pair_result")
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.first_digest[:8]} - {self.second_digest[:8]} ({self.engine})"
+
+
+class PlagiarismJob(models.Model):
+    """
+    Project or requirement plagiarism detection that is queued by the API and ran by the `plagiarism_worker` command.
+    """
+
+    uid = models.UUIDField(unique=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(
+        Project, to_field="uid", on_delete=models.CASCADE, related_name="plagiarism_jobs", blank=True, null=True
+    )
+    requirement = models.ForeignKey(
+        ProjectRequirement,
+        to_field="uid",
+        on_delete=models.CASCADE,
+        related_name="plagiarism_jobs",
+        blank=True,
+        null=True,
+        help_text="Set instead of the project for jobs that compare every pair of projects in a requirement",
+    )
+    requester = models.ForeignKey(
+        settings.AUTH_USER_MODEL, to_field="uid", on_delete=models.CASCADE, related_name="plagiarism_jobs"
+    )
+    threshold = models.DecimalField(
+        max_digits=3, decimal_places=2, blank=False, null=False, verbose_name=_("Threshold")
+    )
+    engine = models.CharField(
+        choices=PlagiarismEngine.ENGINE_CHOICES, max_length=30, default=PlagiarismEngine.DIFFLIB, null=False
+    )
+    min_match_length = models.PositiveSmallIntegerField(
+        blank=True, null=True, verbose_name=_("Minimum match length"), help_text="Used by greedy string tiling"
+    )
+    top_k = models.PositiveSmallIntegerField(
+        blank=True, null=True, verbose_name=_("Top k"), help_text="Best matches kept per file"
+    )
+    profile = models.CharField(
+        choices=TokenProfile.PROFILE_CHOICES, max_length=30, default=TokenProfile.ALL, null=False
+    )
+    scope = models.CharField(
+        choices=PlagiarismScope.SCOPE_CHOICES, max_length=30, default=PlagiarismScope.REQUIREMENT, null=False
+    )
+    courses = models.JSONField(
+        blank=True,
+        null=True,
+        verbose_name=_("Courses"),
+        help_text="Uids of the courses checked against, none for the project's own requirement",
+    )
+    status = models.CharField(
+        choices=PlagiarismJobStatus.STATUS_CHOICES, max_length=30, default=PlagiarismJobStatus.PENDING, null=False
+    )
+    progress = models.PositiveIntegerField(default=0, blank=True, null=False, verbose_name=_("Checked files"))
+    total = models.PositiveIntegerField(default=0, blank=True, null=False, verbose_name=_("Total files"))
+    result = models.JSONField(encoder=DjangoJSONEncoder, blank=True, null=True, verbose_name=_("Result"))
+    stats = models.JSONField(
+        blank=True, null=True, verbose_name=_("Prefilter stats"), help_text="Pairs every prefilter tier ruled out"
+    )
+    error = models.CharField(max_length=300, blank=True, null=False, verbose_name=_("Error"))
+    created_at = models.DateTimeField(
+        default=timezone.now, blank=True, null=False, editable=False, verbose_name=_("Created At")
+    )
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name=_("Started At"))
+    heartbeat_at = models.DateTimeField(
+        blank=True, null=True, verbose_name=_("Heartbeat At"), help_text="Last time the running worker was alive"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, blank=True, null=False, verbose_name=_("Attempts"))
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name=_("Finished At"))
+
+    class Meta:
+        managed = True
+        verbose_name = "Plagiarism Job"
+        verbose_name_plural = "Plagiarism Jobs"
+        constraints = [
+            # Status must be one of the defined statuses in PlagiarismJobStatus constraint
+            models.CheckConstraint(
+                check=models.Q(status__in=PlagiarismJobStatus.STATUS_LIST),
+                name="%(class)s_status_constraint",
+            ),
+            # Engine must be one of the defined engines in PlagiarismEngine constraint
+            models.CheckConstraint(
+                check=models.Q(engine__in=PlagiarismEngine.ENGINE_LIST),
+                name="%(class)s_engine_constraint",
+            ),
+            # Profile must be one of the defined profiles in TokenProfile constraint
+            models.CheckConstraint(
+                check=models.Q(profile__in=TokenProfile.PROFILE_LIST),
+                name="%(class)s_profile_constraint",
+            ),
+            # Scope must be one of the defined scopes in PlagiarismScope constraint
+            models.CheckConstraint(
+                check=models.Q(scope__in=PlagiarismScope.SCOPE_LIST),
+                name="%(class)s_scope_constraint",
+            ),
+            # Job must check either a project or a requirement constraint
+            models.CheckConstraint(
+                check=models.Q(project__isnull=False) | models.Q(requirement__isnull=False),
+                name="%(class)s_target_constraint",
+            ),
+            models.CheckConstraint(
+                check=~models.Q(project__isnull=False, requirement__isnull=False),
+                name="%(class)s_single_target_constraint",
+            ),
+        ]
+        indexes = [models.Index(fields=("status", "created_at"), name="%(class)s_queue_index")]
+
+    def __str__(self) -> str:
+        return f"{self.project or self.requirement} - {self.status}"
+
+    @property
+    def course_id(self) -> uuid.UUID:
+        """
+        Uid of the course of the checked project or requirement
+        """
+        if self.requirement_id is not None:
+            return self.requirement.course_id
+        return self.project.team.requirement.course_id
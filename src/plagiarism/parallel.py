@@ -0,0 +1,147 @@
+"""
+Parallel pair comparisons for plagiarism detection.
+
+This module must stay importable without a configured Django project, since worker processes are spawned fresh and
+only import what they need to compare token sequences.
+"""
+import heapq
+import itertools
+import multiprocessing
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+from .sources import Matcher, DifflibMatcher, get_histogram
+
+# (key, other key) of two token sequences in the corpus
+Pair = Tuple[Hashable, Hashable]
+
+# Token sequences, matcher and top k of the current run, shipped once to every worker process instead of per chunk
+_corpus: Dict[Hashable, Sequence] = {}
+_matcher: Matcher = DifflibMatcher()
+_top_k: Optional[int] = None
+# Coarse histograms of the token sequences compared by this worker process so far
+_histograms: Dict[Hashable, Sequence[int]] = {}
+
+
+def _init_worker(corpus: Dict[Hashable, Sequence], matcher: Matcher, top_k: Optional[int]) -> None:
+    global _corpus, _matcher, _top_k
+    _corpus = corpus
+    _matcher = matcher
+    _top_k = top_k
+
+
+def _compare(
+    corpus: Dict[Hashable, Sequence],
+    histograms: Dict[Hashable, Sequence[int]],
+    pairs: List[Pair],
+    matcher: Matcher,
+    minimum: float,
+    top_k: Optional[int],
+    stats: Counter,
+) -> List[Optional[float]]:
+    # Min heap of the k best ratios so far, pairs that can't beat the worst of them aren't fully compared
+    best: List[float] = []
+    ratios = []
+    for first, second in pairs:
+        for key in (first, second):
+            if key not in histograms:
+                histograms[key] = get_histogram(corpus[key])
+
+        bound = max(minimum, best[0]) if top_k is not None and len(best) >= top_k else minimum
+        ratio = matcher.bounded_ratio(
+            corpus[first],
+            corpus[second],
+            minimum=bound,
+            histograms=(histograms[first], histograms[second]),
+            stats=stats,
+        )
+        ratios.append(ratio)
+        if ratio is None or top_k is None:
+            continue
+        elif len(best) < top_k:
+            heapq.heappush(best, ratio)
+        elif ratio > best[0]:
+            heapq.heapreplace(best, ratio)
+    return ratios
+
+
+def _compare_chunk(chunk: Tuple[List[Pair], float]) -> Tuple[List[Optional[float]], Counter]:
+    pairs, minimum = chunk
+    stats = Counter()
+    ratios = _compare(_corpus, _histograms, pairs, matcher=_matcher, minimum=minimum, top_k=_top_k, stats=stats)
+    return ratios, stats
+
+
+def _iter_chunks(
+    groups: List[List[Pair]], minimums: List[float], chunk_size: int
+) -> Iterator[Tuple[List[Pair], float]]:
+    # The k best pairs of a group are always among the k best pairs of the chunk they're in
+    for group, minimum in zip(groups, minimums):
+        for start in range(0, len(group), chunk_size):
+            yield group[start : start + chunk_size], minimum  # noqa
+
+
+def compare_pairs(
+    corpus: Dict[Hashable, Sequence],
+    groups: List[List[Pair]],
+    workers: int = 1,
+    chunk_size: int = 500,
+    matcher: Optional[Matcher] = None,
+    top_k: Optional[int] = None,
+    minimums: Optional[List[float]] = None,
+    stats: Optional[Counter] = None,
+) -> Iterator[List[Optional[float]]]:
+    """
+    Computes the plagiarism ratio of every pair and yields the ratios of every group of pairs in order.
+
+    :corpus: token sequences mapped by key
+
+    :groups: lists of (key, other key) pairs that should be compared
+
+    :workers: number of processes to split the comparisons over, comparisons run in this process if less than 2
+
+    :chunk_size: maximum number of comparisons sent to a worker process at once
+
+    :matcher: matching engine the ratios are computed with, defaults to difflib
+
+    :top_k: if given, only the k best ratios of every group are needed
+
+    :minimums: minimum ratio that's needed in every group, i.e the threshold. Ratios of pairs whose upper bounds
+        can't reach it, or can't be among the k best, are none
+
+    :stats: optional counter that's updated with the `PrefilterTier` of every pair
+    """
+    matcher = matcher or DifflibMatcher()
+    minimums = minimums if minimums is not None else [0.0] * len(groups)
+    stats = stats if stats is not None else Counter()
+    if workers < 2:
+        histograms = {}
+        for group, minimum in zip(groups, minimums):
+            yield _compare(corpus, histograms, group, matcher=matcher, minimum=minimum, top_k=top_k, stats=stats)
+        return
+
+    chunks = _iter_chunks(groups, minimums=minimums, chunk_size=chunk_size)
+    # Chunks are submitted as they're needed, so consumers that stop early only wait for the few that are in flight
+    pending: Deque[Future] = deque()
+    # Spawned processes don't inherit locks held by other threads of the (possibly threaded) server process
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(corpus, matcher, top_k),
+    ) as executor:
+        try:
+            for group in groups:
+                ratios = []
+                while len(ratios) < len(group):
+                    for chunk in itertools.islice(chunks, workers * 2 - len(pending)):
+                        pending.append(executor.submit(_compare_chunk, chunk))
+                    chunk_ratios, chunk_stats = pending.popleft().result()
+                    ratios.extend(chunk_ratios)
+                    stats.update(chunk_stats)
+                yield ratios
+        finally:
+            # Python 3.8 executors can't cancel their queued work on shutdown
+            for future in pending:
+                future.cancel()
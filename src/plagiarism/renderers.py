@@ -0,0 +1,47 @@
+import json
+from typing import Any, Optional
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class StreamRenderer(BaseRenderer):
+    """
+    Base renderer of streamed results, each event is rendered on its own so it can be sent as soon as it's ready.
+
+    Regular responses, i.e errors, are rendered as a single event.
+    """
+
+    charset = "utf-8"
+
+    def render(self, data: Any, accepted_media_type: Optional[str] = None, renderer_context: Optional[dict] = None):
+        response = (renderer_context or {}).get("response")
+        event = "error" if response is not None and response.status_code >= 400 else "result"
+        return self.render_event(event, data)
+
+    def render_event(self, event: str, data: Any) -> bytes:
+        raise NotImplementedError
+
+
+class NDJSONRenderer(StreamRenderer):
+    """
+    Renders every event as a {"event": ..., "data": ...} JSON line.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render_event(self, event: str, data: Any) -> bytes:
+        return (json.dumps({"event": event, "data": data}, cls=JSONEncoder) + "\n").encode(self.charset)
+
+
+class EventStreamRenderer(StreamRenderer):
+    """
+    Renders every event as a server-sent event.
+    """
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+
+    def render_event(self, event: str, data: Any) -> bytes:
+        return f"event: {event}\ndata: {json.dumps(data, cls=JSONEncoder)}\n\n".encode(self.charset)
@@ -0,0 +1,274 @@
+import hashlib
+import heapq
+import logging
+import pathlib as pl
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from django.conf import settings
+
+from courses.models import Project
+from .models import FilePairResult, ProjectFileIndex
+from .index import INDEX_VERSION, get_ext_version, get_files_tokens
+from .baseline import Baseline
+from .parallel import compare_pairs
+from .sources import Matcher, DifflibMatcher
+from .constants import PrefilterTier, TokenProfile
+
+logger = logging.getLogger(__name__)
+
+# (first digest, second digest) of two file contents in order
+DigestPair = Tuple[str, str]
+
+# (digest, extension) of a file content, the same content is tokenized differently under every extension
+ContentKey = Tuple[str, str]
+
+# (first content, second content) of two file contents in order, see `get_content_pair`
+ContentPair = Tuple[ContentKey, ContentKey]
+
+
+def get_results_key(
+    matcher: Matcher,
+    baseline: Optional[Baseline] = None,
+    profile: str = TokenProfile.ALL,
+    ext: str = "",
+) -> str:
+    """
+    Returns the key that stored ratios are reused under, ratios depend on the matcher, on how files were tokenized
+    and on the starter code subtracted from them.
+
+    :ext: extension of the compared files, their language and its version decide how they're tokenized
+    """
+    key = f"{matcher.key()}@{INDEX_VERSION}{ext}.{get_ext_version(ext) or ''}"
+    if profile != TokenProfile.ALL:
+        key += f"/{profile}"
+    if baseline is not None:
+        key += f"-{baseline.digest[:16]}"
+    return key
+
+
+def get_compare_key(
+    first_project: Project,
+    first_file: str,
+    second_project: Project,
+    second_file: str,
+    digests: Tuple[str, str],
+    matcher: Matcher,
+    profile: str = TokenProfile.ALL,
+    baseline: Optional[Baseline] = None,
+) -> str:
+    """
+    Returns the cache key of the matched intervals and ratio of two project files. Keys change whenever either
+    project archive is re-uploaded, either file content changes or the files are matched differently.
+
+    :digests: content addresses of both files, empty if a file wasn't indexed
+
+    :baseline: optional starter code that is subtracted from both files before they're matched
+    """
+    parts = [
+        str(first_project.uid),
+        first_project.project_zip.name,
+        first_file,
+        digests[0],
+        str(second_project.uid),
+        second_project.project_zip.name,
+        second_file,
+        digests[1],
+        # Only files of the same extension are compared
+        get_results_key(matcher, baseline=baseline, profile=profile, ext=pl.Path(first_file).suffix),
+    ]
+    return f"plagiarism:compare:{hashlib.sha256(chr(0).join(parts).encode('utf-8')).hexdigest()}"
+
+
+def get_digest_pair(first: ProjectFileIndex, second: ProjectFileIndex) -> DigestPair:
+    """
+    Returns the digests of two indexed files in order, a pair of contents always has the same key either way around.
+    """
+    if first.digest <= second.digest:
+        return first.digest, second.digest
+    return second.digest, first.digest
+
+
+def get_content_pair(first: ProjectFileIndex, second: ProjectFileIndex) -> ContentPair:
+    """
+    Returns the contents of two indexed files in order, like `get_digest_pair` but told apart by extension too.
+    """
+    if first.digest <= second.digest:
+        return (first.digest, first.ext), (second.digest, second.ext)
+    return (second.digest, second.ext), (first.digest, first.ext)
+
+
+def load_results(pairs: Set[DigestPair], key: str) -> Dict[DigestPair, float]:
+    """
+    Returns the stored ratios of the given pairs of contents that were already compared.
+    """
+    digests = {digest for pair in pairs for digest in pair}
+    stored = FilePairResult._default_manager.filter(
+        engine=key, first_digest__in=digests, second_digest__in=digests
+    ).values_list("first_digest", "second_digest", "ratio")
+    return {(first, second): ratio for first, second, ratio in stored if (first, second) in pairs}
+
+
+def store_results(results: Dict[DigestPair, float], key: str) -> None:
+    """
+    Stores the ratios of newly compared pairs of contents, pairs stored by concurrent runs meanwhile are kept.
+    """
+    FilePairResult._default_manager.bulk_create(
+        [
+            FilePairResult(first_digest=first, second_digest=second, engine=key, ratio=ratio)
+            for (first, second), ratio in results.items()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def iter_pair_ratios(
+    file_pairs: List[Tuple[ProjectFileIndex, List[ProjectFileIndex]]],
+    matcher: Optional[Matcher] = None,
+    baseline: Optional[Baseline] = None,
+    top_k: Optional[int] = None,
+    threshold: float = 0.0,
+    stats: Optional[Counter] = None,
+    profile: str = TokenProfile.ALL,
+) -> Iterator[List[Optional[float]]]:
+    """
+    Yields the ratios of every (file, other files) entry in order, only comparing the pairs of contents that weren't
+    compared before and storing their ratios so unchanged files of re-uploaded projects are never compared again.
+
+    :file_pairs: list of (file, other files) that should be compared
+
+    :matcher: matching engine the ratios are computed with, defaults to difflib
+
+    :baseline: optional starter code that is subtracted from every file before it's compared
+
+    :top_k: if given, only the k best ratios of every file are needed
+
+    :threshold: minimum ratio that's needed. Pairs whose upper bounds can't reach it, or can't be among the k best,
+        aren't fully compared and have a none ratio
+
+    :stats: optional counter that's updated with the `PrefilterTier` of every compared pair of contents
+
+    :profile: tokenization profile the files are compared under, see `TokenProfile`
+    """
+    matcher = matcher or DifflibMatcher()
+    # Pairs are only made of files of the same extension, ratios are stored under a key of their extension
+    pairs = {get_content_pair(_file, other) for _file, others in file_pairs for other in others}
+    keys = {
+        ext: get_results_key(matcher, baseline=baseline, profile=profile, ext=ext)
+        for ext in {first[1] for first, _ in pairs}
+    }
+    results: Dict[ContentPair, float] = {}
+    for ext, key in keys.items():
+        ext_pairs = {(first[0], second[0]) for first, second in pairs if first[1] == ext and first != second}
+        ext_results = load_results(ext_pairs, key)
+        results.update({((first, ext), (second, ext)): ratio for (first, second), ratio in ext_results.items()})
+    stored = len(results)
+    if baseline is None:
+        # Identical contents always fully match, only starter code can leave nothing of them to match
+        results.update({pair: 1.0 for pair in pairs if pair[0] == pair[1]})
+
+    # Pairs missing a ratio are compared once, along with the first file that needs them
+    files: Dict[ContentKey, ProjectFileIndex] = {}
+    scheduled = set(results)
+    groups = []
+    for _file, others in file_pairs:
+        group = []
+        for other in others:
+            pair = get_content_pair(_file, other)
+            if pair not in scheduled:
+                scheduled.add(pair)
+                group.append(pair)
+                files.update({(_file.digest, _file.ext): _file, (other.digest, other.ext): other})
+        groups.append(group)
+
+    corpus = _load_corpus(files.values(), baseline=baseline, profile=profile)
+    for group in groups:
+        for pair in group:
+            ratio = _get_trivial_ratio(corpus, pair)
+            if ratio is not None:
+                results[pair] = ratio
+    groups = [[pair for pair in group if pair not in results] for group in groups]
+
+    minimums = [float(threshold)] * len(groups)
+    if top_k is not None:
+        # Ratios that are already known are the k best a file's remaining pairs have to beat
+        for position, (_file, others) in enumerate(file_pairs):
+            known = [results.get(get_content_pair(_file, other)) for other in others]
+            known = [ratio for ratio in known if ratio is not None]
+            if len(known) >= top_k:
+                minimums[position] = max(minimums[position], heapq.nlargest(top_k, known)[-1])
+
+    stats = stats if stats is not None else Counter()
+
+    total_pairs = sum(len(group) for group in groups)
+    ratios = compare_pairs(
+        corpus=corpus,
+        groups=groups,
+        workers=settings.PLAG_PARALLEL_WORKERS if total_pairs >= settings.PLAG_PARALLEL_MIN_PAIRS else 1,
+        chunk_size=settings.PLAG_PARALLEL_CHUNK_SIZE,
+        matcher=matcher,
+        top_k=top_k,
+        minimums=minimums,
+        stats=stats,
+    )
+
+    pending: Dict[ContentPair, float] = {}
+    # Position of the file whose k best ratios a pair was pruned for
+    pruned: Dict[ContentPair, int] = {}
+    try:
+        for position, ((_file, others), group, group_ratios) in enumerate(zip(file_pairs, groups, ratios)):
+            for pair, ratio in zip(group, group_ratios):
+                if ratio is None:
+                    pruned[pair] = position
+                else:
+                    results[pair] = pending[pair] = ratio
+
+            file_ratios = []
+            for other in others:
+                pair = get_content_pair(_file, other)
+                if pair not in results and top_k is not None and pruned.get(pair) != position:
+                    # Pruned for another file's k best, which doesn't bound this file's ones
+                    ratio = matcher.bounded_ratio(
+                        corpus[pair[0]], corpus[pair[1]], minimum=float(threshold), stats=stats
+                    )
+                    if ratio is not None:
+                        results[pair] = pending[pair] = ratio
+                file_ratios.append(results.get(pair))
+
+            if len(pending) >= 1000:
+                _store_results(pending, keys=keys)
+                pending = {}
+            yield file_ratios
+    finally:
+        # Ratios computed before the run stopped are still worth keeping
+        _store_results(pending, keys=keys)
+        if logger.isEnabledFor(logging.INFO):
+            tiers = ", ".join(f"{tier} {stats[tier]}" for tier in PrefilterTier.TIER_LIST)
+            logger.info("Plagiarism pairs of contents: %s total, %s stored, %s", len(pairs), stored, tiers)
+
+
+def _store_results(results: Dict[ContentPair, float], keys: Dict[str, str]) -> None:
+    for ext, key in keys.items():
+        ext_results = {(first[0], second[0]): ratio for (first, second), ratio in results.items() if first[1] == ext}
+        if ext_results:
+            store_results(ext_results, key)
+
+
+def _load_corpus(
+    files: Iterable[ProjectFileIndex], baseline: Optional[Baseline] = None, profile: str = TokenProfile.ALL
+) -> Dict[ContentKey, Sequence]:
+    files = list(files)
+    tokens = get_files_tokens(files, profile=profile)
+    if baseline is None:
+        return {(_file.digest, _file.ext): tokens[_file.source_id].types for _file in files}
+    return {(_file.digest, _file.ext): baseline.strip(tokens[_file.source_id].types, ext=_file.ext) for _file in files}
+
+
+def _get_trivial_ratio(corpus: Dict[ContentKey, Sequence], pair: ContentPair) -> Optional[float]:
+    # Files that are nothing but starter code have nothing left to match
+    if not len(corpus[pair[0]]) or not len(corpus[pair[1]]):
+        return 0.0
+    if pair[0] == pair[1]:
+        return 1.0
+    return None
@@ -0,0 +1,84 @@
+"""
+Lookups of the persisted fingerprint index, see `SourceFingerprint`. Unlike `FingerprintIndex`, which is built from
+every file a detection run compares, only the postings of the looked up fingerprints are ever read, so finding the
+candidates of a file costs the same however many archives were indexed.
+"""
+from collections import Counter
+from typing import Collection, Dict, Iterable, Optional, Sequence, Set
+
+from django.db.models import Count
+
+from .models import SourceFingerprint
+
+# Fingerprints or sources looked up per query, keeps queries under the database parameter limits
+LOOKUP_BATCH_SIZE: int = 500
+
+
+def count_shared_fingerprints(fingerprints: Sequence[int], profile: str) -> Dict[int, int]:
+    """
+    Returns the number of the given fingerprints that every parsed source sharing any of them has under a
+    tokenization profile, mapped by parsed source id.
+    """
+    fingerprints = [int(fingerprint) for fingerprint in fingerprints]
+    shared = Counter()
+    for start in range(0, len(fingerprints), LOOKUP_BATCH_SIZE):
+        batch = fingerprints[start : start + LOOKUP_BATCH_SIZE]  # noqa
+        stored = (
+            SourceFingerprint._default_manager.filter(profile=profile, fingerprint__in=batch)
+            .values("source_id")
+            .annotate(shared=Count("id"))
+            .values_list("source_id", "shared")
+        )
+        shared.update(dict(stored))
+    return shared
+
+
+def count_fingerprints(
+    source_ids: Iterable[int], profile: str, excluded: Optional[Collection[int]] = None
+) -> Dict[int, int]:
+    """
+    Returns the number of fingerprints of the given parsed sources under a tokenization profile mapped by their id.
+
+    :excluded: optional fingerprints that aren't counted, i.e the ones of the starter code
+    """
+    source_ids = list(source_ids)
+    sizes = Counter()
+    for start in range(0, len(source_ids), LOOKUP_BATCH_SIZE):
+        batch = source_ids[start : start + LOOKUP_BATCH_SIZE]  # noqa
+        stored = SourceFingerprint._default_manager.filter(profile=profile, source_id__in=batch)
+        if excluded:
+            # Starter code can't be excluded in the query, it has more fingerprints than a query can take
+            sizes.update(
+                source_id
+                for source_id, fingerprint in stored.values_list("source_id", "fingerprint").iterator()
+                if fingerprint not in excluded
+            )
+        else:
+            sizes.update(dict(stored.values("source_id").annotate(size=Count("id")).values_list("source_id", "size")))
+    return dict(sizes)
+
+
+def find_candidate_sources(
+    fingerprints: Sequence[int], profile: str, min_jaccard: float, excluded: Optional[Collection[int]] = None
+) -> Set[int]:
+    """
+    Returns the ids of the parsed sources whose fingerprints overlap the given ones by at least `min_jaccard`, see
+    `FingerprintIndex.candidates`. Sources have to share at least one fingerprint to be found, so files shorter than a
+    single k-gram are never candidates.
+
+    :excluded: optional fingerprints that were removed from the given ones, i.e the ones of the starter code. They're
+        left out of the sources' fingerprints too, so both sides of the overlap are counted alike
+    """
+    if not len(fingerprints):
+        return set()
+
+    shared = count_shared_fingerprints(fingerprints, profile=profile)
+    if min_jaccard <= 0:
+        return set(shared)
+
+    sizes = count_fingerprints(shared.keys(), profile=profile, excluded=excluded)
+    return {
+        source_id
+        for source_id, intersection in shared.items()
+        if intersection / (len(fingerprints) + sizes[source_id] - intersection) >= min_jaccard
+    }
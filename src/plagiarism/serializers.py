@@ -2,11 +2,16 @@ import zipfile
 import pathlib as pl
 
 from rest_framework import serializers
+from django.conf import settings
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils.translation import gettext_lazy as _
+from rest_flex_fields import FlexFieldsModelSerializer
 
-from courses.models import Project
+from courses.models import Course, Project, ProjectRequirement
+from .models import PlagiarismJob
+from .constants import CompareFormat, PlagiarismEngine, PlagiarismScope, TokenProfile
 from .sources import SupportedLanguages
+from .index import get_project_index
 
 
 class ProjectPlagiarismCompareRequestSerializer(serializers.Serializer):
@@ -33,6 +38,33 @@ class ProjectPlagiarismCompareRequestSerializer(serializers.Serializer):
     html_encoded = serializers.BooleanField(
         required=False, default=False, help_text="If to return the files contents as html escaped text"
     )
+    stream = serializers.BooleanField(
+        required=False, default=False, help_text="If to stream the response body while the files are being rendered"
+    )
+    engine = serializers.ChoiceField(
+        choices=PlagiarismEngine.ENGINE_CHOICES,
+        default=PlagiarismEngine.DIFFLIB,
+        required=False,
+        help_text="Matching engine, greedy string tiling also matches code blocks that were reordered",
+    )
+    min_match_length = serializers.IntegerField(
+        min_value=2,
+        default=settings.PLAG_GST_MIN_MATCH_LENGTH,
+        required=False,
+        help_text="Minimum number of tokens of a match, only used by greedy string tiling",
+    )
+    profile = serializers.ChoiceField(
+        choices=TokenProfile.PROFILE_CHOICES,
+        default=TokenProfile.ALL,
+        required=False,
+        help_text="Tokenization profile, shorter profiles are compared faster but keep less of the code",
+    )
+    format = serializers.ChoiceField(
+        choices=CompareFormat.FORMAT_CHOICES,
+        default=CompareFormat.TEXT,
+        required=False,
+        help_text="Response format, regions only returns the matched byte offsets of both files and their ratio",
+    )
 
     def validate(self, data: dict) -> dict:
 
@@ -45,66 +77,37 @@ class ProjectPlagiarismCompareRequestSerializer(serializers.Serializer):
                 }
             )
 
-        first_course = data["first_project"].team.requirement.course_id
-        second_course = data["second_project"].team.requirement.course_id
-
-        # Can't check plagiarism for a project in a different course
-        if first_course != second_course:
+        # Token ids are only comparable within the same language
+        if pl.Path(data["first_file"]).suffix != pl.Path(data["second_file"]).suffix:
             raise serializers.ValidationError(
-                detail={
-                    "first_project": _("Project must be in the same course to be able to compare"),
-                    "second_project": _("Project must be in the same course to be able to compare"),
-                }
+                detail={"second_file": _("Files must have the same extension to be able to compare")}
             )
 
-        try:
-            # Checking integrity of the first project zipfile
-            with zipfile.ZipFile(data["first_project"].project_zip.file) as zfile:
-                if zfile.testzip() is not None:
-                    raise serializers.ValidationError(
-                        detail={"first_project": _("Faulty files were found in the project files.")}, code=500
-                    )
-                fpath = zipfile.Path(zfile, at=data["first_file"])
-                # Checking if given file path is an actual file path
-                if not fpath.is_file() or not fpath.exists():
-                    raise serializers.ValidationError(
-                        detail={"first_file": _("Please enter a valid file path in the project")}
-                    )
-                # Checking if given first file extension is a supported for plagiarism
-                elif SupportedLanguages.detect_language(ext=pl.Path(data["first_file"]).suffix) is None:
-                    raise serializers.ValidationError(detail={"first_file": _("This file type is not supported")})
-        except zipfile.BadZipfile:
-            raise serializers.ValidationError(
-                detail={
-                    "first_project": _("An unexpected error happened when trying to open the project files."),
-                },
-                code=500,
-            )
+        self._validate_file(data["first_project"], data["first_file"], "first_project", "first_file")
+        self._validate_file(data["second_project"], data["second_file"], "second_project", "second_file")
+        return data
+
+    @staticmethod
+    def _validate_file(project: Project, path: str, project_field: str, file_field: str) -> None:
+        """
+        Checks that a file can be compared using the project index, archives were already checked when uploaded.
+        """
+        # Checking if given file extension is a supported for plagiarism
+        if not SupportedLanguages.is_supported(ext=pl.Path(path).suffix):
+            raise serializers.ValidationError(detail={file_field: _("This file type is not supported")})
 
         try:
-            # Checking integrity of the second project zipfile
-            with zipfile.ZipFile(data["second_project"].project_zip.file) as zfile:
-                if zfile.testzip() is not None:
-                    raise serializers.ValidationError(
-                        detail={"second_project": _("Faulty files were found in the project files.")}, code=500
-                    )
-                fpath = zipfile.Path(zfile, at=data["second_file"])
-                # Checking if given file path is an actual file path
-                if not fpath.is_file() or not fpath.exists():
-                    raise serializers.ValidationError(
-                        detail={"second_file": _("Please enter a valid file path in the project")}
-                    )
-                # Checking if given second file extension is a supported for plagiarism
-                elif SupportedLanguages.detect_language(ext=pl.Path(data["second_file"]).suffix) is None:
-                    raise serializers.ValidationError(detail={"second_file": _("This file type is not supported")})
-        except zipfile.BadZipfile:
+            index = get_project_index(project)
+        except (zipfile.BadZipfile, FileNotFoundError):
             raise serializers.ValidationError(
                 detail={
-                    "second_project": _("An unexpected error happened when trying to open the project files."),
+                    project_field: _("An unexpected error happened when trying to open the project files."),
                 },
                 code=500,
             )
-        return data
+        # Checking if given file path is an indexed source file
+        if not index.files.filter(path=path).exists():
+            raise serializers.ValidationError(detail={file_field: _("Please enter a valid file path in the project")})
 
 
 # ! This is mostly for swagger documentation purposes
@@ -117,6 +120,22 @@ class ProjectPlagiarismCompareResponseSerializer(serializers.Serializer):
     second_file = serializers.CharField(help_text="Marked plagiarized contents of the second project file")
 
 
+class ProjectPlagiarismCompareRegionsSerializer(serializers.Serializer):
+    """
+    Custom serializer used to represent region responses for the project plagiarism compare view.
+    """
+
+    ratio = serializers.DecimalField(help_text="Plagiarism ratio", max_digits=3, decimal_places=2)
+    first_regions = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField(), min_length=2, max_length=2),
+        help_text="Sorted (start, end) byte offsets of the matched regions of the first project file",
+    )
+    second_regions = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField(), min_length=2, max_length=2),
+        help_text="Sorted (start, end) byte offsets of the matched regions of the second project file",
+    )
+
+
 # ! This is mostly for swagger documentation purposes
 class ProjectPlagiarismRequestSerializer(serializers.Serializer):
     """
@@ -135,16 +154,56 @@ class ProjectPlagiarismRequestSerializer(serializers.Serializer):
         coerce_to_string=False,  # To disable default being a string
     )
     project = serializers.SlugRelatedField(slug_field="uid", queryset=Project._default_manager.all())
+    engine = serializers.ChoiceField(
+        choices=PlagiarismEngine.ENGINE_CHOICES,
+        default=PlagiarismEngine.DIFFLIB,
+        required=False,
+        help_text="Matching engine, greedy string tiling also matches code blocks that were reordered",
+    )
+    min_match_length = serializers.IntegerField(
+        min_value=2,
+        default=settings.PLAG_GST_MIN_MATCH_LENGTH,
+        required=False,
+        help_text="Minimum number of tokens of a match, only used by greedy string tiling",
+    )
+    profile = serializers.ChoiceField(
+        choices=TokenProfile.PROFILE_CHOICES,
+        default=TokenProfile.ALL,
+        required=False,
+        help_text="Tokenization profile, shorter profiles are compared faster but keep less of the code",
+    )
+    top_k = serializers.IntegerField(
+        min_value=1,
+        default=None,
+        allow_null=True,
+        required=False,
+        help_text="If given, only the best k matches of every file are returned, best first",
+    )
+    scope = serializers.ChoiceField(
+        choices=PlagiarismScope.SCOPE_CHOICES,
+        default=PlagiarismScope.REQUIREMENT,
+        required=False,
+        help_text="Projects that the project is checked against, other scopes look up every requirement of the "
+        "courses in the persisted fingerprint index",
+    )
+    courses = serializers.SlugRelatedField(
+        slug_field="uid",
+        queryset=Course._default_manager.all(),
+        many=True,
+        default=list,
+        required=False,
+        help_text="Courses that the project is checked against, only used by the courses scope",
+    )
 
     def validate(self, data: dict) -> dict:
+        # Courses scope needs the courses to check against
+        if data["scope"] == PlagiarismScope.COURSES and not data["courses"]:
+            raise serializers.ValidationError(detail={"courses": _("Please choose the courses to check against")})
+
         try:
-            # Checking integrity of the project zipfile
-            with zipfile.ZipFile(data["project"].project_zip.file) as zfile:
-                if zfile.testzip() is not None:
-                    raise serializers.ValidationError(
-                        detail={"project": _("Faulty files were found in the project files.")}, code=500
-                    )
-        except zipfile.BadZipfile:
+            # Archives were already checked when uploaded, indexing them fails if they can't be read anymore
+            get_project_index(data["project"])
+        except (zipfile.BadZipfile, FileNotFoundError):
             raise serializers.ValidationError(
                 detail={
                     "project": _("An unexpected error happened when trying to open the project files."),
@@ -195,3 +254,151 @@ class ProjectPlagiarismResponseSerializer(serializers.Serializer):
         help_text="Avg. Plagiarism ratio", max_digits=3, decimal_places=2, default=0.0, required=False
     )
     files = serializers.ListField(child=ProjectPlagiarismFileSerializer(), allow_empty=True)
+
+
+# ! This is mostly for swagger documentation purposes
+class ProjectPlagiarismSummarySerializer(serializers.Serializer):
+    """
+    Custom serializer used to represent the last event of streamed responses for the project plagiarism view.
+    """
+
+    ratio = serializers.DecimalField(
+        help_text="Avg. Plagiarism ratio", max_digits=3, decimal_places=2, default=0.0, required=False
+    )
+
+
+# ! This is mostly for swagger documentation purposes
+class RequirementPlagiarismRequestSerializer(serializers.Serializer):
+    """
+    Custom serializer used to represent requests for the requirement plagiarism view.
+    """
+
+    threshold = serializers.DecimalField(
+        help_text="Value that is going to be used to filter out suspicious pairs that wont meet it. "
+        "Can't be greater than 1 or less than 0.3 for accuracy",
+        max_digits=3,
+        decimal_places=2,
+        min_value=0.3,
+        max_value=1,
+        default=0.3,
+        required=False,
+        coerce_to_string=False,  # To disable default being a string
+    )
+    requirement = serializers.SlugRelatedField(slug_field="uid", queryset=ProjectRequirement._default_manager.all())
+    engine = serializers.ChoiceField(
+        choices=PlagiarismEngine.ENGINE_CHOICES,
+        default=PlagiarismEngine.DIFFLIB,
+        required=False,
+        help_text="Matching engine, greedy string tiling also matches code blocks that were reordered",
+    )
+    min_match_length = serializers.IntegerField(
+        min_value=2,
+        default=settings.PLAG_GST_MIN_MATCH_LENGTH,
+        required=False,
+        help_text="Minimum number of tokens of a match, only used by greedy string tiling",
+    )
+    profile = serializers.ChoiceField(
+        choices=TokenProfile.PROFILE_CHOICES,
+        default=TokenProfile.ALL,
+        required=False,
+        help_text="Tokenization profile, shorter profiles are compared faster but keep less of the code",
+    )
+    background = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="If to queue the comparisons as a plagiarism job instead, large requirements should be checked so",
+    )
+
+
+# ! This is mostly for swagger documentation purposes
+class RequirementPlagiarismPairSerializer(serializers.Serializer):
+    """
+    Custom serializer used to represent a suspicious pair of projects for the requirement plagiarism view.
+    """
+
+    first_project = serializers.SlugRelatedField(slug_field="uid", queryset=Project._default_manager.all())
+    first_project_title = serializers.CharField(help_text="First project title")
+    first_file = serializers.CharField(help_text="Most plagiarized file path in the first project")
+    second_project = serializers.SlugRelatedField(slug_field="uid", queryset=Project._default_manager.all())
+    second_project_title = serializers.CharField(help_text="Second project title")
+    second_file = serializers.CharField(help_text="Most plagiarized file path in the second project")
+    ratio = serializers.DecimalField(help_text="Plagiarism ratio", max_digits=3, decimal_places=2)
+
+
+# ! This is mostly for swagger documentation purposes
+class RequirementPlagiarismProjectSerializer(serializers.Serializer):
+    """
+    Custom serializer used to represent the highest ratio of a project for the requirement plagiarism view.
+    """
+
+    project = serializers.SlugRelatedField(slug_field="uid", queryset=Project._default_manager.all())
+    project_title = serializers.CharField(help_text="Project title")
+    ratio = serializers.DecimalField(
+        help_text="Highest plagiarism ratio against any other project, 0 if below the threshold",
+        max_digits=3,
+        decimal_places=2,
+    )
+
+
+# ! This is mostly for swagger documentation purposes
+class RequirementPlagiarismResponseSerializer(serializers.Serializer):
+    """
+    Custom serializer used to represent responses for the requirement plagiarism view.
+    """
+
+    projects = serializers.ListField(
+        help_text="Project UIDs in the order of the matrix rows and columns",
+        child=serializers.SlugRelatedField(slug_field="uid", queryset=Project._default_manager.all()),
+        allow_empty=True,
+    )
+    matrix = serializers.ListField(
+        help_text="Condensed upper triangle of the symmetric projects plagiarism ratio matrix, pairs are listed row "
+        "by row so pair (i, j) where i < j is at n * i - i * (i + 1) / 2 + j - i - 1. Ratios below the threshold are 0",
+        child=serializers.DecimalField(max_digits=3, decimal_places=2),
+        allow_empty=True,
+    )
+    pairs = serializers.ListField(
+        help_text="Pairs of projects that met the threshold ranked by ratio",
+        child=RequirementPlagiarismPairSerializer(),
+        allow_empty=True,
+    )
+    maxima = serializers.ListField(child=RequirementPlagiarismProjectSerializer(), allow_empty=True)
+    failures = serializers.ListField(
+        help_text="Project UIDs that plagiarism detection failed to check for some reason",
+        child=serializers.SlugRelatedField(slug_field="uid", queryset=Project._default_manager.all()),
+        allow_empty=True,
+    )
+
+
+class PlagiarismJobSerializer(FlexFieldsModelSerializer):
+    """
+    A serializer responsible for displaying plagiarism job instances.
+    """
+
+    project = serializers.SlugRelatedField(slug_field="uid", read_only=True)
+    requirement = serializers.SlugRelatedField(slug_field="uid", read_only=True)
+
+    class Meta:
+        model = PlagiarismJob
+        fields = [
+            "uid",
+            "project",
+            "requirement",
+            "threshold",
+            "engine",
+            "min_match_length",
+            "top_k",
+            "profile",
+            "scope",
+            "courses",
+            "stats",
+            "status",
+            "attempts",
+            "progress",
+            "total",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
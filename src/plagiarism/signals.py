@@ -0,0 +1,23 @@
+import zipfile
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from courses.models import Project
+from .index import get_project_index
+
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance: Project, **kwargs) -> None:
+    """
+    Builds the plagiarism index of a project once its upload or update is committed.
+    """
+
+    def _index() -> None:
+        try:
+            get_project_index(instance)
+        except (zipfile.BadZipfile, FileNotFoundError):
+            pass  # Index will be rebuilt lazily, where failures are reported per project
+
+    transaction.on_commit(_index)
@@ -1,133 +1,638 @@
+import ctypes
 import difflib
+import hashlib
 import html
-from typing import Optional, Tuple, Dict, List
+import os
+import tempfile
+import threading
+import zlib
+from collections import Counter, defaultdict
+from array import array
+from typing import Optional, Tuple, Dict, Iterable, Iterator, List, Sequence
 
 
 from django.conf import settings
-from tree_sitter import Language, Parser, Tree, TreeCursor
+import tree_sitter
+from tree_sitter import Language, Parser, Tree, TreeCursor, binding
 
-from .tokens import Token, parse_tree
+from .tokens import Alphabet, TokenStream
+from .constants import PlagiarismEngine, PrefilterTier, TokenProfile
+from .fingerprints import hash_kgrams
+
+# (start, end) byte offsets of a region in a source
+Interval = Tuple[int, int]
+
+# (start in the first sequence, start in the second sequence, size) of a matched block of tokens
+Block = Tuple[int, int, int]
+
+# Buckets of type ids of the coarse token histograms, see `get_histogram`
+HISTOGRAM_BUCKETS: int = 32
+
+# Extensions of the grammar sources that are compiled into a language library, including their headers
+GRAMMAR_SOURCE_EXTS: Tuple[str, ...] = (".c", ".cc", ".h")
+
+# Node type of the nodes tree-sitter creates for unparsable source, which isn't part of any language symbols
+ERROR_NODE_TYPE: str = "ERROR"
+
+
+def get_symbol_names(language: Language) -> List[str]:
+    """
+    Takes a tree_sitter Language instance and returns the names of all its symbols in symbol order
+    """
+    # The python binding doesn't expose the symbol table, the C API is read from the binding library itself
+    library = ctypes.CDLL(binding.__file__)
+    library.ts_language_symbol_count.argtypes = [ctypes.c_void_p]
+    library.ts_language_symbol_count.restype = ctypes.c_uint32
+    library.ts_language_symbol_name.argtypes = [ctypes.c_void_p, ctypes.c_uint16]
+    library.ts_language_symbol_name.restype = ctypes.c_char_p
+
+    count = library.ts_language_symbol_count(language.language_id)
+    return [library.ts_language_symbol_name(language.language_id, symbol).decode("utf-8") for symbol in range(count)]
+
+
+class Grammar:
+    """
+    Structure that represents the tree-sitter grammar of a supported language, compiled into a library of its own by
+    `setup_plagiarism` and only loaded once one of its files is parsed
+
+    :name: language name the grammar was generated with, i.e "python" for the `tree_sitter_python` symbol
+
+    :path: directory of the grammar sources, i.e a tree-sitter-python clone
+
+    :exts: file extensions of the language
+
+    :statement_suffixes: node type suffixes of the language's statements, see `TokenProfile.STATEMENT`
+    """
+
+    __slots__ = ("name", "path", "exts", "statement_suffixes")
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        exts: Sequence[str],
+        statement_suffixes: Sequence[str] = TokenProfile.STATEMENT_SUFFIXES,
+    ):
+        self.name = name
+        self.path = path
+        self.exts = tuple(exts)
+        self.statement_suffixes = tuple(statement_suffixes)
+
+    @property
+    def library(self) -> str:
+        """
+        Returns the path of the grammar's compiled library
+        """
+        return os.path.join(settings.PLAG_LANGUAGES_DIR, f"{self.name}.so")
+
+    @property
+    def stamp(self) -> str:
+        """
+        Returns the path of the file that keeps the digest of the sources the library was compiled from
+        """
+        return f"{self.library}.sha256"
+
+    def source_digest(self) -> str:
+        """
+        Returns the digest of the grammar sources, i.e the generated parser and scanner, along with the tree-sitter
+        binding that compiles them
+        """
+        # (name, path) of every source, named regardless of where they're checked out or installed
+        sources = [("tree_sitter", tree_sitter.__file__)]
+        for root, dirs, files in os.walk(os.path.join(self.path, "src")):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(GRAMMAR_SOURCE_EXTS):
+                    path = os.path.join(root, name)
+                    sources.append((os.path.relpath(path, self.path), path))
+
+        digest = hashlib.sha256()
+        for name, path in sources:
+            with open(path, "rb") as source:
+                digest.update(name.encode("utf-8") + b"\0" + hashlib.sha256(source.read()).digest())
+        return digest.hexdigest()
+
+    def build(self, force: bool = False) -> bool:
+        """
+        Compiles the grammar into its library unless it was already compiled from the same sources
+
+        Returns whether the grammar was compiled
+        """
+        digest = self.source_digest()
+        if not force and os.path.exists(self.library) and os.path.exists(self.stamp):
+            with open(self.stamp, "r") as stamp:
+                if stamp.read().strip() == digest:
+                    return False
+
+        # Compiled next to the library and moved over it, so processes never load a half written library. Every build
+        # has a file of its own, even across containers sharing the directory
+        os.makedirs(os.path.dirname(self.library), exist_ok=True)
+        descriptor, output = tempfile.mkstemp(dir=os.path.dirname(self.library), suffix=".so")
+        os.close(descriptor)
+        # tree-sitter takes libraries newer than their sources as up to date
+        os.utime(output, (0, 0))
+        try:
+            Language.build_library(output, [self.path])
+            # Temporary files are only readable by their owner
+            os.chmod(output, 0o644)
+            os.replace(output, self.library)
+        finally:
+            if os.path.exists(output):
+                os.remove(output)
+        with open(self.stamp, "w") as stamp:
+            stamp.write(digest)
+        return True
 
 
 class SupportedLanguages:
     """
-    Structure that represents the supported languages for plagiarism
+    Registry of the supported languages for plagiarism, the ones of `PLAG_LANGUAGES` are registered on first use
+
+    Every language is loaded from its own compiled library the first time one of its files is parsed, so languages
+    that are never seen cost nothing. Loaded languages and their alphabets are kept once per process and parsers are
+    reused per thread.
     """
 
-    python: str = "python"
-    javascript: str = "javascript"
-    exts: Dict[str, str] = {".py": python, ".js": javascript}
+    _grammars: Optional[Dict[str, Grammar]] = None
+    _exts: Dict[str, Grammar] = {}
+    _languages: Dict[str, Language] = {}
+    _alphabets: Dict[str, Alphabet] = {}
+    _versions: Dict[str, str] = {}
+    _lock: threading.RLock = threading.RLock()
+    _local: threading.local = threading.local()
+
+    @classmethod
+    def get_grammars(cls) -> Dict[str, Grammar]:
+        """
+        Returns the registered grammars by language name
+        """
+        if cls._grammars is None:
+            with cls._lock:
+                if cls._grammars is None:
+                    grammars = [Grammar(name, **options) for name, options in settings.PLAG_LANGUAGES.items()]
+                    cls._exts = {ext: grammar for grammar in grammars for ext in grammar.exts}
+                    cls._grammars = {grammar.name: grammar for grammar in grammars}
+        return cls._grammars
+
+    @classmethod
+    def register(cls, grammar: Grammar) -> None:
+        """
+        Adds a grammar to the supported languages, replacing the one of the same language if any
+        """
+        with cls._lock:
+            grammars = dict(cls.get_grammars())
+            previous = grammars.get(grammar.name)
+            grammars[grammar.name] = grammar
+            exts = {ext: other for ext, other in cls._exts.items() if other is not previous}
+            exts.update({ext: grammar for ext in grammar.exts})
+            cls._grammars, cls._exts = grammars, exts
+            for loaded in (cls._languages, cls._alphabets, cls._versions):
+                loaded.pop(grammar.name, None)
+
+    @classmethod
+    def get_grammar(cls, ext: str) -> Optional[Grammar]:
+        """
+        Takes file extension and returns the grammar of its supported language without loading it
+        """
+        cls.get_grammars()
+        return cls._exts.get(ext)
 
     @classmethod
     def get_language(cls, language: str) -> Optional[Language]:
         """
-        Takes one of the supported language options and returns a tree_sitter Language instance
+        Takes one of the supported language names and returns a tree_sitter Language instance
         """
-        if language in cls.exts.values():
-            return Language(settings.PLAG_COMPILED_LIBRARY, language)
-        else:
+        grammar = cls.get_grammars().get(language)
+        if grammar is None:
             return None
 
+        loaded = cls._languages.get(language)
+        if loaded is None:
+            with cls._lock:
+                loaded = cls._languages.get(language)
+                if loaded is None:
+                    loaded = cls._languages[language] = Language(grammar.library, language)
+        return loaded
+
     @classmethod
     def detect_language(cls, ext: str) -> Optional[Language]:
         """
         Takes file extension and maps it to a possible supported language
         i.e  ".py" => Python
         """
-        if ext in cls.exts:
-            return cls.get_language(cls.exts[ext])
-        else:
+        grammar = cls.get_grammar(ext)
+        if grammar is None:
+            return None
+        return cls.get_language(grammar.name)
+
+    @classmethod
+    def is_supported(cls, ext: str) -> bool:
+        """
+        Checks if a file extension belongs to a supported language whose library is available, without loading the
+        language
+        """
+        grammar = cls.get_grammar(ext)
+        return grammar is not None and cls.get_version(grammar.name) is not None
+
+    @classmethod
+    def get_parser(cls, ext: str) -> Optional[Parser]:
+        """
+        Takes file extension and returns a parser of its supported language that is reused by the current thread
+        """
+        grammar = cls.get_grammar(ext)
+        if grammar is None:
             return None
 
+        parsers: Dict[str, Parser] = cls._local.__dict__.setdefault("parsers", {})
+        parser = parsers.get(grammar.name)
+        if parser is None:
+            parser = parsers[grammar.name] = Parser()
+            parser.set_language(cls.get_language(grammar.name))
+        return parser
+
+    @classmethod
+    def get_alphabet(cls, ext: str) -> Optional[Alphabet]:
+        """
+        Takes file extension and returns the node type ids of its supported language
+        """
+        grammar = cls.get_grammar(ext)
+        if grammar is None:
+            return None
+
+        alphabet = cls._alphabets.get(grammar.name)
+        if alphabet is None:
+            names = get_symbol_names(cls.get_language(grammar.name))
+            with cls._lock:
+                alphabet = cls._alphabets.setdefault(grammar.name, Alphabet(names + [ERROR_NODE_TYPE]))
+        return alphabet
+
+    @classmethod
+    def get_version(cls, language: str) -> Optional[str]:
+        """
+        Returns a short digest of the compiled library of a supported language, which its alphabet is generated from,
+        without loading the language. Returns none if the language isn't registered or its library isn't available,
+        i.e it wasn't compiled yet
+        """
+        version = cls._versions.get(language)
+        if version is None:
+            grammar = cls.get_grammars().get(language)
+            if grammar is None:
+                return None
+            digest = 0
+            try:
+                with open(grammar.library, "rb") as library:
+                    for chunk in iter(lambda: library.read(1024 * 1024), b""):
+                        digest = zlib.crc32(chunk, digest)
+            except OSError:
+                return None
+            with cls._lock:
+                version = cls._versions.setdefault(language, f"{digest:08x}")
+        return version
+
+    @classmethod
+    def load(cls, languages: Optional[Iterable[str]] = None) -> None:
+        """
+        Loads supported languages and their alphabets upfront, all of them unless only some are given. Languages that
+        aren't registered or available are ignored
+        """
+        grammars = cls.get_grammars()
+        for language in grammars if languages is None else languages:
+            if language in grammars and cls.get_version(language) is not None:
+                cls.get_alphabet(grammars[language].exts[0])
+
 
 def parse_source(source: str, ext: str) -> Optional[Tree]:
     """
     Takes a program source code and a supported file extension and returns a valid tree_sitter Tree instance
     """
-    language = SupportedLanguages.detect_language(ext=ext)
-    if language is None:
+    parser = SupportedLanguages.get_parser(ext=ext)
+    if parser is None:
         return None
 
-    parser = Parser()
-    parser.set_language(language)
-
     tree = parser.parse(bytes(source, "utf8"))
     return tree
 
 
-def detect_plagiarism_ratio(source1: str, source2: str, ext: str) -> float:
+def detect_plagiarism_ratio(tokens1: Sequence[int], tokens2: Sequence[int]) -> float:
     """
-    Takes 2 sources codes and detects possible plagiarism by matching sequences and returns plagiarism ratio.
+    Takes 2 token type id sequences and detects possible plagiarism by matching sequences and returns plagiarism ratio.
     """
-    source_tree: TreeCursor = parse_source(source=source1, ext=ext)
-    other_source_tree: TreeCursor = parse_source(source=source2, ext=ext)
+    return difflib.SequenceMatcher(None, tokens1, tokens2).ratio()
 
-    source_parse: list[Token] = parse_tree(source_tree.walk(), child_only=False)
-    other_source_parse: list[Token] = parse_tree(other_source_tree.walk(), child_only=False)
-    _, _, plag_ratio = match_sequences(
-        tokens1=source_parse,
-        tokens2=other_source_parse,
-        source1=source1,
-        source2=source2,
-    )
-    return plag_ratio
+
+def calculate_ratio(blocks: Iterable[Block], size1: int, size2: int) -> float:
+    """
+    Returns the plagiarism ratio of two token sequences given their matched blocks, twice the matched tokens
+    over the total tokens like `difflib.SequenceMatcher.ratio`
+    """
+    if not size1 + size2:
+        return 1.0
+    return 2 * sum(block[2] for block in blocks) / (size1 + size2)
+
+
+def calculate_upper_bound(tokens1: Sequence[int], tokens2: Sequence[int]) -> float:
+    """
+    Returns an upper bound of the plagiarism ratio of two token sequences from the tokens they have in common
+    regardless of order, like `difflib.SequenceMatcher.quick_ratio`. Engines never match a token twice, so it holds
+    for every engine.
+    """
+    if not len(tokens1) + len(tokens2):
+        return 1.0
+    common = Counter(tokens1) & Counter(tokens2)
+    return 2 * sum(common.values()) / (len(tokens1) + len(tokens2))
+
+
+def get_histogram(tokens: Sequence[int]) -> array:
+    """
+    Returns the coarse histogram of a token sequence, the number of its tokens in every bucket of type ids.
+    """
+    histogram = array("I", [0]) * HISTOGRAM_BUCKETS
+    for type_id in tokens:
+        histogram[type_id % HISTOGRAM_BUCKETS] += 1
+    return histogram
+
+
+def calculate_histogram_upper_bound(histogram1: Sequence[int], histogram2: Sequence[int]) -> float:
+    """
+    Returns an upper bound of the plagiarism ratio of two token sequences from their coarse histograms, looser than
+    `calculate_upper_bound` but only takes a fixed number of steps once the histograms are computed.
+    """
+    size = sum(histogram1) + sum(histogram2)
+    if not size:
+        return 1.0
+    return 2 * sum(map(min, histogram1, histogram2)) / size
+
+
+class Matcher:
+    """
+    Base structure for token sequence matching engines.
+
+    Engines are shipped to the worker processes of a detection run, so they must stay picklable.
+    """
+
+    def matching_blocks(self, tokens1: Sequence[int], tokens2: Sequence[int]) -> List[Block]:
+        """
+        Takes 2 token type id sequences and returns their non overlapping matched blocks ordered by the first sequence
+        """
+        raise NotImplementedError
+
+    def ratio(self, tokens1: Sequence[int], tokens2: Sequence[int]) -> float:
+        """
+        Takes 2 token type id sequences and returns their plagiarism ratio.
+        """
+        return calculate_ratio(self.matching_blocks(tokens1, tokens2), len(tokens1), len(tokens2))
+
+    def bounded_ratio(
+        self,
+        tokens1: Sequence[int],
+        tokens2: Sequence[int],
+        minimum: float,
+        histograms: Optional[Tuple[Sequence[int], Sequence[int]]] = None,
+        stats: Optional[Counter] = None,
+    ) -> Optional[float]:
+        """
+        Takes 2 token type id sequences and returns their plagiarism ratio, or none without computing it if any of
+        their ratio's upper bounds is below `minimum`. Bounds are tried from the cheapest to the tightest.
+
+        :histograms: optional `get_histogram` of both sequences, only bounded by if given
+
+        :stats: optional counter of the `PrefilterTier` that ruled out or compared the pair
+        """
+        tier = PrefilterTier.FULL
+        if minimum > 0:
+            size = len(tokens1) + len(tokens2)
+            # Matched tokens can't outnumber the shorter sequence
+            if size and 2 * min(len(tokens1), len(tokens2)) / size < minimum:
+                tier = PrefilterTier.LENGTH
+            elif histograms is not None and calculate_histogram_upper_bound(*histograms) < minimum:
+                tier = PrefilterTier.HISTOGRAM
+            elif calculate_upper_bound(tokens1, tokens2) < minimum:
+                tier = PrefilterTier.QUICK
+
+        if stats is not None:
+            stats[tier] += 1
+        if tier != PrefilterTier.FULL:
+            return None
+        return self.ratio(tokens1, tokens2)
+
+    def key(self) -> str:
+        """
+        Returns a key that is unique for the engine and its parameters, equal keys give equal ratios.
+        """
+        raise NotImplementedError
+
+
+class DifflibMatcher(Matcher):
+    """
+    Matches the longest common blocks in order using difflib, blocks that were moved around are mostly missed.
+    """
+
+    def matching_blocks(self, tokens1: Sequence[int], tokens2: Sequence[int]) -> List[Block]:
+        seq_matcher = difflib.SequenceMatcher(None, tokens1, tokens2)
+        return [tuple(block) for block in seq_matcher.get_matching_blocks() if block.size]
+
+    def ratio(self, tokens1: Sequence[int], tokens2: Sequence[int]) -> float:
+        return detect_plagiarism_ratio(tokens1=tokens1, tokens2=tokens2)
+
+    def key(self) -> str:
+        return PlagiarismEngine.DIFFLIB
+
+
+class GreedyStringTilingMatcher(Matcher):
+    """
+    Running Karp-Rabin Greedy String Tiling, the JPlag algorithm. Tiles the longest common blocks first regardless
+    of their order, so reordered functions or statements are still matched.
+
+    :min_match_length: blocks shorter than this number of tokens are never matched
+
+    :initial_search_length: block length the first search starts from, searches then halve down to min_match_length
+    """
+
+    def __init__(self, min_match_length: int = 12, initial_search_length: int = 20):
+        self.min_match_length = min_match_length
+        self.initial_search_length = initial_search_length
+
+    def key(self) -> str:
+        return f"{PlagiarismEngine.GREEDY_STRING_TILING}:{self.min_match_length}:{self.initial_search_length}"
+
+    def matching_blocks(self, tokens1: Sequence[int], tokens2: Sequence[int]) -> List[Block]:
+        marked1, marked2 = bytearray(len(tokens1)), bytearray(len(tokens2))
+        tiles: List[Block] = []
+
+        search_length = max(self.initial_search_length, self.min_match_length)
+        while True:
+            longest, matches = self._scan(tokens1, tokens2, marked1, marked2, search_length)
+            if longest > 2 * search_length:
+                # Much longer blocks exist, searching for them directly avoids tiling pieces of them first
+                search_length = longest
+                continue
+
+            self._mark(matches, marked1, marked2, tiles)
+            if search_length > 2 * self.min_match_length:
+                search_length //= 2
+            elif search_length > self.min_match_length:
+                search_length = self.min_match_length
+            else:
+                break
+        return sorted(tiles)
+
+    @staticmethod
+    def _scan(
+        tokens1: Sequence[int], tokens2: Sequence[int], marked1: bytearray, marked2: bytearray, length: int
+    ) -> Tuple[int, List[Tuple[int, int, int]]]:
+        """
+        Returns the longest found length and the (size, start1, start2) of every maximal unmarked common block of
+        at least `length` tokens, stopping early once a block longer than twice `length` is found.
+        """
+        # Unmarked windows of the second sequence grouped by their Karp-Rabin hash
+        windows: Dict[int, List[int]] = defaultdict(list)
+        hashes = hash_kgrams(tokens2, k=length)
+        j = 0
+        while j < len(hashes):
+            marked = marked2.find(1, j, j + length)
+            if marked != -1:
+                j = marked + 1
+                continue
+            windows[hashes[j]].append(j)
+            j += 1
+
+        longest = 0
+        matches = []
+        size1, size2 = len(tokens1), len(tokens2)
+        hashes = hash_kgrams(tokens1, k=length)
+        i = 0
+        while i < len(hashes):
+            marked = marked1.find(1, i, i + length)
+            if marked != -1:
+                i = marked + 1
+                continue
+
+            for j in windows.get(hashes[i], ()):
+                # Blocks that extend to the left were already found starting from the previous tokens
+                if i and j and tokens1[i - 1] == tokens2[j - 1] and not marked1[i - 1] and not marked2[j - 1]:
+                    continue
+                if tokens1[i : i + length] != tokens2[j : j + length]:  # noqa
+                    continue  # Hash collision
+
+                size = length
+                while size < min(size1 - i, size2 - j):
+                    if tokens1[i + size] != tokens2[j + size] or marked1[i + size] or marked2[j + size]:
+                        break
+                    size += 1
+                if size > 2 * length:
+                    return size, []
+
+                longest = max(longest, size)
+                matches.append((size, i, j))
+            i += 1
+        return longest, matches
+
+    @staticmethod
+    def _mark(matches: List[Tuple[int, int, int]], marked1: bytearray, marked2: bytearray, tiles: List[Block]) -> None:
+        """
+        Tiles the found blocks longest first, blocks overlapping an existing tile are left for the later searches.
+        """
+        for size, i, j in sorted(matches, reverse=True):
+            if marked1.find(1, i, i + size) != -1 or marked2.find(1, j, j + size) != -1:
+                continue
+            marked1[i : i + size] = b"\x01" * size  # noqa
+            marked2[j : j + size] = b"\x01" * size  # noqa
+            tiles.append((i, j, size))
+
+
+def get_matcher(engine: str = PlagiarismEngine.DIFFLIB, min_match_length: Optional[int] = None) -> Matcher:
+    """
+    Takes one of the `PlagiarismEngine` options and returns its matcher
+
+    :min_match_length: minimum tokens of a match, only used by the greedy string tiling engine
+    """
+    if engine == PlagiarismEngine.GREEDY_STRING_TILING:
+        return GreedyStringTilingMatcher(min_match_length=min_match_length or settings.PLAG_GST_MIN_MATCH_LENGTH)
+    elif engine == PlagiarismEngine.DIFFLIB:
+        return DifflibMatcher()
+    raise ValueError(f"Unknown plagiarism engine {engine}")
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """
+    Takes (start, end) intervals in any order and returns them sorted with overlapping or touching intervals merged.
+    """
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
 
 
 def match_sequences(
-    tokens1: List[Token], tokens2: List[Token], source1: str, source2: str, marker: str = "@"
-) -> Tuple[str, str, float]:
+    tokens1: TokenStream, tokens2: TokenStream, matcher: Optional[Matcher] = None
+) -> Tuple[List[Interval], List[Interval], float]:
     """
-    Takes 2 Token lists and source codes and detects possible plagiarism by matching sequences. Returns newly marked
-    sources and plagiarism ratio.
+    Takes 2 token streams and detects possible plagiarism by matching sequences. Returns the merged byte intervals
+    of the matched regions in both sources and plagiarism ratio.
 
-    :tokens1: list of tokens that were generated from source1
+    :tokens1: tokens that were generated from the first source
 
-    :tokens2: list of tokens that were generated from source2
+    :tokens2: tokens that were generated from the second source
 
-    :source1: first source code
+    :matcher: matching engine, see `get_matcher`. Defaults to difflib
+    """
+    blocks = (matcher or DifflibMatcher()).matching_blocks(tokens1.types, tokens2.types)
+    intervals1: List[Interval] = []
+    intervals2: List[Interval] = []
+    for a, b, size in blocks:
+        intervals1.extend(zip(tokens1.starts[a : a + size], tokens1.ends[a : a + size]))  # noqa
+        intervals2.extend(zip(tokens2.starts[b : b + size], tokens2.ends[b : b + size]))  # noqa
+    ratio = calculate_ratio(blocks, len(tokens1), len(tokens2))
+    return merge_intervals(intervals1), merge_intervals(intervals2), ratio
 
-    :source2: second source code
 
-    :marker: character marker that will be used to mark matchs
+def iter_tokenize_source(
+    source: str,
+    intervals: List[Interval],
+    start_tokens: str = "{{",
+    end_tokens: str = "}}",
+    html_encoded: bool = False,
+) -> Iterator[str]:
     """
-    seq_matcher = difflib.SequenceMatcher(None, tokens1, tokens2)
-    marked_source1 = source1
-    marked_source2 = source2
-    for match in seq_matcher.get_matching_blocks():
-        if match.size:
-            for tkn in tokens1[match.a : match.a + match.size]:  # noqa
-                # Marking source 1
-                marked_source1 = (
-                    marked_source1[: tkn.line[0]]
-                    + marker * (tkn.line[1] - tkn.line[0])  # noqa
-                    + marked_source1[tkn.line[1] :]  # noqa
-                )
-            for tkn in tokens2[match.b : match.b + match.size]:  # noqa
-                # Marking source 2
-                marked_source2 = (
-                    marked_source2[: tkn.line[0]]
-                    + marker * (tkn.line[1] - tkn.line[0])  # noqa
-                    + marked_source2[tkn.line[1] :]  # noqa
-                )
-    return marked_source1, marked_source2, seq_matcher.ratio()
+    Streaming variant of `tokenize_source` that yields the tokenized source span by span instead of building it.
+    """
+    data = source.encode("utf-8")
+
+    def _render(start: int, end: int) -> str:
+        text = data[start:end].decode("utf-8")
+        return html.escape(text) if html_encoded else text
+
+    position = 0
+    for start, end in intervals:
+        if start > position:
+            yield _render(position, start)
+        marked = _render(start, end)
+        if html_encoded:
+            # This handles the case for if html tags were given they need to be closed before end of line
+            marked = marked.replace("\n", f"{end_tokens}\n{start_tokens}")
+        yield f"{start_tokens}{marked}{end_tokens}"
+        position = end
+    if position < len(data):
+        yield _render(position, len(data))
 
 
 def tokenize_source(
     source: str,
-    marked_source: str,
-    marker: str = "@",
+    intervals: List[Interval],
     start_tokens: str = "{{",
     end_tokens: str = "}}",
     html_encoded: bool = False,
 ) -> str:
     """
-    Takes source code and marked source with a specific marker and returns a new tokenized source:
+    Takes source code and the merged byte intervals of its marked regions and returns a new tokenized source:
 
-    :source: the old source code that is unmarked
+    :source: the source code
 
-    :marked_source: the edited source code that is marked (must be the same length as :source:)
-
-    :marker: the character marker that was used in marking the :marked_source:
+    :intervals: sorted, non overlapping (start, end) byte offsets of the marked regions, see `match_sequences`
 
     :start_tokens: tokens that will be appended at the start of each marked slice.
     if html encoding is enabled then start_tokens will be rendered as an unescaped html
@@ -141,37 +646,19 @@ def tokenize_source(
     # Source
     def foo():
         bar()
-    # Marked source
-    def @@@():
-        @@@()
+    # Intervals
+    [(4, 7), (15, 18)]
     # New tokenized source
     def {foo}():
         {bar}()
     ```
     """
-    tokenized_source = ""
-    word_start = False
-    for old_ch, new_ch in zip(source, marked_source):
-        if new_ch == marker and new_ch != old_ch:
-            if not word_start:
-                tokenized_source += start_tokens
-                word_start = True
-        else:
-            if word_start:
-                tokenized_source += end_tokens
-                word_start = False
-
-        if html_encoded:
-            # This handles the case for if html tags were given they need to be closed before end of line
-            if old_ch == "\n" and word_start:
-                tokenized_source += end_tokens
-                tokenized_source += html.escape(old_ch)
-                tokenized_source += start_tokens
-            else:
-                tokenized_source += html.escape(old_ch)
-        else:
-            tokenized_source += old_ch
-
-    if word_start:
-        tokenized_source += end_tokens
-    return tokenized_source
+    return "".join(
+        iter_tokenize_source(
+            source=source,
+            intervals=intervals,
+            start_tokens=start_tokens,
+            end_tokens=end_tokens,
+            html_encoded=html_encoded,
+        )
+    )
@@ -1,67 +1,158 @@
-import dataclasses
-from typing import Tuple, List, Optional
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from tree_sitter import TreeCursor
 
 
-@dataclasses.dataclass(init=True)
-class Token:
+class Alphabet:
     """
-    Structure that represents each source token with its original location and type
+    Structure that maps the node types of a language to small integer ids in the order they were added
     """
 
-    line: Tuple[int, int]
-    string: str
+    def __init__(self, names: Iterable[str] = ()):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._version: Optional[str] = None
+        for name in names:
+            self.get_id(name)
 
-    def __hash__(self):
-        return hash(self.string)
+    def get_id(self, name: str) -> int:
+        """
+        Returns the integer id of a node type, assigning the next id if the type wasn't added before.
+        """
+        type_id = self._ids.get(name)
+        if type_id is None:
+            type_id = self._ids[name] = len(self._names)
+            self._names.append(name)
+            self._version = None
+        return type_id
 
-    def __eq__(self, other):
-        if isinstance(other, Token):
-            return self.string == other.string
-        else:
-            return self.string == other
+    def get_name(self, type_id: int) -> str:
+        """
+        Returns the node type of an integer id.
+        """
+        return self._names[type_id]
+
+    def version(self) -> str:
+        """
+        Returns a short digest of the node types and their ids, stored ids are only valid under the same version.
+        """
+        if self._version is None:
+            self._version = f"{zlib.crc32(chr(0).join(self._names).encode('utf-8')):08x}"
+        return self._version
 
-    def __repr__(self):
-        return self.string
+    def __len__(self) -> int:
+        return len(self._names)
 
 
-def parse_tree(cursor: TreeCursor, child_only: bool = True, is_named: Optional[bool] = None) -> List[Token]:
+class TokenStream:
     """
-    Takes a root tree_setter cursor and returns a list of tokens in order.
+    Structure that represents source tokens as parallel arrays of node type ids and their original locations
+    """
+
+    __slots__ = ("alphabet", "types", "starts", "ends")
+
+    def __init__(
+        self,
+        alphabet: Alphabet,
+        types: Optional[array] = None,
+        starts: Optional[array] = None,
+        ends: Optional[array] = None,
+    ):
+        self.alphabet: Alphabet = alphabet
+        # Tree-sitter symbols are 16 bit, so type ids always fit in an unsigned short
+        self.types: array = types if types is not None else array("H")
+        self.starts: array = starts if starts is not None else array("I")
+        self.ends: array = ends if ends is not None else array("I")
+
+    def append(self, type_id: int, start: int, end: int) -> None:
+        self.types.append(type_id)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def names(self) -> List[str]:
+        """
+        Returns the node type of every token in order.
+        """
+        return [self.alphabet.get_name(type_id) for type_id in self.types]
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __repr__(self) -> str:
+        return f"TokenStream({self.names()})"
+
+
+def parse_tree(
+    cursor: TreeCursor, alphabet: Alphabet, child_only: bool = True, is_named: Optional[bool] = None
+) -> TokenStream:
+    """
+    Takes a root tree_setter cursor and returns its tokens in order.
+
+    :alphabet: node type ids of the tree language, see `SupportedLanguages.get_alphabet`
 
     :child_only: if to return only child(leaf) nodes while navigating
 
     :is_named: if to return only named nodes, can be false or true or none for retrieving all nodes
     """
-    tokens = []
-    last_child = None
-    while cursor.goto_first_child():
-        if not child_only:
-            if is_named is not None and (
-                (is_named and not cursor.node.is_named) or (not is_named and cursor.node.is_named)
-            ):
-                continue
-            tokens.append(Token(string=cursor.node.type, line=(cursor.node.start_byte, cursor.node.end_byte)))
-        else:
-            last_child = cursor.node
+    tokens = TokenStream(alphabet=alphabet)
+    types, starts, ends = tokens.types, tokens.starts, tokens.ends
+    get_id = alphabet.get_id
 
-    if is_named is not None:
-        if child_only and last_child is not None:
-            if (is_named and last_child.is_named) or (not is_named and not last_child.is_named):
-                tokens.append(Token(string=last_child.type, line=(last_child.start_byte, last_child.end_byte)))
-        else:
-            if (is_named and cursor.node.is_named) or (not is_named and not cursor.node.is_named):
-                tokens.append(Token(string=cursor.node.type, line=(cursor.node.start_byte, cursor.node.end_byte)))
-    else:
-        if child_only and last_child is not None:
-            tokens.append(Token(string=last_child.type, line=(last_child.start_byte, last_child.end_byte)))
+    def _append(node) -> None:
+        if is_named is None or node.is_named == is_named:
+            types.append(get_id(node.type))
+            starts.append(node.start_byte)
+            ends.append(node.end_byte)
+
+    # Walked iteratively with the cursor itself so deep trees don't hit the recursion limit
+    descend = True
+    while True:
+        if descend:
+            while cursor.goto_first_child():
+                if not child_only:
+                    _append(cursor.node)
+            _append(cursor.node)
+
+        if cursor.goto_next_sibling():
+            descend = True
+        elif cursor.goto_parent():
+            descend = False
         else:
-            tokens.append(Token(string=cursor.node.type, line=(cursor.node.start_byte, cursor.node.end_byte)))
+            break
+    return tokens
 
+
+def parse_statements(cursor: TreeCursor, alphabet: Alphabet, suffixes: Tuple[str, ...]) -> TokenStream:
+    """
+    Takes a root tree_setter cursor and returns a token for every statement in order, i.e the shape of the program
+    without its expressions.
+
+    :alphabet: node type ids of the tree language, see `SupportedLanguages.get_alphabet`
+
+    :suffixes: node type suffixes of statements, i.e "_statement". Expression statements are represented by the
+        type of their expression, so assignments and calls stay apart
+    """
+    tokens = TokenStream(alphabet=alphabet)
+    get_id = alphabet.get_id
+
+    descend = True
     while True:
-        while cursor.goto_next_sibling():
-            tokens.extend(parse_tree(cursor=cursor, child_only=child_only, is_named=is_named))
-        if not cursor.goto_parent():
+        if descend:
+            node = cursor.node
+            if node.is_named and node.type.endswith(suffixes):
+                shape = node
+                if node.type == "expression_statement":
+                    shape = next((child for child in node.children if child.is_named), node)
+                tokens.append(get_id(shape.type), node.start_byte, node.end_byte)
+            if cursor.goto_first_child():
+                continue
+
+        if cursor.goto_next_sibling():
+            descend = True
+        elif cursor.goto_parent():
+            descend = False
+        else:
             break
     return tokens
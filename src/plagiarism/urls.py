@@ -1,12 +1,39 @@
 from django.urls import path, include
 
-from .views import ProjectPlagiarismView, ProjectPlagiarismCompareView
+from .views import (
+    ProjectPlagiarismView,
+    ProjectPlagiarismCompareView,
+    PlagiarismJobView,
+    PlagiarismJobDetailView,
+    PlagiarismJobResultView,
+    RequirementPlagiarismView,
+)
 
 # Project plagiarism patterns
 project_plagiarism_pattern = "plagiarism/"
 project_plagiarism_compare_pattern = f"{project_plagiarism_pattern}compare/"
 
+# Requirement plagiarism patterns
+requirement_plagiarism_pattern = f"{project_plagiarism_pattern}requirement/"
+
+# Project plagiarism job patterns
+project_plagiarism_job_pattern = f"{project_plagiarism_pattern}jobs/"
+project_plagiarism_job_detail_pattern = f"{project_plagiarism_job_pattern}<uuid:job_uid>/"
+project_plagiarism_job_result_pattern = f"{project_plagiarism_job_detail_pattern}result/"
+
 urlpatterns = [
     path(project_plagiarism_pattern, ProjectPlagiarismView.as_view(), name="project-plagiarism"),
     path(project_plagiarism_compare_pattern, ProjectPlagiarismCompareView.as_view(), name="project-plagiarism-compare"),
+    path(requirement_plagiarism_pattern, RequirementPlagiarismView.as_view(), name="requirement-plagiarism"),
+    path(project_plagiarism_job_pattern, PlagiarismJobView.as_view(), name="project-plagiarism-jobs"),
+    path(
+        project_plagiarism_job_detail_pattern,
+        PlagiarismJobDetailView.as_view(),
+        name="project-plagiarism-jobs-detail",
+    ),
+    path(
+        project_plagiarism_job_result_pattern,
+        PlagiarismJobResultView.as_view(),
+        name="project-plagiarism-jobs-result",
+    ),
 ]
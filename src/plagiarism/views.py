@@ -1,26 +1,43 @@
-import zipfile
+import json
 import pathlib as pl
+from typing import Iterable, Iterator, List, Optional
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 from rest_framework import status
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext_lazy as _
 from drf_yasg.utils import swagger_auto_schema
-from tree_sitter import TreeCursor
 
 from core.utils.openapi import openapi_error_response
-from courses.models import Project
+from courses.models import Course, Project
 from courses.utils import is_course_teacher
+from .models import PlagiarismJob
+from .constants import CompareFormat, PlagiarismJobStatus, PlagiarismScope
 from .serializers import (
     ProjectPlagiarismRequestSerializer,
     ProjectPlagiarismResponseSerializer,
+    ProjectPlagiarismFileSerializer,
+    ProjectPlagiarismSummarySerializer,
     ProjectPlagiarismMatchSerializer,
     ProjectPlagiarismCompareRequestSerializer,
     ProjectPlagiarismCompareResponseSerializer,
+    ProjectPlagiarismCompareRegionsSerializer,
+    PlagiarismJobSerializer,
+    RequirementPlagiarismRequestSerializer,
+    RequirementPlagiarismResponseSerializer,
 )
-from .tokens import Token, parse_tree
-from .sources import parse_source, match_sequences, tokenize_source, SupportedLanguages, detect_plagiarism_ratio
+from .tokens import TokenStream
+from .sources import Matcher, get_matcher, match_sequences, tokenize_source, iter_tokenize_source
+from .index import get_file_index, get_file_tokens, get_file_source
+from .results import get_compare_key
+from .detection import detect_project_plagiarism, detect_requirement_plagiarism, get_baseline, iter_plagiarism
+from .renderers import StreamRenderer, NDJSONRenderer, EventStreamRenderer
 
 
 class ProjectPlagiarismView(APIView):
@@ -28,6 +45,8 @@ class ProjectPlagiarismView(APIView):
     Base view for project plagiarism.
     """
 
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer, EventStreamRenderer]
+
     @swagger_auto_schema(
         request_body=ProjectPlagiarismRequestSerializer(),
         responses={
@@ -43,7 +62,7 @@ class ProjectPlagiarismView(APIView):
             ),
             status.HTTP_500_INTERNAL_SERVER_ERROR: openapi_error_response(
                 description="Internal server errors",
-                examples={"property": "Faulty files were found in the project files."},
+                examples={"property": "An unexpected error happened when trying to open the project files."},
             ),
         },
     )
@@ -51,7 +70,8 @@ class ProjectPlagiarismView(APIView):
         """
         Detects plagiarism for all the supported files in a specific project.
 
-        .
+        Send `Accept: application/x-ndjson` or `Accept: text/event-stream` to stream a "file" event for every file
+        as soon as it's checked, including files without matches, followed by a "done" event with the avg. ratio.
         """
 
         request_serializer = ProjectPlagiarismRequestSerializer(data=request.data)
@@ -69,92 +89,94 @@ class ProjectPlagiarismView(APIView):
             message = _("Only course teachers can view plagiarism")
             return Response({"error": message}, status=status.HTTP_403_FORBIDDEN)
 
-        # Only look through the other projects in the same requirement
-        other_projects = (
-            Project._default_manager.exclude(uid=project_id)
-            .filter(team__requirement_id=project.team.requirement_id)
-            .all()
+        courses = _get_scope_courses(
+            user=request.user,
+            project=project,
+            scope=data["scope"],
+            courses=request_serializer.validated_data["courses"],
         )
+        # Only teachers of every course checked against can view plagiarism
+        if courses is not None and not all(is_course_teacher(user=request.user, course_id=uid) for uid in courses):
+            message = _("Only course teachers can view plagiarism")
+            return Response({"error": message}, status=status.HTTP_403_FORBIDDEN)
 
-        data = {"files": []}
-
-        # For calculating avg ratio for files
-        total_ratio = 0
-        total_files = 0
-
-        with zipfile.ZipFile(project.project_zip.file, "r") as zfile:
-            files = zfile.namelist()
-            for _file in files:  # Looping over all possible project files
-                fpath = zipfile.Path(zfile, at=_file)
-                fext = pl.Path(_file).suffix
-
-                # Checking if current object is a file and is a supported type
-                if not fpath.is_file():
-                    continue
-                elif not SupportedLanguages.detect_language(ext=fext):
-                    continue
-
-                with fpath.open("r") as f:
-                    source = f.read().decode("utf-8")
-                    if not len(source):
-                        continue  # Ignore empty file
-
-                total_files += 1
-
-                _data = {"file": _file, "failures": [], "matches": []}
-
-                # For calculating avg ratio for file matches
-                _total_ratio = 0
-                _total_files = 0
-
-                # Looping over all the other possible projects
-                for other_project in other_projects:
-                    try:
-                        with zipfile.ZipFile(other_project.project_zip.file, "r") as other_zfile:
-                            other_files = other_zfile.namelist()
-                            for other_file in other_files:
-                                other_fpath = zipfile.Path(other_zfile, at=other_file)
-                                if not other_fpath.is_file():
-                                    continue
-                                elif fext != pl.Path(other_file).suffix:
-                                    continue
-
-                                with other_fpath.open("r") as other_f:
-                                    other_source = other_f.read().decode("utf-8")
-                                    if not len(other_source):
-                                        continue  # Ignore empty file
-
-                                plag_ratio = detect_plagiarism_ratio(source1=source, source2=other_source, ext=fext)
-
-                                if plag_ratio < threshold:
-                                    continue
-
-                                _total_ratio += plag_ratio
-                                _total_files += 1
-
-                                _data["matches"].append(
-                                    {
-                                        "project": other_project,
-                                        "file": other_file,
-                                        "ratio": plag_ratio,
-                                        "project_title": other_project.title,
-                                    }
-                                )
-
-                    except (zipfile.BadZipfile, FileNotFoundError):
-                        _data["failures"].append(other_project)
-
-                if _total_files:
-                    _data["ratio"] = _total_ratio / _total_files
-                    total_ratio += _data["ratio"]
-                    data["files"].append(_data)
-
-        if total_files:
-            data["ratio"] = total_ratio / total_files
+        matcher = get_matcher(engine=data["engine"], min_match_length=data["min_match_length"])
+        if isinstance(request.accepted_renderer, StreamRenderer):
+            # Files are sent out as they are checked instead of after the whole project
+            response = StreamingHttpResponse(
+                _iter_plagiarism_events(
+                    renderer=request.accepted_renderer,
+                    project=project,
+                    threshold=threshold,
+                    matcher=matcher,
+                    top_k=data["top_k"],
+                    profile=data["profile"],
+                    courses=courses,
+                ),
+                content_type=request.accepted_renderer.media_type,
+                status=status.HTTP_200_OK,
+            )
+            response["Cache-Control"] = "no-cache"
+            # Stops reverse proxies from buffering the events
+            response["X-Accel-Buffering"] = "no"
+            return response
+
+        data = detect_project_plagiarism(
+            project=project,
+            threshold=threshold,
+            matcher=matcher,
+            top_k=data["top_k"],
+            profile=data["profile"],
+            courses=courses,
+        )
         serializer = ProjectPlagiarismResponseSerializer(data)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+def _get_scope_courses(user, project: Project, scope: str, courses: List[Course]) -> Optional[List[str]]:
+    """
+    Returns the uids of the courses a project is checked against under one of the `PlagiarismScope` options, or none
+    if it's only checked against its own requirement.
+
+    :courses: chosen courses of the courses scope
+    """
+    if scope == PlagiarismScope.OWNER:
+        # Every course of the same owner that the user teaches
+        owned = Course._default_manager.filter(owner_id=project.team.requirement.course.owner_id, teachers=user)
+        return [str(uid) for uid in owned.values_list("uid", flat=True)]
+    elif scope == PlagiarismScope.COURSES:
+        return [str(course.uid) for course in courses]
+    return None
+
+
+def _iter_plagiarism_events(
+    renderer: StreamRenderer,
+    project: Project,
+    threshold: float,
+    matcher: Matcher,
+    top_k: Optional[int],
+    profile: str,
+    courses: Optional[List[str]],
+) -> Iterator[bytes]:
+    """
+    Yields a "file" event of `ProjectPlagiarismFileSerializer` for every checked file followed by a "done" event of
+    `ProjectPlagiarismSummarySerializer`.
+    """
+    # For calculating avg ratio for files
+    total_ratio = 0
+    total_files = 0
+
+    for _data in iter_plagiarism(
+        project=project, threshold=threshold, matcher=matcher, top_k=top_k, profile=profile, courses=courses
+    ):
+        total_files += 1
+        total_ratio += _data.get("ratio", 0)
+        yield renderer.render_event("file", ProjectPlagiarismFileSerializer(_data).data)
+
+    summary = {"ratio": total_ratio / total_files} if total_files else {}
+    yield renderer.render_event("done", ProjectPlagiarismSummarySerializer(summary).data)
+
+
 class ProjectPlagiarismCompareView(APIView):
     """
     Base view for project plagiarism file comparison
@@ -175,13 +197,14 @@ class ProjectPlagiarismCompareView(APIView):
             ),
             status.HTTP_500_INTERNAL_SERVER_ERROR: openapi_error_response(
                 description="Internal server errors",
-                examples={"property": "Faulty files were found in the project files."},
+                examples={"property": "An unexpected error happened when trying to open the project files."},
             ),
         },
     )
     def post(self, request, *args, **kwargs) -> Response:
         """
-        Detects plagiarism for two specific project files and returns plagiarized marked content.
+        Detects plagiarism for two specific project files and returns plagiarized marked content, or only the byte
+        offsets of the matched regions of both files.
 
         .
         """
@@ -196,47 +219,284 @@ class ProjectPlagiarismCompareView(APIView):
         first_file: str = data["first_file"]
         second_file: str = data["second_file"]
 
-        # Only course teachers can view plagiarism
-        authorized = is_course_teacher(user=request.user, course_id=first_project.team.requirement.course_id)
+        # Only course teachers can view plagiarism, of both projects as they may be in different courses
+        authorized = all(
+            is_course_teacher(user=request.user, course_id=project.team.requirement.course_id)
+            for project in (first_project, second_project)
+        )
         if not authorized:
             message = _("Only course teachers can view plagiarism")
             return Response({"error": message}, status=status.HTTP_403_FORBIDDEN)
 
-        with zipfile.ZipFile(first_project.project_zip.file, "r") as zfile:
-            with zfile.open(first_file, "r") as f:
-                first_source = f.read().decode("utf-8")
-
-        with zipfile.ZipFile(second_project.project_zip.file, "r") as zfile:
-            with zfile.open(second_file, "r") as f:
-                second_source = f.read().decode("utf-8")
-
-        fext = pl.Path(first_file).suffix
-        first_tree: TreeCursor = parse_source(source=first_source, ext=fext)
-        second_tree: TreeCursor = parse_source(source=second_source, ext=fext)
-
-        first_parse: list[Token] = parse_tree(first_tree.walk(), child_only=False)
-        second_parse: list[Token] = parse_tree(second_tree.walk(), child_only=False)
-        marked_first_source, marked_second_source, ratio = match_sequences(
-            tokens1=first_parse,
-            tokens2=second_parse,
-            source1=first_source,
-            source2=second_source,
+        matcher = get_matcher(engine=data["engine"], min_match_length=data["min_match_length"])
+        # Starter code handed out with the first project's requirement isn't marked, as in project plagiarism
+        baseline = get_baseline(first_project.team.requirement_id, profile=data["profile"])
+        first_index = get_file_index(project=first_project, path=first_file)
+        second_index = get_file_index(project=second_project, path=second_file)
+        key = get_compare_key(
+            first_project=first_project,
+            first_file=first_file,
+            second_project=second_project,
+            second_file=second_file,
+            digests=(getattr(first_index, "digest", ""), getattr(second_index, "digest", "")),
+            matcher=matcher,
+            profile=data["profile"],
+            baseline=baseline,
         )
+        # Teachers usually reopen the same pairs, matching is only done once per file contents
+        matched = cache.get(key)
+        if matched is None:
+            first_parse: TokenStream = get_file_tokens(project=first_project, path=first_file, profile=data["profile"])
+            second_parse: TokenStream = get_file_tokens(
+                project=second_project, path=second_file, profile=data["profile"]
+            )
+            if baseline is not None:
+                first_parse = baseline.strip_tokens(first_parse, ext=pl.Path(first_file).suffix)
+                second_parse = baseline.strip_tokens(second_parse, ext=pl.Path(second_file).suffix)
+            matched = match_sequences(tokens1=first_parse, tokens2=second_parse, matcher=matcher)
+            cache.set(key, matched, timeout=settings.PLAG_COMPARE_CACHE_TIMEOUT)
+        first_intervals, second_intervals, ratio = matched
+
+        if data["format"] == CompareFormat.REGIONS:
+            # Clients that already have both files only need to know where to mark them
+            response = {"ratio": ratio, "first_regions": first_intervals, "second_regions": second_intervals}
+            serializer = ProjectPlagiarismCompareRegionsSerializer(response)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        first_source = get_file_source(project=first_project, path=first_file)
+        second_source = get_file_source(project=second_project, path=second_file)
+        render_kwargs = {
+            "start_tokens": data["match_start_tokens"],
+            "end_tokens": data["match_end_tokens"],
+            "html_encoded": data["html_encoded"],
+        }
+        if data["stream"]:
+            # Large files are sent out as they are rendered instead of being built up in memory first
+            return StreamingHttpResponse(
+                _iter_compare_response(
+                    iter_tokenize_source(source=first_source, intervals=first_intervals, **render_kwargs),
+                    iter_tokenize_source(source=second_source, intervals=second_intervals, **render_kwargs),
+                ),
+                content_type="application/json",
+                status=status.HTTP_200_OK,
+            )
 
         response = {}
-        response["first_file"] = tokenize_source(
-            source=first_source,
-            marked_source=marked_first_source,
-            start_tokens=data["match_start_tokens"],
-            end_tokens=data["match_end_tokens"],
-            html_encoded=data["html_encoded"],
+        response["first_file"] = tokenize_source(source=first_source, intervals=first_intervals, **render_kwargs)
+        response["second_file"] = tokenize_source(source=second_source, intervals=second_intervals, **render_kwargs)
+        serializer = ProjectPlagiarismCompareResponseSerializer(response)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+def _iter_compare_response(first_file: Iterable[str], second_file: Iterable[str]) -> Iterator[str]:
+    """
+    Yields the JSON body of `ProjectPlagiarismCompareResponseSerializer` from the rendered chunks of each file.
+    """
+    yield '{"first_file": "'
+    for chunk in first_file:
+        yield json.dumps(chunk)[1:-1]
+    yield '", "second_file": "'
+    for chunk in second_file:
+        yield json.dumps(chunk)[1:-1]
+    yield '"}'
+
+
+class RequirementPlagiarismView(APIView):
+    """
+    Base view for requirement plagiarism.
+    """
+
+    @swagger_auto_schema(
+        request_body=RequirementPlagiarismRequestSerializer(),
+        responses={
+            status.HTTP_200_OK: RequirementPlagiarismResponseSerializer(),
+            status.HTTP_202_ACCEPTED: PlagiarismJobSerializer(),
+            status.HTTP_400_BAD_REQUEST: openapi_error_response(
+                description="Resource specific errors.",
+                examples={
+                    "property": "error message.",
+                },
+            ),
+            status.HTTP_403_FORBIDDEN: openapi_error_response(
+                description="Authorization specific errors", examples={"error": "message"}
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs) -> Response:
+        """
+        Detects plagiarism between every pair of projects in a specific requirement.
+
+        Returns the projects plagiarism ratio matrix, ranked suspicious pairs and the highest ratio of every project.
+        Set `background` to queue a plagiarism job instead, its result is retrieved like project plagiarism jobs.
+        """
+
+        request_serializer = RequirementPlagiarismRequestSerializer(data=request.data)
+        request_serializer.is_valid(raise_exception=True)
+
+        data = request_serializer.validated_data
+        requirement = data["requirement"]
+
+        # Only course teachers can view plagiarism
+        authorized = is_course_teacher(user=request.user, course_id=requirement.course_id)
+        if not authorized:
+            message = _("Only course teachers can view plagiarism")
+            return Response({"error": message}, status=status.HTTP_403_FORBIDDEN)
+
+        if data["background"]:
+            # Every pair of projects is compared, which can take too long for a single request
+            job = PlagiarismJob._default_manager.create(
+                requirement=requirement,
+                requester=request.user,
+                threshold=data["threshold"],
+                engine=data["engine"],
+                min_match_length=data["min_match_length"],
+                profile=data["profile"],
+            )
+            serializer = PlagiarismJobSerializer(job)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+        matcher = get_matcher(engine=data["engine"], min_match_length=data["min_match_length"])
+        data = detect_requirement_plagiarism(
+            requirement=requirement, threshold=data["threshold"], matcher=matcher, profile=data["profile"]
+        )
+        serializer = RequirementPlagiarismResponseSerializer(data)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class PlagiarismJobView(APIView):
+    """
+    Base view for background project plagiarism jobs.
+    """
+
+    @swagger_auto_schema(
+        request_body=ProjectPlagiarismRequestSerializer(),
+        responses={
+            status.HTTP_202_ACCEPTED: PlagiarismJobSerializer(),
+            status.HTTP_400_BAD_REQUEST: openapi_error_response(
+                description="Resource specific errors.",
+                examples={
+                    "property": "error message.",
+                },
+            ),
+            status.HTTP_403_FORBIDDEN: openapi_error_response(
+                description="Authorization specific errors", examples={"error": "message"}
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs) -> Response:
+        """
+        Queues plagiarism detection for all the supported files in a specific project.
+
+        Poll the returned job to follow its progress.
+        """
+        request_serializer = ProjectPlagiarismRequestSerializer(data=request.data)
+        request_serializer.is_valid(raise_exception=True)
+
+        project: Project = request_serializer.validated_data["project"]
+
+        # Only course teachers can view plagiarism
+        authorized = is_course_teacher(user=request.user, course_id=project.team.requirement.course_id)
+        if not authorized:
+            message = _("Only course teachers can view plagiarism")
+            return Response({"error": message}, status=status.HTTP_403_FORBIDDEN)
+
+        courses = _get_scope_courses(
+            user=request.user,
+            project=project,
+            scope=request_serializer.validated_data["scope"],
+            courses=request_serializer.validated_data["courses"],
         )
-        response["second_file"] = tokenize_source(
-            source=second_source,
-            marked_source=marked_second_source,
-            start_tokens=data["match_start_tokens"],
-            end_tokens=data["match_end_tokens"],
-            html_encoded=data["html_encoded"],
+        # Only teachers of every course checked against can view plagiarism
+        if courses is not None and not all(is_course_teacher(user=request.user, course_id=uid) for uid in courses):
+            message = _("Only course teachers can view plagiarism")
+            return Response({"error": message}, status=status.HTTP_403_FORBIDDEN)
+
+        job = PlagiarismJob._default_manager.create(
+            project=project,
+            requester=request.user,
+            threshold=request_serializer.validated_data["threshold"],
+            engine=request_serializer.validated_data["engine"],
+            min_match_length=request_serializer.validated_data["min_match_length"],
+            top_k=request_serializer.validated_data["top_k"],
+            profile=request_serializer.validated_data["profile"],
+            scope=request_serializer.validated_data["scope"],
+            courses=courses,
         )
-        serializer = ProjectPlagiarismCompareResponseSerializer(response)
+        serializer = PlagiarismJobSerializer(job)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class PlagiarismJobDetailView(APIView):
+    """
+    Base view for a specific background plagiarism job.
+    """
+
+    @swagger_auto_schema(
+        responses={
+            status.HTTP_200_OK: PlagiarismJobSerializer(),
+            status.HTTP_403_FORBIDDEN: openapi_error_response(
+                description="Authorization specific errors", examples={"error": "message"}
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs) -> Response:
+        """
+        Retrieves a plagiarism job status and progress.
+
+        .
+        """
+        job = get_object_or_404(
+            PlagiarismJob._default_manager.select_related("project__team__requirement", "requirement"),
+            uid=kwargs["job_uid"],
+        )
+
+        # Only course teachers can view plagiarism
+        authorized = is_course_teacher(user=request.user, course_id=job.course_id)
+        if not authorized:
+            message = _("Only course teachers can view plagiarism")
+            return Response({"error": message}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = PlagiarismJobSerializer(job)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class PlagiarismJobResultView(APIView):
+    """
+    Base view for the result of a specific background plagiarism job.
+    """
+
+    @swagger_auto_schema(
+        responses={
+            status.HTTP_200_OK: ProjectPlagiarismResponseSerializer(),
+            status.HTTP_400_BAD_REQUEST: openapi_error_response(
+                description="Job specific errors.",
+                examples={"error": "Plagiarism job hasn't finished yet."},
+            ),
+            status.HTTP_403_FORBIDDEN: openapi_error_response(
+                description="Authorization specific errors", examples={"error": "message"}
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs) -> Response:
+        """
+        Retrieves the result of a finished plagiarism job, requirement jobs return the requirement plagiarism
+        response instead.
+        """
+        job = get_object_or_404(
+            PlagiarismJob._default_manager.select_related("project__team__requirement", "requirement"),
+            uid=kwargs["job_uid"],
+        )
+
+        # Only course teachers can view plagiarism
+        authorized = is_course_teacher(user=request.user, course_id=job.course_id)
+        if not authorized:
+            message = _("Only course teachers can view plagiarism")
+            return Response({"error": message}, status=status.HTTP_403_FORBIDDEN)
+
+        if job.status == PlagiarismJobStatus.FAILED:
+            return Response({"error": job.error}, status=status.HTTP_400_BAD_REQUEST)
+        elif job.status != PlagiarismJobStatus.SUCCEEDED:
+            message = _("Plagiarism job hasn't finished yet.")
+            return Response({"error": message}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(job.result, status=status.HTTP_200_OK)
@@ -0,0 +1,113 @@
+import json
+import zipfile
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.views import status, Response
+
+from courses.models import Project
+from courses.utils import etag_matches, get_member_etag, parse_range
+from ..factories.courses import ProjectFactory
+
+
+@pytest.fixture()
+def project(settings, tmp_path) -> Project:
+    settings.MEDIA_ROOT = str(tmp_path)
+    return ProjectFactory.create(files={"src/a.py": "0123456789" * 10})
+
+
+def get_file_url(project: Project, path: str) -> str:
+    requirement = project.team.requirement
+    kwargs = {
+        "course_owner": requirement.course.owner.username,
+        "course_code": requirement.course.code,
+        "requirement_title": requirement.title,
+        "team_name": project.team.name,
+        "project_title": project.title,
+        "path": path,
+    }
+    return reverse("project-files-detail", kwargs=kwargs)
+
+
+def test_parse_range():
+    """
+    Tests that single byte ranges are clamped to the file and anything else serves the whole file
+    """
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 10)
+    assert parse_range("bytes=90-200", 100) == (90, 100)
+    assert parse_range("bytes=95-", 100) == (95, 100)
+    assert parse_range("bytes=-10", 100) == (90, 100)
+    assert parse_range("bytes=-200", 100) == (0, 100)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("bytes=9-0", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_member_etag():
+    """
+    Tests that zip members are tagged by their stored checksum and size, and that tag lists are matched
+    """
+    info = zipfile.ZipInfo("a.py")
+    info.CRC, info.file_size = 0xABC, 42
+    etag = get_member_etag(info)
+    assert etag == '"00000abc-42"'
+    assert get_member_etag(info, suffix="-json") != etag
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+@pytest.mark.django_db
+def test_project_file_etag(project: Project):
+    """
+    Tests that unchanged project files are answered with a 304, in either representation
+    """
+    client = APIClient()
+    client.force_authenticate(user=project.team.requirement.course.owner)
+    url = get_file_url(project, "src/a.py")
+
+    response: Response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert json.loads(response.content)["content"] == "0123456789" * 10
+    etag = response["ETag"]
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED and response["ETag"] == etag and not response.content
+
+    # check that the raw file isn't answered with the tag of the JSON body
+    response = client.get(url, {"raw": True}, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK and response["ETag"] != etag
+    assert b"".join(response.streaming_content) == b"0123456789" * 10
+
+
+@pytest.mark.django_db
+def test_project_file_range(project: Project):
+    """
+    Tests that ranges of raw project files are served unless they're unsatisfiable or of an older version of the file
+    """
+    client = APIClient()
+    client.force_authenticate(user=project.team.requirement.course.owner)
+    url = get_file_url(project, "src/a.py")
+    etag = client.get(url, {"raw": True})["ETag"]
+
+    response: Response = client.get(url, {"raw": True}, HTTP_RANGE="bytes=5-14")
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response["Content-Range"] == "bytes 5-14/100" and response["Content-Length"] == "10"
+    assert b"".join(response.streaming_content) == b"5678901234"
+
+    response = client.get(url, {"raw": True}, HTTP_RANGE="bytes=-5", HTTP_IF_RANGE=etag)
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT and response["Content-Range"] == "bytes 95-99/100"
+    assert b"".join(response.streaming_content) == b"56789"
+
+    # check that the whole file is served if it changed since the range was requested
+    response = client.get(url, {"raw": True}, HTTP_RANGE="bytes=5-14", HTTP_IF_RANGE='"00000000-100"')
+    assert response.status_code == status.HTTP_200_OK and "Content-Range" not in response
+    assert b"".join(response.streaming_content) == b"0123456789" * 10
+
+    response = client.get(url, {"raw": True}, HTTP_RANGE="bytes=100-")
+    assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+    assert response["Content-Range"] == "bytes */100"
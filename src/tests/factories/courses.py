@@ -0,0 +1,71 @@
+import io
+import datetime
+import zipfile
+
+import factory
+from factory.django import DjangoModelFactory
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from courses.models import Course, CourseTeacher, ProjectRequirement, Team, Project
+from .users import UserFactory
+
+
+def make_zip(files: dict) -> bytes:
+    """
+    Returns a zip archive of the given {path: content} files.
+    """
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zfile:
+        for path, content in files.items():
+            zfile.writestr(path, content)
+    return archive.getvalue()
+
+
+class CourseFactory(DjangoModelFactory):
+    class Meta:
+        model = Course
+
+    owner = factory.SubFactory(UserFactory)
+    title: str = factory.Faker("word")
+    code: str = factory.Sequence(lambda n: f"CS{n}")
+
+    @factory.post_generation
+    def teachers(self, create: bool, extracted, **kwargs):
+        """Adds the given teachers, the course owner teaches it by default."""
+        if create:
+            for teacher in extracted if extracted is not None else [self.owner]:
+                CourseTeacher._default_manager.create(course=self, teacher=teacher)
+
+
+class ProjectRequirementFactory(DjangoModelFactory):
+    class Meta:
+        model = ProjectRequirement
+
+    course = factory.SubFactory(CourseFactory)
+    title: str = factory.Sequence(lambda n: f"requirement{n}")
+    to_dt = factory.LazyFunction(lambda: timezone.now() + datetime.timedelta(days=7))
+
+
+class TeamFactory(DjangoModelFactory):
+    class Meta:
+        model = Team
+
+    requirement = factory.SubFactory(ProjectRequirementFactory)
+    name: str = factory.Sequence(lambda n: f"team{n}")
+
+
+class ProjectFactory(DjangoModelFactory):
+    class Meta:
+        model = Project
+
+    team = factory.SubFactory(TeamFactory)
+    title: str = factory.Sequence(lambda n: f"project{n}")
+
+    @classmethod
+    def _create(cls, model_class, *args, files: dict = None, **kwargs):
+        """Uploads the given {path: content} files as the project archive."""
+        project = model_class(*args, **kwargs)
+        project.project_zip.save(f"{project.title}.zip", ContentFile(make_zip(files or {})), save=False)
+        project.save()
+        return project
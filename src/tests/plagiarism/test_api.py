@@ -0,0 +1,400 @@
+import json
+
+import pytest
+from django.core.files.base import ContentFile
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.views import status, Response
+
+from plagiarism import baseline, index
+from plagiarism.constants import PlagiarismJobStatus, TokenProfile
+from plagiarism.jobs import claim_job, run_job
+from plagiarism.models import FilePairResult, PlagiarismJob, ProjectIndex, RequirementBaseline
+from plagiarism.sources import SupportedLanguages
+from plagiarism.tokens import Alphabet, TokenStream
+from ..factories.users import UserFactory
+from ..factories.courses import ProjectFactory, make_zip
+from .test_index import tokenize_characters
+
+
+@pytest.fixture()
+def api_client() -> APIClient:
+    return APIClient()
+
+
+@pytest.fixture()
+def project(settings, tmp_path, monkeypatch):
+    settings.MEDIA_ROOT = str(tmp_path)
+    monkeypatch.setattr(SupportedLanguages, "get_version", lambda language: "0" * 8)
+    return ProjectFactory.create(team__requirement__course__owner=UserFactory.create(username="teacher"))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_plagiarism_job_endpoints(api_client: APIClient, project):
+    """
+    Tests queuing a plagiarism job and following it until its result is available
+    """
+    api_client.force_authenticate(user=project.team.requirement.course.owner)
+
+    response: Response = api_client.post(
+        reverse("project-plagiarism-jobs"), data={"project": str(project.uid), "threshold": 0.5}, format="json"
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    data: dict = json.loads(response.content)
+    assert data["status"] == PlagiarismJobStatus.PENDING and data["attempts"] == 0
+
+    job: PlagiarismJob = PlagiarismJob._default_manager.get(uid=data["uid"])
+    assert job.project == project and job.requester == project.team.requirement.course.owner
+
+    detail_url: str = reverse("project-plagiarism-jobs-detail", kwargs={"job_uid": job.uid})
+    result_url: str = reverse("project-plagiarism-jobs-result", kwargs={"job_uid": job.uid})
+    response = api_client.get(detail_url)
+    assert response.status_code == status.HTTP_200_OK
+    assert json.loads(response.content)["uid"] == str(job.uid)
+
+    # check that results are only available once the job succeeded
+    response = api_client.get(result_url)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    job.status = PlagiarismJobStatus.FAILED
+    job.error = "Unreadable archive"
+    job.save()
+    response = api_client.get(result_url)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert json.loads(response.content) == {"error": "Unreadable archive"}
+
+    job.status = PlagiarismJobStatus.SUCCEEDED
+    job.result = {"ratio": "0.50", "files": []}
+    job.save()
+    response = api_client.get(result_url)
+    assert response.status_code == status.HTTP_200_OK
+    assert json.loads(response.content) == job.result
+
+
+@pytest.mark.django_db(transaction=True)
+def test_plagiarism_job_endpoints_forbidden(api_client: APIClient, project):
+    """
+    Tests that only course teachers can queue and follow plagiarism jobs
+    """
+    job: PlagiarismJob = PlagiarismJob._default_manager.create(
+        project=project, requester=project.team.requirement.course.owner, threshold=0.5
+    )
+    api_client.force_authenticate(user=UserFactory.create(username="student"))
+
+    response: Response = api_client.post(
+        reverse("project-plagiarism-jobs"), data={"project": str(project.uid)}, format="json"
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert not PlagiarismJob._default_manager.exclude(pk=job.pk).exists()
+
+    for name in ["project-plagiarism-jobs-detail", "project-plagiarism-jobs-result"]:
+        response = api_client.get(reverse(name, kwargs={"job_uid": job.uid}))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db(transaction=True)
+def test_requirement_plagiarism(api_client: APIClient, project, monkeypatch):
+    """
+    Tests that requirement plagiarism reports every pair below the threshold as 0, whether it was compared or ruled
+    out, and that it can be queued as a job with the same result
+    """
+    monkeypatch.setattr(SupportedLanguages, "get_alphabet", lambda ext: Alphabet())
+    monkeypatch.setattr(index, "tokenize_file_profiles", tokenize_characters)
+    blocks = ["abcdefghijklmnopqrst", "ABCDEFGHIJKLMNOPQRST", "UVWXYZuvwxyz[]^_{|}~"]
+    requirement = project.team.requirement
+    # Same contents, same blocks in another order and unrelated contents
+    for files in [{"a.py": "".join(blocks)}, {"a.py": "".join(reversed(blocks))}, {"a.py": "=" * 60}]:
+        ProjectFactory.create(team__requirement=requirement, files=files)
+    ProjectFactory.create(team__requirement=requirement, files={"b.py": "".join(blocks)})
+    api_client.force_authenticate(user=requirement.course.owner)
+
+    url: str = reverse("requirement-plagiarism")
+    request_data: dict = {"requirement": str(requirement.uid), "threshold": 0.9}
+    response: Response = api_client.post(url, data=request_data, format="json")
+    assert response.status_code == status.HTTP_200_OK
+    data: dict = json.loads(response.content)
+    assert [pair["ratio"] for pair in data["pairs"]] == ["1.00"]
+    # check that reordered blocks were compared, yet reported like the pairs that were ruled out
+    assert FilePairResult._default_manager.filter(ratio__gt=0, ratio__lt=0.9).exists()
+    assert sorted(data["matrix"]) == ["0.00"] * 9 + ["1.00"]
+
+    response = api_client.post(url, data={**request_data, "background": True}, format="json")
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job: PlagiarismJob = PlagiarismJob._default_manager.get(uid=json.loads(response.content)["uid"])
+    assert job.requirement == requirement and job.project is None
+
+    run_job(claim_job())
+    response = api_client.get(reverse("project-plagiarism-jobs-result", kwargs={"job_uid": job.uid}))
+    assert response.status_code == status.HTTP_200_OK
+    assert json.loads(response.content) == data
+
+
+@pytest.mark.django_db(transaction=True)
+def test_project_plagiarism_compare_baseline(api_client: APIClient, project, monkeypatch, settings):
+    """
+    Tests that starter code of the requirement isn't marked when comparing two files
+    """
+    settings.PLAG_BASELINE_MIN_MATCH_LENGTH = 8
+    monkeypatch.setattr(SupportedLanguages, "get_alphabet", lambda ext: Alphabet())
+    monkeypatch.setattr(index, "tokenize_file_profiles", tokenize_characters)
+    monkeypatch.setattr(
+        baseline, "tokenize_file", lambda source, ext, profile: tokenize_characters(source, ext)[profile]
+    )
+    starter, first, second = "abcdefghijklmnopqrst", "ABCDEFGHIJ", "UVWXYZuvwx"
+    requirement = project.team.requirement
+    projects = [
+        ProjectFactory.create(team__requirement=requirement, files={"a.py": starter + first}),
+        ProjectFactory.create(team__requirement=requirement, files={"a.py": starter + second}),
+    ]
+    api_client.force_authenticate(user=requirement.course.owner)
+
+    url: str = reverse("project-plagiarism-compare")
+    request_data: dict = {
+        "first_project": str(projects[0].uid),
+        "second_project": str(projects[1].uid),
+        "first_file": "a.py",
+        "second_file": "a.py",
+        "format": "regions",
+    }
+    response: Response = api_client.post(url, data=request_data, format="json")
+    assert response.status_code == status.HTTP_200_OK
+    assert json.loads(response.content) == {"ratio": "0.67", "first_regions": [[0, 20]], "second_regions": [[0, 20]]}
+
+    starter_zip = ContentFile(make_zip({"starter.py": starter}), name="starter.zip")
+    RequirementBaseline._default_manager.create(requirement=requirement, baseline_zip=starter_zip)
+    response = api_client.post(url, data=request_data, format="json")
+    assert response.status_code == status.HTTP_200_OK
+    assert json.loads(response.content) == {"ratio": "0.00", "first_regions": [], "second_regions": []}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_project_plagiarism_streaming(api_client: APIClient, project, monkeypatch):
+    """
+    Tests that project plagiarism is streamed as a file event per checked file when asked for, and returned as a
+    whole otherwise
+    """
+    monkeypatch.setattr(SupportedLanguages, "get_alphabet", lambda ext: Alphabet())
+    monkeypatch.setattr(index, "tokenize_file_profiles", tokenize_characters)
+    blocks = ["abcdefghijklmnopqrst", "ABCDEFGHIJKLMNOPQRST", "UVWXYZuvwxyz[]^_{|}~"]
+    requirement = project.team.requirement
+    checked = ProjectFactory.create(
+        team__requirement=requirement, files={"a.py": "".join(blocks), "b.py": blocks[1] * 2, "c.py": "=" * 40}
+    )
+    ProjectFactory.create(team__requirement=requirement, files={"a.py": "".join(blocks), "b.py": blocks[1]})
+    api_client.force_authenticate(user=requirement.course.owner)
+
+    url: str = reverse("project-plagiarism")
+    request_data: dict = {"project": str(checked.uid), "threshold": 0.5}
+    response: Response = api_client.post(url, data=request_data, format="json")
+    assert response.status_code == status.HTTP_200_OK and response["Content-Type"] == "application/json"
+    data: dict = json.loads(response.content)
+    assert sorted(_file["file"] for _file in data["files"]) == ["a.py", "b.py"]
+
+    response = api_client.post(url, data=request_data, format="json", HTTP_ACCEPT="application/x-ndjson")
+    assert response.status_code == status.HTTP_200_OK and response["Content-Type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+    assert [line["event"] for line in lines] == ["file"] * 3 + ["done"]
+    # check that files without matches are streamed too
+    streamed = sorted((line["data"] for line in lines[:-1]), key=lambda _file: _file["file"])
+    assert streamed[:2] == sorted(data["files"], key=lambda _file: _file["file"])
+    assert streamed[2]["file"] == "c.py" and not streamed[2]["matches"]
+    assert lines[-1]["data"] == {"ratio": data["ratio"]}
+
+    response = api_client.post(url, data=request_data, format="json", HTTP_ACCEPT="text/event-stream")
+    assert response.status_code == status.HTTP_200_OK and response["Content-Type"] == "text/event-stream"
+    events = []
+    for event in b"".join(response.streaming_content).decode("utf-8").split("\n\n")[:-1]:
+        name, payload = event.split("\n")
+        events.append((name[len("event: ") :], json.loads(payload[len("data: ") :])))  # noqa
+    assert events == [(line["event"], line["data"]) for line in lines]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_project_plagiarism_compare_across_courses(api_client: APIClient, project, monkeypatch):
+    """
+    Tests that files of projects in different courses can be compared by teachers of both courses only
+    """
+    monkeypatch.setattr(SupportedLanguages, "get_alphabet", lambda ext: Alphabet())
+    monkeypatch.setattr(index, "tokenize_file_profiles", tokenize_characters)
+    teacher = project.team.requirement.course.owner
+    other = UserFactory.create(username="other")
+    first = ProjectFactory.create(team__requirement=project.team.requirement, files={"a.py": "abcdefghijklmnopqrst"})
+    taught = ProjectFactory.create(
+        team__requirement__course__owner=other,
+        team__requirement__course__teachers=[other, teacher],
+        files={"b.py": "abcdefghijklmnopqrst"},
+    )
+    untaught = ProjectFactory.create(team__requirement__course__owner=other, files={"b.py": "abcdefghijklmnopqrst"})
+    api_client.force_authenticate(user=teacher)
+
+    url: str = reverse("project-plagiarism-compare")
+    request_data: dict = {"first_file": "a.py", "second_file": "b.py", "format": "regions"}
+    response: Response = api_client.post(
+        url, data={**request_data, "first_project": str(first.uid), "second_project": str(taught.uid)}, format="json"
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert json.loads(response.content)["ratio"] == "1.00"
+
+    # check that the user has to teach the courses of both projects, either way around
+    for first_project, second_project in [(first, untaught), (untaught, first)]:
+        data = {
+            "first_project": str(first_project.uid),
+            "second_project": str(second_project.uid),
+            "first_file": "a.py" if first_project == first else "b.py",
+            "second_file": "a.py" if second_project == first else "b.py",
+        }
+        response = api_client.post(url, data={**request_data, **data}, format="json")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db(transaction=True)
+def test_project_plagiarism_courses_scope(api_client: APIClient, project, monkeypatch):
+    """
+    Tests that projects are checked against the indexed projects of the chosen courses, which must all be taught by
+    the user
+    """
+    monkeypatch.setattr(SupportedLanguages, "get_alphabet", lambda ext: Alphabet())
+    monkeypatch.setattr(index, "tokenize_file_profiles", tokenize_characters)
+    teacher = project.team.requirement.course.owner
+    other = UserFactory.create(username="other")
+    blocks = ["abcdefghijklmnopqrst", "ABCDEFGHIJKLMNOPQRST", "UVWXYZuvwxyz[]^_{|}~"]
+    checked = ProjectFactory.create(team__requirement=project.team.requirement, files={"a.py": "".join(blocks)})
+    matched = ProjectFactory.create(
+        team__requirement__course__owner=other,
+        team__requirement__course__teachers=[other, teacher],
+        files={"b.py": "".join(blocks)},
+    )
+    stale = ProjectFactory.create(team__requirement=matched.team.requirement, files={"b.py": "".join(blocks)})
+    untaught = ProjectFactory.create(team__requirement__course__owner=other, files={"b.py": "".join(blocks)})
+    for indexed in (checked, matched, stale, untaught):
+        index.get_project_index(indexed)
+    ProjectIndex._default_manager.filter(project=stale).update(version=0)
+    api_client.force_authenticate(user=teacher)
+
+    url: str = reverse("project-plagiarism")
+    course = matched.team.requirement.course
+    request_data: dict = {"project": str(checked.uid), "threshold": 0.5, "scope": "courses"}
+    response: Response = api_client.post(url, data=request_data, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = api_client.post(url, data={**request_data, "courses": [str(course.uid)]}, format="json")
+    assert response.status_code == status.HTTP_200_OK
+    [_file] = json.loads(response.content)["files"]
+    # check that only projects of the chosen courses are matched, and that stale ones are reported as failures
+    assert [(match["project"], match["file"], match["ratio"]) for match in _file["matches"]] == [
+        (str(matched.uid), "b.py", "1.00")
+    ]
+    assert _file["failures"] == [str(stale.uid)]
+
+    untaught_course = untaught.team.requirement.course
+    response = api_client.post(
+        url, data={**request_data, "courses": [str(course.uid), str(untaught_course.uid)]}, format="json"
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def tokenize_bytes(source: str, ext: str) -> dict:
+    # Every character is a token of its own located by its UTF-8 byte offsets, like parsed tokens are
+    tokens = TokenStream(alphabet=Alphabet())
+    position = 0
+    for character in source:
+        size = len(character.encode("utf-8"))
+        tokens.append(ord(character) % 64, position, position + size)
+        position += size
+    return {profile: tokens for profile in TokenProfile.PROFILE_LIST}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_project_plagiarism_compare_regions(api_client: APIClient, project, monkeypatch):
+    """
+    Tests that only the matched regions of both files are returned, as byte offsets of their UTF-8 contents
+    """
+    monkeypatch.setattr(SupportedLanguages, "get_alphabet", lambda ext: Alphabet())
+    monkeypatch.setattr(index, "tokenize_file_profiles", tokenize_bytes)
+    shared = "abcdefghijklmnopqrst"
+    requirement = project.team.requirement
+    projects = [
+        ProjectFactory.create(team__requirement=requirement, files={"a.py": "ééé" + shared + "XYZW"}),
+        ProjectFactory.create(team__requirement=requirement, files={"a.py": "+" + shared}),
+    ]
+    api_client.force_authenticate(user=requirement.course.owner)
+
+    url: str = reverse("project-plagiarism-compare")
+    request_data: dict = {
+        "first_project": str(projects[0].uid),
+        "second_project": str(projects[1].uid),
+        "first_file": "a.py",
+        "second_file": "a.py",
+    }
+    response: Response = api_client.post(url, data={**request_data, "format": "regions"}, format="json")
+    assert response.status_code == status.HTTP_200_OK
+    data: dict = json.loads(response.content)
+    assert data == {"ratio": "0.83", "first_regions": [[6, 26]], "second_regions": [[1, 21]]}
+
+    # check that the regions mark the same text as the text format
+    first, second = ("ééé" + shared + "XYZW").encode("utf-8"), ("+" + shared).encode("utf-8")
+    assert first[6:26].decode("utf-8") == second[1:21].decode("utf-8") == shared
+    response = api_client.post(
+        url, data={**request_data, "match_start_tokens": "[", "match_end_tokens": "]"}, format="json"
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert json.loads(response.content) == {"first_file": f"ééé[{shared}]XYZW", "second_file": f"+[{shared}]"}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_project_plagiarism_compare_streaming(api_client: APIClient, project, monkeypatch):
+    """
+    Tests that the streamed compare body is the same JSON as the whole response, including escaped characters
+    """
+    monkeypatch.setattr(SupportedLanguages, "get_alphabet", lambda ext: Alphabet())
+    monkeypatch.setattr(index, "tokenize_file_profiles", tokenize_bytes)
+    shared = 'print("<é>\\\\n")\n\tabcdefghij'
+    requirement = project.team.requirement
+    projects = [
+        ProjectFactory.create(team__requirement=requirement, files={"a.py": '"quoted"\n' + shared}),
+        ProjectFactory.create(team__requirement=requirement, files={"a.py": shared + "\\   ü"}),
+    ]
+    api_client.force_authenticate(user=requirement.course.owner)
+
+    url: str = reverse("project-plagiarism-compare")
+    request_data: dict = {
+        "first_project": str(projects[0].uid),
+        "second_project": str(projects[1].uid),
+        "first_file": "a.py",
+        "second_file": "a.py",
+    }
+    for options in [{"html_encoded": False}, {"html_encoded": True}]:
+        options.update(match_start_tokens="<mark>", match_end_tokens="</mark>")
+        response: Response = api_client.post(url, data={**request_data, **options}, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        data: dict = json.loads(response.content)
+        assert "<mark>" in data["first_file"] and "<mark>" in data["second_file"]
+
+        response = api_client.post(url, data={**request_data, **options, "stream": True}, format="json")
+        assert response.status_code == status.HTTP_200_OK and response["Content-Type"] == "application/json"
+        assert json.loads(b"".join(response.streaming_content)) == data
+
+
+@pytest.mark.django_db(transaction=True)
+def test_project_plagiarism_compare_extensions(api_client: APIClient, project, monkeypatch):
+    """
+    Tests that only files of the same extension can be compared, their token ids belong to different languages otherwise
+    """
+    monkeypatch.setattr(SupportedLanguages, "get_alphabet", lambda ext: Alphabet())
+    monkeypatch.setattr(index, "tokenize_file_profiles", tokenize_characters)
+    requirement = project.team.requirement
+    projects = [
+        ProjectFactory.create(team__requirement=requirement, files={"a.py": "abcdefghijklmnopqrst"}),
+        ProjectFactory.create(team__requirement=requirement, files={"a.js": "abcdefghijklmnopqrst"}),
+    ]
+    api_client.force_authenticate(user=requirement.course.owner)
+
+    request_data: dict = {
+        "first_project": str(projects[0].uid),
+        "second_project": str(projects[1].uid),
+        "first_file": "a.py",
+        "second_file": "a.js",
+    }
+    response: Response = api_client.post(reverse("project-plagiarism-compare"), data=request_data, format="json")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "second_file" in json.loads(response.content)
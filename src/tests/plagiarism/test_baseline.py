@@ -0,0 +1,42 @@
+from array import array
+
+from plagiarism.baseline import Baseline
+from plagiarism.fingerprints import hash_kgrams
+from plagiarism.tokens import Alphabet, TokenStream
+
+
+def test_baseline_strips_starter_code(settings):
+    """
+    Tests that runs of starter code tokens are removed while the rest of the tokens are kept in order
+    """
+    settings.PLAG_BASELINE_MIN_MATCH_LENGTH = 4
+    starter = [1, 2, 3, 4, 5]
+    baseline = Baseline(digest="a" * 64, kgrams={".py": set(hash_kgrams(starter, k=4))}, fingerprints={})
+
+    assert list(baseline.strip([9, 1, 2, 3, 4, 5, 8, 1, 2, 3], ext=".py")) == [9, 8, 1, 2, 3]
+    # Other languages are left untouched
+    assert list(baseline.strip(starter, ext=".js")) == starter
+
+
+def test_baseline_filters_fingerprints():
+    """
+    Tests that fingerprints found in the starter code are left out
+    """
+    baseline = Baseline(digest="a" * 64, kgrams={}, fingerprints={".py": {2, 3}})
+    assert list(baseline.filter_fingerprints(array("Q", [1, 2, 3, 4]), ext=".py")) == [1, 4]
+
+
+def test_baseline_strips_starter_code_tokens(settings):
+    """
+    Tests that tokens left after stripping starter code keep their locations
+    """
+    settings.PLAG_BASELINE_MIN_MATCH_LENGTH = 4
+    starter = [1, 2, 3, 4]
+    baseline = Baseline(digest="a" * 64, kgrams={".py": set(hash_kgrams(starter, k=4))}, fingerprints={})
+    tokens = TokenStream(alphabet=Alphabet())
+    for position, type_id in enumerate([9, 1, 2, 3, 4, 8]):
+        tokens.append(type_id, position * 2, position * 2 + 1)
+
+    stripped = baseline.strip_tokens(tokens, ext=".py")
+    assert (list(stripped.types), list(stripped.starts), list(stripped.ends)) == ([9, 8], [0, 10], [1, 11])
+    assert baseline.strip_tokens(tokens, ext=".js") is tokens
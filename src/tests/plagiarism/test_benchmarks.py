@@ -0,0 +1,124 @@
+"""
+Plagiarism detection benchmarks on synthetic cohorts, run with `pytest --benchmark-only` and compare runs with
+`--benchmark-autosave` and `--benchmark-compare`. Benchmarks that parse are skipped until `setup_plagiarism` is run.
+"""
+import os
+from itertools import combinations
+
+import pytest
+
+from plagiarism.management.benchmark import (
+    MutationRates,
+    generate_cohort,
+    generate_labeled_cohort,
+    benchmark_parse,
+    benchmark_profiles,
+    calculate_auc,
+    create_cohort_projects,
+    request_project_plagiarism,
+    request_project_compare,
+)
+from plagiarism.constants import PlagiarismEngine, TokenProfile
+from plagiarism.index import tokenize_file
+from plagiarism.sources import SupportedLanguages, get_matcher
+
+requires_languages = pytest.mark.skipif(
+    not all(os.path.exists(grammar.library) for grammar in SupportedLanguages.get_grammars().values()),
+    reason="Supported languages aren't compiled",
+)
+
+
+@pytest.fixture(scope="module")
+def cohort():
+    return generate_cohort(projects=6, files=4, rates=MutationRates(rename=0.3, reorder=0.2, dead_code=0.1), seed=0)
+
+
+def test_generate_cohort(cohort):
+    """
+    Tests that cohorts are reproducible and that their python files are valid
+    """
+    assert generate_cohort(projects=6, files=4, rates=MutationRates(rename=0.3, reorder=0.2, dead_code=0.1)) == cohort
+    assert [len(sources) for sources in cohort] == [4] * 6
+    for sources in cohort:
+        for path, source in sources.items():
+            if path.endswith(".py"):
+                compile(source, path, "exec")
+
+
+def test_calculate_auc():
+    """
+    Tests that ratios are scored by how well they rank plagiarized pairs above unrelated ones
+    """
+    assert calculate_auc([0.9, 0.8], [0.1, 0.2]) == 1.0
+    assert calculate_auc([0.1], [0.9]) == 0.0
+    assert calculate_auc([0.5, 0.9], [0.5, 0.1]) == 0.875
+    assert calculate_auc([0.5], []) is None
+
+
+@requires_languages
+def test_benchmark_parse(benchmark, cohort):
+    """
+    Benchmarks tokenizing every file of a cohort
+    """
+    sources = [(source, path[path.rindex(".") :]) for project in cohort for path, source in project.items()]
+    benchmark(lambda: [tokenize_file(source=source, ext=ext) for source, ext in sources])
+
+
+@requires_languages
+@pytest.mark.parametrize("engine", PlagiarismEngine.ENGINE_LIST)
+def test_benchmark_matcher(benchmark, cohort, engine):
+    """
+    Benchmarks matching the same file of every pair of projects of a cohort
+    """
+    _, tokens = benchmark_parse(cohort)
+    matcher = get_matcher(engine=engine)
+    pairs = [(first[path].types, second[path].types) for first, second in combinations(tokens, 2) for path in first]
+    benchmark(lambda: [matcher.ratio(first, second) for first, second in pairs])
+
+
+@requires_languages
+@pytest.mark.django_db
+def test_benchmark_project_plagiarism_view(benchmark, cohort, settings, tmp_path):
+    """
+    Benchmarks checking a project of a cohort once every project is indexed
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    teacher, projects = create_cohort_projects(cohort)
+    request_project_plagiarism(teacher, projects[0], threshold=0.5)
+    benchmark(request_project_plagiarism, teacher, projects[0], threshold=0.5)
+
+
+@requires_languages
+@pytest.mark.django_db
+def test_benchmark_project_compare_view(benchmark, cohort, settings, tmp_path):
+    """
+    Benchmarks comparing a file of two projects of a cohort once their match is cached
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    teacher, projects = create_cohort_projects(cohort)
+    path = sorted(cohort[0])[0]
+    request_project_compare(teacher, projects[0], projects[1], path)
+    benchmark(request_project_compare, teacher, projects[0], projects[1], path)
+
+
+@requires_languages
+@pytest.mark.parametrize("profile", TokenProfile.PROFILE_LIST)
+def test_benchmark_profile(benchmark, profile):
+    """
+    Benchmarks matching the same file of every pair of projects of a cohort under a tokenization profile, along with
+    how much shorter its tokens are and how well its ratios tell copies apart
+    """
+    cohort, copies = generate_labeled_cohort(projects=6, files=4, rates=MutationRates(), seed=0)
+    results = benchmark_profiles(cohort, copies, get_matcher(), profiles=sorted({TokenProfile.ALL, profile}))
+    benchmark.extra_info.update({key: results[profile][key] for key in ("auc", "reduction") if key in results[profile]})
+
+    tokens = [
+        [
+            tokenize_file(source=source, ext=path[path.rindex(".") :], profile=profile).types
+            for path, source in sorted(project.items())
+        ]
+        for project in cohort
+    ]
+    matcher = get_matcher()
+    pairs = [pair for first, second in combinations(tokens, 2) for pair in zip(first, second)]
+    benchmark(lambda: [matcher.ratio(first, second) for first, second in pairs])
@@ -0,0 +1,30 @@
+import sys
+
+from plagiarism.cache import SourceCache
+
+
+def test_source_cache_lru_eviction():
+    """
+    Tests that the least recently used sources are evicted once the cache is full
+    """
+    cache = SourceCache(max_size=sys.getsizeof("a" * 10) * 2)
+    cache.set(("project", "a.py"), "a" * 10)
+    cache.set(("project", "b.py"), "b" * 10)
+    assert cache.get(("project", "a.py")) == "a" * 10
+
+    cache.set(("project", "c.py"), "c" * 10)
+    assert ("project", "b.py") not in cache
+    assert cache.get(("project", "a.py")) == "a" * 10
+    assert cache.get(("project", "c.py")) == "c" * 10
+    assert cache.size <= cache.max_size
+
+
+def test_source_cache_too_large():
+    """
+    Tests that sources larger than the whole cache are never cached
+    """
+    cache = SourceCache(max_size=sys.getsizeof("a" * 10))
+    cache.set("small", "a" * 10)
+    cache.set("large", "a" * 100)
+    assert cache.get("large") is None
+    assert cache.get("small") == "a" * 10
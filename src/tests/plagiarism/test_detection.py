@@ -0,0 +1,13 @@
+from itertools import combinations
+
+from plagiarism.detection import condensed_index
+
+
+def test_condensed_index():
+    """
+    Tests that every pair of a symmetric matrix maps to its own position in the condensed upper triangle in order
+    """
+    size = 6
+    pairs = list(combinations(range(size), 2))
+    assert [condensed_index(i, j, size) for i, j in pairs] == list(range(len(pairs)))
+    assert condensed_index(4, 1, size) == condensed_index(1, 4, size)
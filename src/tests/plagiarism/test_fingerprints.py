@@ -0,0 +1,47 @@
+import zlib
+import random
+from typing import Iterable, List
+
+from plagiarism.fingerprints import FingerprintIndex, winnow, jaccard_lower_bound
+
+
+def hash_values(strings: Iterable[str]) -> List[int]:
+    # Stable integer values of token strings
+    return [zlib.crc32(string.encode("utf-8")) for string in strings]
+
+
+def test_winnow_shared_match_is_detected():
+    """
+    Tests that any match of at least k + window - 1 tokens shares a fingerprint
+    """
+    k, window = 5, 4
+    rng = random.Random(0)
+    shared = [rng.randrange(1000) for _ in range(k + window - 1)]
+    first = [rng.randrange(1000) for _ in range(50)] + shared + [rng.randrange(1000) for _ in range(50)]
+    second = [rng.randrange(1000) for _ in range(30)] + shared
+
+    assert set(winnow(first, k=k, window=window)) & set(winnow(second, k=k, window=window))
+
+
+def test_winnow_short_sequence_has_no_fingerprints():
+    """
+    Tests that sequences shorter than k have no fingerprints
+    """
+    assert len(winnow(hash_values(["a", "b"]), k=5, window=4)) == 0
+
+
+def test_fingerprint_index_candidates():
+    """
+    Tests that the inverted index only keeps overlapping or unfingerprinted files as candidates
+    """
+    k, window = 3, 2
+    source = hash_values(["def", "name", "(", ")", ":", "return", "name", "+", "integer"] * 3)
+    unrelated = hash_values(["class", "identifier", "{", "}", ";", "while", "break"] * 3)
+
+    index = FingerprintIndex()
+    index.add("copy", winnow(source, k=k, window=window))
+    index.add("unrelated", winnow(unrelated, k=k, window=window))
+    index.add("short", winnow(source[:2], k=k, window=window))
+
+    candidates = index.candidates(winnow(source, k=k, window=window), min_jaccard=jaccard_lower_bound(0.5, 0.5))
+    assert candidates == {"copy", "short"}
@@ -0,0 +1,125 @@
+import datetime
+
+import pytest
+from django.core.files.base import ContentFile
+
+from plagiarism import index
+from plagiarism.constants import TokenProfile
+from plagiarism.index import (
+    dump_tokens,
+    load_tokens,
+    get_project_index,
+    get_file_tokens,
+    collect_parsed_sources,
+    is_index_stale,
+)
+from plagiarism.models import ParsedSource
+from plagiarism.sources import Grammar, SupportedLanguages
+from plagiarism.tokens import Alphabet, TokenStream
+from ..factories.courses import ProjectFactory, make_zip
+
+
+def tokenize_characters(source: str, ext: str) -> dict:
+    # Every character is a token of its own, under every profile
+    tokens = TokenStream(alphabet=Alphabet())
+    for position, character in enumerate(source):
+        tokens.append(ord(character) % 64, position, position + 1)
+    return {profile: tokens for profile in TokenProfile.PROFILE_LIST}
+
+
+def test_dump_load_tokens():
+    """
+    Tests that tokens are loaded back from their stored representation as they were
+    """
+    alphabet = Alphabet()
+    tokens = TokenStream(alphabet=alphabet)
+    for type_id, start, end in [(3, 0, 4), (1, 5, 9), (65535, 9, 70000)]:
+        tokens.append(type_id, start, end)
+
+    loaded = load_tokens(dump_tokens(tokens), alphabet=alphabet)
+    assert (loaded.types, loaded.starts, loaded.ends) == (tokens.types, tokens.starts, tokens.ends)
+    assert len(load_tokens(b"", alphabet=alphabet)) == 0
+
+
+@pytest.mark.django_db
+def test_project_index_is_reused_until_reupload(settings, tmp_path, monkeypatch):
+    """
+    Tests that project files are only parsed once per uploaded archive and that unsupported files are left out
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    monkeypatch.setattr(SupportedLanguages, "get_version", lambda language: "0" * 8)
+    monkeypatch.setattr(SupportedLanguages, "get_alphabet", lambda ext: Alphabet())
+    parsed = []
+    monkeypatch.setattr(
+        index, "tokenize_file_profiles", lambda source, ext: parsed.append(source) or tokenize_characters(source, ext)
+    )
+
+    project = ProjectFactory.create(files={"a.py": "x = 1", "b.txt": "notes", "empty.py": ""})
+    first = get_project_index(project)
+    assert [file.path for file in first.files.all()] == ["a.py"]
+    assert get_project_index(project).id == first.id and parsed == ["x = 1"]
+    assert get_file_tokens(project, "a.py").types.tolist() == [ord(character) % 64 for character in "x = 1"]
+
+    project.project_zip.save("reuploaded.zip", ContentFile(make_zip({"a.py": "x = 2"})))
+    second = get_project_index(project)
+    assert second.id != first.id and parsed == ["x = 1", "x = 2"]
+
+
+@pytest.mark.django_db
+def test_project_index_is_versioned_by_its_languages(settings, tmp_path, monkeypatch):
+    """
+    Tests that indexes are only rebuilt when the version of one of their own languages changes, and that files of
+    unavailable languages are left out
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    versions = {"python": "0" * 8, "go": None}
+    monkeypatch.setattr(SupportedLanguages, "get_version", versions.get)
+    monkeypatch.setattr(SupportedLanguages, "get_alphabet", lambda ext: Alphabet())
+    monkeypatch.setattr(index, "tokenize_file_profiles", tokenize_characters)
+    SupportedLanguages.get_grammars()
+    monkeypatch.setitem(SupportedLanguages._exts, ".go", Grammar("go", path="tree-sitter-go", exts=[".go"]))
+
+    project = ProjectFactory.create(files={"a.py": "x = 1", "b.go": "y := 1"})
+    first = get_project_index(project)
+    assert [file.path for file in first.files.all()] == ["a.py"]
+    assert first.languages == versions and first.files.get().source.alphabet == "0" * 8
+
+    # Other languages, even a newly registered one, don't make the index stale
+    versions["java"] = "1" * 8
+    assert not is_index_stale(first, project) and get_project_index(project).id == first.id
+
+    versions["python"] = "2" * 8
+    second = get_project_index(project)
+    assert second.id != first.id and second.files.get().source.alphabet == "2" * 8
+
+    # Languages that become available are indexed
+    versions["go"] = "3" * 8
+    third = get_project_index(project)
+    assert third.id != second.id and [file.path for file in third.files.order_by("path")] == ["a.py", "b.go"]
+
+
+@pytest.mark.django_db
+def test_collect_parsed_sources(settings, tmp_path, monkeypatch):
+    """
+    Tests that only sources that no index uses anymore are collected, once they're old enough
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    monkeypatch.setattr(SupportedLanguages, "get_version", lambda language: "0" * 8)
+    monkeypatch.setattr(SupportedLanguages, "get_alphabet", lambda ext: Alphabet())
+    monkeypatch.setattr(index, "tokenize_file_profiles", tokenize_characters)
+
+    reuploaded = ProjectFactory.create(files={"a.py": "x = 1"})
+    deleted = ProjectFactory.create(files={"a.py": "y = 1"})
+    kept = ProjectFactory.create(files={"a.py": "z = 1"})
+    for project in (reuploaded, deleted, kept):
+        get_project_index(project)
+    reuploaded.project_zip.save("reuploaded.zip", ContentFile(make_zip({"a.py": "x = 2"})))
+    get_project_index(reuploaded)
+    deleted.delete()
+
+    # Sources are left to the collection instead of being deleted along with their indexes
+    assert ParsedSource._default_manager.count() == 4
+    assert collect_parsed_sources(min_age=datetime.timedelta(hours=1)) == 0
+    assert collect_parsed_sources(min_age=datetime.timedelta(0)) == 2
+    assert get_file_tokens(kept, "a.py").types.tolist() == [ord(character) % 64 for character in "z = 1"]
+    assert get_file_tokens(reuploaded, "a.py").types.tolist() == [ord(character) % 64 for character in "x = 2"]
@@ -0,0 +1,87 @@
+import datetime
+
+import pytest
+from django.utils import timezone
+
+from plagiarism import jobs
+from plagiarism.constants import PlagiarismJobStatus, PrefilterTier
+from plagiarism.jobs import claim_job, run_job
+from plagiarism.models import PlagiarismJob
+from ..factories.courses import ProjectFactory
+
+
+def create_job(project, **kwargs) -> PlagiarismJob:
+    return PlagiarismJob._default_manager.create(
+        project=project, requester=project.team.requirement.course.owner, threshold=0.5, **kwargs
+    )
+
+
+@pytest.mark.django_db
+def test_claim_job_recovers_stale_jobs(settings, tmp_path):
+    """
+    Tests that pending jobs are claimed oldest first, followed by running jobs whose worker stopped sending heartbeats
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.PLAG_JOB_TIMEOUT = 60
+    settings.PLAG_JOB_MAX_ATTEMPTS = 2
+    project = ProjectFactory.create()
+    now = timezone.now()
+    old = now - datetime.timedelta(minutes=5)
+
+    alive = create_job(project, status=PlagiarismJobStatus.RUNNING, started_at=old, heartbeat_at=now, attempts=1)
+    crashed = create_job(project, status=PlagiarismJobStatus.RUNNING, started_at=old, heartbeat_at=old, attempts=1)
+    crashing = create_job(project, status=PlagiarismJobStatus.RUNNING, started_at=old, heartbeat_at=old, attempts=2)
+    pending = create_job(project)
+
+    assert claim_job() == crashed
+    assert claim_job() == pending
+    assert claim_job() is None
+
+    crashed.refresh_from_db()
+    assert crashed.status == PlagiarismJobStatus.RUNNING and crashed.attempts == 2 and crashed.heartbeat_at > old
+    crashing.refresh_from_db()
+    assert crashing.status == PlagiarismJobStatus.FAILED and crashing.finished_at is not None
+    alive.refresh_from_db()
+    assert alive.status == PlagiarismJobStatus.RUNNING and alive.attempts == 1
+
+
+@pytest.mark.django_db
+def test_run_job_records_result(settings, tmp_path, monkeypatch):
+    """
+    Tests that finished jobs keep their progress, result and stats, that failures are recorded on the job and that
+    jobs can be deleted while they run
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    project = ProjectFactory.create()
+
+    def detect_project_plagiarism(progress, stats, **kwargs):
+        progress(1, 2)
+        stats[PrefilterTier.FULL] += 3
+        return {"ratio": 0.5, "files": []}
+
+    monkeypatch.setattr(jobs, "detect_project_plagiarism", detect_project_plagiarism)
+    job = create_job(project)
+    run_job(claim_job())
+    job.refresh_from_db()
+    assert job.status == PlagiarismJobStatus.SUCCEEDED and job.result == {"ratio": "0.50", "files": []}
+    assert (job.progress, job.total) == (1, 2) and job.stats[PrefilterTier.FULL] == 3
+
+    def fail(**kwargs):
+        raise ValueError("Unreadable archive")
+
+    monkeypatch.setattr(jobs, "detect_project_plagiarism", fail)
+    job = create_job(project)
+    run_job(claim_job())
+    job.refresh_from_db()
+    # check that the requester isn't shown the details of the failure
+    assert job.status == PlagiarismJobStatus.FAILED and "Unreadable archive" not in job.error and job.result is None
+
+    def delete_job(**kwargs):
+        PlagiarismJob._default_manager.filter(pk=job.pk).delete()
+        return {"ratio": 0.5, "files": []}
+
+    # check that jobs deleted while they ran don't stop the worker
+    monkeypatch.setattr(jobs, "detect_project_plagiarism", delete_job)
+    job = create_job(project)
+    run_job(claim_job())
+    assert not PlagiarismJob._default_manager.filter(pk=job.pk).exists()
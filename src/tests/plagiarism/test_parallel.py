@@ -0,0 +1,74 @@
+from array import array
+from collections import Counter
+from concurrent.futures import Future
+
+from plagiarism import parallel
+from plagiarism.parallel import compare_pairs
+from plagiarism.sources import DifflibMatcher
+
+
+def test_compare_pairs_top_k():
+    """
+    Tests that only pairs that can't be among the k best ratios of their group are left uncompared
+    """
+    corpus = {
+        "file": array("H", range(10)),
+        "copy": array("H", range(10)),
+        "close": array("H", list(range(8)) + [20, 21]),
+        "far": array("H", [30] * 10),
+    }
+    groups = [[("file", "close"), ("file", "copy"), ("file", "far")]]
+
+    assert list(compare_pairs(corpus, groups)) == [[0.8, 1.0, 0.0]]
+    assert list(compare_pairs(corpus, groups, top_k=1)) == [[0.8, 1.0, None]]
+    assert list(compare_pairs(corpus, groups, top_k=2, minimums=[0.9])) == [[None, 1.0, None]]
+    assert list(compare_pairs(corpus, groups, matcher=DifflibMatcher(), top_k=3)) == [[0.8, 1.0, 0.0]]
+
+
+def test_compare_pairs_workers():
+    """
+    Tests that pairs compared by worker processes have the same ratios as pairs compared in process
+    """
+    corpus = {key: array("H", [key % 7] * 5 + list(range(key, key + 10))) for key in range(6)}
+    groups = [[(first, second) for second in corpus if second != first] for first in corpus]
+
+    assert list(compare_pairs(corpus, groups, workers=2, chunk_size=2)) == list(compare_pairs(corpus, groups))
+
+
+def test_compare_pairs_early_stop(monkeypatch):
+    """
+    Tests that chunks are submitted as they're needed and that the ones left are cancelled once consumers stop early
+    """
+
+    class LazyFuture(Future):
+        def __init__(self, pairs):
+            super().__init__()
+            self.pairs = pairs
+
+        def result(self, timeout=None):
+            self.set_result(([1.0] * len(self.pairs), Counter()))
+            return super().result(timeout)
+
+    futures = []
+
+    class FakeExecutor:
+        def __init__(self, **kwargs):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+        def submit(self, fn, chunk):
+            futures.append(LazyFuture(chunk[0]))
+            return futures[-1]
+
+    monkeypatch.setattr(parallel, "ProcessPoolExecutor", FakeExecutor)
+    corpus = {"file": array("H", range(10)), "copy": array("H", range(10))}
+    results = compare_pairs(corpus, [[("file", "copy")]] * 100, workers=2, chunk_size=1)
+
+    assert next(results) == [1.0]
+    results.close()
+    assert len(futures) == 4 and [future.cancelled() for future in futures] == [False, True, True, True]
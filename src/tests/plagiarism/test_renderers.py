@@ -0,0 +1,16 @@
+import json
+
+from plagiarism.renderers import NDJSONRenderer, EventStreamRenderer
+
+
+def test_stream_renderers_events():
+    """
+    Tests that every streamed event is rendered on its own line or server-sent event
+    """
+    data = {"file": "a.py", "ratio": "0.50"}
+
+    line = NDJSONRenderer().render_event("file", data)
+    assert line.endswith(b"\n") and json.loads(line) == {"event": "file", "data": data}
+
+    event = EventStreamRenderer().render_event("file", data).decode("utf-8")
+    assert event == f"event: file\ndata: {json.dumps(data)}\n\n"
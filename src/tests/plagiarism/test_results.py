@@ -0,0 +1,79 @@
+import uuid
+
+import pytest
+
+from courses.models import Project
+from plagiarism import index
+from plagiarism.index import get_project_files
+from plagiarism.models import FilePairResult, ProjectFileIndex
+from plagiarism.sources import DifflibMatcher, SupportedLanguages
+from plagiarism.results import get_compare_key, get_digest_pair, get_results_key, iter_pair_ratios
+from plagiarism.results import load_results, store_results
+from plagiarism.tokens import Alphabet
+from ..factories.courses import ProjectFactory
+from .test_index import tokenize_characters
+
+
+def test_digest_pair_order():
+    """
+    Tests that a pair of file contents has the same digest pair either way around
+    """
+    first, second = ProjectFileIndex(digest="b" * 64), ProjectFileIndex(digest="a" * 64)
+    assert get_digest_pair(first, second) == get_digest_pair(second, first) == ("a" * 64, "b" * 64)
+
+
+def test_compare_key(monkeypatch):
+    """
+    Tests that compared files are cached again once either project or file content changes
+    """
+    monkeypatch.setattr(SupportedLanguages, "get_version", lambda language: "0" * 8)
+    first, second = Project(uid=uuid.uuid4(), project_zip="a.zip"), Project(uid=uuid.uuid4(), project_zip="b.zip")
+    matcher = DifflibMatcher()
+    kwargs = {"first_file": "a.py", "second_file": "b.py", "matcher": matcher}
+    key = get_compare_key(first_project=first, second_project=second, digests=("a", "b"), **kwargs)
+
+    assert key == get_compare_key(first_project=first, second_project=second, digests=("a", "b"), **kwargs)
+    assert key != get_compare_key(first_project=first, second_project=second, digests=("a", "c"), **kwargs)
+    assert key != get_compare_key(first_project=second, second_project=first, digests=("a", "b"), **kwargs)
+    second.project_zip = "b_reuploaded.zip"
+    assert key != get_compare_key(first_project=first, second_project=second, digests=("a", "b"), **kwargs)
+
+
+@pytest.mark.django_db
+def test_store_and_load_results():
+    """
+    Tests that stored ratios are only loaded for the requested pairs and engine key
+    """
+    pair, other_pair = ("a" * 64, "b" * 64), ("a" * 64, "c" * 64)
+    store_results({pair: 0.5, other_pair: 0.25}, key="difflib")
+    # Storing a pair again is ignored
+    store_results({pair: 0.75}, key="difflib")
+
+    assert load_results({pair}, key="difflib") == {pair: 0.5}
+    assert load_results({pair, other_pair}, key="greedy_string_tiling") == {}
+
+
+@pytest.mark.django_db
+def test_pair_ratios_by_extension(settings, tmp_path, monkeypatch):
+    """
+    Tests that the same contents under other extensions are compared and stored on their own, since they're
+    tokenized by other languages
+    """
+    settings.MEDIA_ROOT = str(tmp_path)
+    monkeypatch.setattr(SupportedLanguages, "get_version", lambda language: "0" * 8)
+    monkeypatch.setattr(SupportedLanguages, "get_alphabet", lambda ext: Alphabet())
+
+    def tokenize_file_profiles(source: str, ext: str) -> dict:
+        # Every character is the same token under javascript
+        return tokenize_characters("a" * len(source) if ext == ".js" else source, ext)
+
+    monkeypatch.setattr(index, "tokenize_file_profiles", tokenize_file_profiles)
+    first = get_project_files(ProjectFactory.create(files={"a.py": "abcdefgh", "a.js": "abcdefgh"}))
+    second = get_project_files(ProjectFactory.create(files={"b.py": "abcdwxyz", "b.js": "abcdwxyz"}))
+    assert get_results_key(DifflibMatcher(), ext=".py") != get_results_key(DifflibMatcher(), ext=".js")
+
+    file_pairs = [(_file, [other]) for _file, other in zip(first, second)]
+    assert list(iter_pair_ratios(file_pairs)) == [[0.5], [1.0]]
+    assert FilePairResult._default_manager.values("first_digest", "second_digest").distinct().count() == 1
+    assert list(iter_pair_ratios(file_pairs)) == [[0.5], [1.0]]
+    assert FilePairResult._default_manager.count() == 2
@@ -0,0 +1,47 @@
+import pytest
+
+from plagiarism.constants import TokenProfile
+from plagiarism.models import ParsedSource, SourceFingerprint
+from plagiarism.search import count_shared_fingerprints, find_candidate_sources
+
+
+def create_source(digest: str, fingerprints: list, profile: str = TokenProfile.ALL) -> ParsedSource:
+    source = ParsedSource._default_manager.create(digest=digest, ext=".py", version=1)
+    SourceFingerprint._default_manager.bulk_create(
+        [SourceFingerprint(source=source, profile=profile, fingerprint=fingerprint) for fingerprint in fingerprints]
+    )
+    return source
+
+
+@pytest.mark.django_db
+def test_find_candidate_sources(monkeypatch):
+    """
+    Tests that sources are looked up by the fingerprints they share, in batches, under the requested profile only
+    """
+    monkeypatch.setattr("plagiarism.search.LOOKUP_BATCH_SIZE", 2)
+    similar = create_source("a" * 64, [1, 2, 3, 4])
+    distant = create_source("b" * 64, [4, 5, 6, 7, 8, 9])
+    create_source("c" * 64, [1, 2, 3, 4], profile=TokenProfile.STATEMENT)
+    create_source("d" * 64, [(1 << 61) - 2])
+
+    assert count_shared_fingerprints([1, 2, 3, 4, 5], profile=TokenProfile.ALL) == {similar.id: 4, distant.id: 2}
+    assert find_candidate_sources([1, 2, 3, 4, 5], profile=TokenProfile.ALL, min_jaccard=0.5) == {similar.id}
+    assert find_candidate_sources([1, 2, 3, 4, 5], profile=TokenProfile.ALL, min_jaccard=0) == {similar.id, distant.id}
+    assert find_candidate_sources([], profile=TokenProfile.ALL, min_jaccard=0) == set()
+
+
+@pytest.mark.django_db
+def test_find_candidate_sources_with_baseline():
+    """
+    Tests that starter code fingerprints are left out of the looked up sources too, so copies that share the starter
+    code aren't pruned for it
+    """
+    starter = list(range(10, 20))
+    copied = create_source("a" * 64, [1, 2, 3, 4] + starter)
+    create_source("b" * 64, [5] + starter)
+
+    # Fingerprints of the checked file were already stripped of the starter code
+    assert find_candidate_sources([1, 2, 3, 4, 5], profile=TokenProfile.ALL, min_jaccard=0.5) == set()
+    assert find_candidate_sources(
+        [1, 2, 3, 4, 5], profile=TokenProfile.ALL, min_jaccard=0.5, excluded=set(starter)
+    ) == {copied.id}
@@ -0,0 +1,244 @@
+import os
+import threading
+from array import array
+from collections import Counter
+
+from plagiarism import sources
+from plagiarism.tokens import Alphabet, TokenStream
+from plagiarism.sources import (
+    Grammar,
+    SupportedLanguages,
+    DifflibMatcher,
+    GreedyStringTilingMatcher,
+    merge_intervals,
+    match_sequences,
+    tokenize_source,
+    iter_tokenize_source,
+    calculate_upper_bound,
+    calculate_histogram_upper_bound,
+    get_histogram,
+)
+from plagiarism.constants import PrefilterTier
+
+
+def test_merge_intervals():
+    """
+    Tests that overlapping and touching intervals are merged in order
+    """
+    assert merge_intervals([(10, 12), (0, 4), (2, 3), (4, 6), (8, 9)]) == [(0, 6), (8, 9), (10, 12)]
+
+
+def test_match_sequences_intervals():
+    """
+    Tests that matched tokens are returned as merged intervals of both sources
+    """
+    alphabet = Alphabet()
+    tokens1, tokens2 = TokenStream(alphabet=alphabet), TokenStream(alphabet=alphabet)
+    for string, start, end in [("def", 0, 3), ("name", 4, 7), ("(", 7, 8)]:
+        tokens1.append(alphabet.get_id(string), start, end)
+    for string, start, end in [("class", 0, 5), ("def", 6, 9), ("name", 10, 13)]:
+        tokens2.append(alphabet.get_id(string), start, end)
+
+    intervals1, intervals2, ratio = match_sequences(tokens1=tokens1, tokens2=tokens2)
+    assert intervals1 == [(0, 3), (4, 7)]
+    assert intervals2 == [(6, 9), (10, 13)]
+    assert ratio == 2 * 2 / 6
+
+
+def test_tokenize_source():
+    """
+    Tests that marked byte intervals are wrapped with the start and end tokens
+    """
+    source = "def foo():\n    bar()"
+    assert tokenize_source(source, [(4, 7), (15, 18)], start_tokens="{", end_tokens="}") == "def {foo}():\n    {bar}()"
+
+
+def test_tokenize_source_html_encoded_multiline():
+    """
+    Tests that html encoded marks are escaped and closed before every end of line
+    """
+    source = "a = '<b>'\nc"
+    assert (
+        tokenize_source(source, [(4, 11)], start_tokens="<i>", end_tokens="</i>", html_encoded=True)
+        == "a = <i>&#x27;&lt;b&gt;&#x27;</i>\n<i>c</i>"
+    )
+
+
+def test_tokenize_source_non_ascii_offsets():
+    """
+    Tests that intervals are treated as utf-8 byte offsets like the ones produced by tree-sitter
+    """
+    source = "x = 'é'; y"
+    data = source.encode("utf-8")
+    start = data.index(b"y")
+    assert tokenize_source(source, [(start, start + 1)], start_tokens="[", end_tokens="]") == "x = 'é'; [y]"
+
+
+def test_iter_tokenize_source_chunks():
+    """
+    Tests that the streamed chunks join into the same tokenized source
+    """
+    source = "a = '<b>'\nc = d"
+    intervals = [(0, 1), (4, 11), (14, 15)]
+    chunks = list(iter_tokenize_source(source, intervals, start_tokens="<i>", end_tokens="</i>", html_encoded=True))
+    assert len(chunks) > 1
+    assert "".join(chunks) == tokenize_source(
+        source, intervals, start_tokens="<i>", end_tokens="</i>", html_encoded=True
+    )
+
+
+def test_greedy_string_tiling_reordered_blocks():
+    """
+    Tests that greedy string tiling matches blocks that were moved around while difflib misses them
+    """
+    first = array("H", list(range(20)) + list(range(100, 120)))
+    second = array("H", list(range(100, 120)) + list(range(20)))
+
+    matcher = GreedyStringTilingMatcher(min_match_length=5)
+    assert matcher.matching_blocks(first, second) == [(0, 20, 20), (20, 0, 20)]
+    assert matcher.ratio(first, second) == 1.0
+    assert DifflibMatcher().ratio(first, second) == 0.5
+
+
+def test_greedy_string_tiling_min_match_length():
+    """
+    Tests that greedy string tiling ignores common blocks shorter than the minimum match length
+    """
+    first = array("H", [1, 2, 3, 4, 9, 9, 9, 9, 9, 9])
+    second = array("H", [7, 7, 1, 2, 3, 4, 8, 8, 8, 8])
+
+    assert GreedyStringTilingMatcher(min_match_length=4).matching_blocks(first, second) == [(0, 2, 4)]
+    assert GreedyStringTilingMatcher(min_match_length=5).ratio(first, second) == 0.0
+
+
+def test_bounded_ratio():
+    """
+    Tests that ratios are only computed when their upper bound reaches the minimum
+    """
+    first = array("H", [1, 2, 3, 4, 5, 6, 7, 8])
+    second = array("H", [8, 7, 6, 5, 9, 9, 9, 9])
+    assert calculate_upper_bound(first, second) == 0.5
+
+    for matcher in (DifflibMatcher(), GreedyStringTilingMatcher(min_match_length=2)):
+        assert matcher.ratio(first, second) <= 0.5
+        assert matcher.bounded_ratio(first, second, minimum=0.6) is None
+        assert matcher.bounded_ratio(first, second, minimum=0.5) == matcher.ratio(first, second)
+        # Sequences of very different lengths are ruled out by their lengths alone
+        assert matcher.bounded_ratio(first, first[:2], minimum=0.5) is None
+
+
+def test_bounded_ratio_prefilter_tiers():
+    """
+    Tests that every pair is counted under the cheapest tier that ruled it out, or as fully compared
+    """
+    first = array("H", [1, 2, 3, 4])
+    # Same buckets as the first sequence but different type ids, so only the exact token counts rule it out
+    second = array("H", [1 + 32, 2 + 32, 3, 4])
+    histograms = (get_histogram(first), get_histogram(second))
+    assert calculate_histogram_upper_bound(*histograms) == 1.0 > calculate_upper_bound(first, second) == 0.5
+
+    stats = Counter()
+    matcher = DifflibMatcher()
+    assert matcher.bounded_ratio(first, first[:1], minimum=0.6, stats=stats) is None
+    other = array("H", [5, 6, 7, 8])
+    assert (
+        matcher.bounded_ratio(first, other, minimum=0.6, histograms=(histograms[0], get_histogram(other)), stats=stats)
+        is None
+    )
+    assert matcher.bounded_ratio(first, second, minimum=0.6, histograms=histograms, stats=stats) is None
+    assert matcher.bounded_ratio(first, first, minimum=0.6, stats=stats) == 1.0
+    assert stats == {PrefilterTier.LENGTH: 1, PrefilterTier.HISTOGRAM: 1, PrefilterTier.QUICK: 1, PrefilterTier.FULL: 1}
+
+
+def test_supported_languages_registry(settings, tmp_path, monkeypatch):
+    """
+    Tests that registered languages are detected by extension and versioned by their libraries without being loaded
+    """
+    settings.PLAG_LANGUAGES_DIR = str(tmp_path)
+    settings.PLAG_LANGUAGES = {"python": {"path": "tree-sitter-python", "exts": [".py"]}}
+    monkeypatch.setattr(SupportedLanguages, "_grammars", None)
+    for attribute in ("_exts", "_languages", "_alphabets", "_versions"):
+        monkeypatch.setattr(SupportedLanguages, attribute, {})
+    monkeypatch.setattr(sources, "Language", None)  # Constructing a language fails
+
+    (tmp_path / "python.so").write_bytes(b"python")
+    (tmp_path / "go.so").write_bytes(b"go")
+    assert SupportedLanguages.is_supported(".py") and not SupportedLanguages.is_supported(".go")
+    version = SupportedLanguages.get_version("python")
+    assert version is not None and SupportedLanguages.get_version("go") is None
+
+    # Registering a language doesn't change the versions of the others
+    SupportedLanguages.register(Grammar("go", path="tree-sitter-go", exts=[".go"], statement_suffixes=["_statement"]))
+    assert SupportedLanguages.get_grammar(".go").library == str(tmp_path / "go.so")
+    assert SupportedLanguages.get_grammar(".go").statement_suffixes == ("_statement",)
+    assert SupportedLanguages.is_supported(".go") and SupportedLanguages.get_version("python") == version
+
+    # Recompiled grammars are versioned again once registered again
+    go_version = SupportedLanguages.get_version("go")
+    (tmp_path / "go.so").write_bytes(b"go 2")
+    SupportedLanguages.register(Grammar("go", path="tree-sitter-go", exts=[".go"]))
+    assert SupportedLanguages.get_version("go") not in (None, go_version)
+
+    # Languages whose library is missing are unavailable rather than failing
+    (tmp_path / "go.so").unlink()
+    SupportedLanguages.register(Grammar("go", path="tree-sitter-go", exts=[".go"]))
+    assert SupportedLanguages.get_version("go") is None and not SupportedLanguages.is_supported(".go")
+
+
+def test_languages_and_parsers_are_reused(settings, tmp_path, monkeypatch):
+    """
+    Tests that languages are loaded once per process and that parsers are reused by their own thread only
+    """
+    settings.PLAG_LANGUAGES_DIR = str(tmp_path)
+    settings.PLAG_LANGUAGES = {"python": {"path": "tree-sitter-python", "exts": [".py", ".pyw"]}}
+    monkeypatch.setattr(SupportedLanguages, "_grammars", None)
+    for attribute in ("_exts", "_languages", "_alphabets", "_versions"):
+        monkeypatch.setattr(SupportedLanguages, attribute, {})
+    monkeypatch.setattr(SupportedLanguages, "_local", threading.local())
+
+    loaded = []
+
+    class FakeParser:
+        def set_language(self, language):
+            self.language = language
+
+    monkeypatch.setattr(sources, "Language", lambda library, name: loaded.append(name) or object())
+    monkeypatch.setattr(sources, "Parser", FakeParser)
+
+    language = SupportedLanguages.get_language("python")
+    assert SupportedLanguages.detect_language(".pyw") is language and loaded == ["python"]
+    assert SupportedLanguages.get_language("go") is None and SupportedLanguages.get_parser(".go") is None
+
+    parser = SupportedLanguages.get_parser(".py")
+    assert SupportedLanguages.get_parser(".pyw") is parser and parser.language is language
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(SupportedLanguages.get_parser(".py")))
+    thread.start()
+    thread.join()
+    assert other[0] is not parser and other[0].language is language and loaded == ["python"]
+
+
+def test_grammar_build_stamp(settings, tmp_path, monkeypatch):
+    """
+    Tests that grammars are only compiled again once their sources change
+    """
+    settings.PLAG_LANGUAGES_DIR = str(tmp_path / "build")
+    builds = []
+
+    def build_library(output, paths):
+        builds.append(paths)
+        with open(output, "wb") as library:
+            library.write(b"library")
+
+    monkeypatch.setattr(sources.Language, "build_library", staticmethod(build_library))
+    (tmp_path / "tree-sitter-go" / "src").mkdir(parents=True)
+    (tmp_path / "tree-sitter-go" / "src" / "parser.c").write_text("int parser;")
+    grammar = Grammar("go", path=str(tmp_path / "tree-sitter-go"), exts=[".go"])
+
+    assert grammar.build() and not grammar.build()
+    assert len(builds) == 1 and sorted(os.listdir(tmp_path / "build")) == ["go.so", "go.so.sha256"]
+
+    (tmp_path / "tree-sitter-go" / "src" / "parser.c").write_text("int parser = 1;")
+    assert grammar.build() and grammar.build(force=True)
+    assert len(builds) == 3
@@ -0,0 +1,104 @@
+import sys
+
+from plagiarism.tokens import Alphabet, parse_statements, parse_tree
+
+
+class Node:
+    def __init__(self, type: str, children: list = (), is_named: bool = True):
+        self.type = type
+        self.children = list(children)
+        self.is_named = is_named
+        self.start_byte = 0
+        self.end_byte = 0
+
+
+class Cursor:
+    """
+    Minimal stand in for a tree_sitter cursor over `Node` trees
+    """
+
+    def __init__(self, root: Node):
+        self._path = [(root, 0)]
+
+    @property
+    def node(self) -> Node:
+        return self._path[-1][0]
+
+    def goto_first_child(self) -> bool:
+        if not self.node.children:
+            return False
+        self._path.append((self.node.children[0], 0))
+        return True
+
+    def goto_next_sibling(self) -> bool:
+        if len(self._path) < 2:
+            return False
+        index = self._path[-1][1] + 1
+        siblings = self._path[-2][0].children
+        if index >= len(siblings):
+            return False
+        self._path[-1] = (siblings[index], index)
+        return True
+
+    def goto_parent(self) -> bool:
+        if len(self._path) < 2:
+            return False
+        self._path.pop()
+        return True
+
+
+def test_parse_tree_order():
+    """
+    Tests that tokens are returned in the same order the tree is navigated
+    """
+    tree = Node(
+        "module",
+        [
+            Node("call", [Node("name")]),
+            Node(",", is_named=False),
+            Node("block", [Node("pass"), Node(";", is_named=False)]),
+        ],
+    )
+    alphabet = Alphabet()
+    tokens = parse_tree(Cursor(tree), alphabet=alphabet, child_only=False)
+    assert tokens.names() == ["call", "name", "name", ",", "pass", "pass", ";"]
+    assert parse_tree(Cursor(tree), alphabet=alphabet, child_only=True).names() == ["name", ",", "pass", ";"]
+    assert parse_tree(Cursor(tree), alphabet=alphabet, child_only=True, is_named=True).names() == ["name", "pass"]
+
+
+def test_parse_tree_deep():
+    """
+    Tests that trees deeper than the recursion limit can be parsed
+    """
+    tree = Node("leaf")
+    for _ in range(sys.getrecursionlimit() * 2):
+        tree = Node("expression", [tree])
+    tokens = parse_tree(Cursor(tree), alphabet=Alphabet(), child_only=True)
+    assert tokens.names() == ["leaf"]
+    assert len(tokens.starts) == len(tokens.ends) == 1
+
+
+def test_parse_tree_alphabet_ids():
+    """
+    Tests that tokens are coded with the ids of the given alphabet
+    """
+    alphabet = Alphabet(["module", "name", "call"])
+    tokens = parse_tree(Cursor(Node("module", [Node("call", [Node("name")])])), alphabet=alphabet, child_only=False)
+    assert list(tokens.types) == [2, 1, 1]
+    assert tokens.types.typecode == "H"
+
+
+def test_parse_statements():
+    """
+    Tests that nested statements are returned in order and expression statements by the type of their expression
+    """
+    tree = Node(
+        "module",
+        [
+            Node("function_definition", [Node("identifier"), Node("block", [Node("return_statement")])]),
+            Node("expression_statement", [Node("call", [Node("identifier")]), Node(";", is_named=False)]),
+            Node("if_statement", [Node("comparison"), Node("block", [Node("pass_statement")])]),
+        ],
+    )
+    tokens = parse_statements(Cursor(tree), alphabet=Alphabet(), suffixes=("_statement", "_definition"))
+    assert tokens.names() == ["function_definition", "return_statement", "call", "if_statement", "pass_statement"]